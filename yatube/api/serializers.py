@@ -0,0 +1,53 @@
+"""Поля ресурсов API: имя поля -> функция, достающая значение из объекта.
+
+Клиент может запросить часть полей параметром ?fields=id,text.
+"""
+
+
+class UnknownField(ValueError):
+    """В ?fields= есть поле, которого у ресурса нет."""
+
+
+POST_FIELDS = {
+    'id': lambda post: post.pk,
+    'text': lambda post: post.text,
+    'pub_date': lambda post: post.pub_date,
+    'author': lambda post: post.author.username,
+    'group': lambda post: post.group.slug if post.group_id else None,
+    'image': lambda post: post.image.url if post.image else None,
+}
+
+GROUP_FIELDS = {
+    'id': lambda group: group.pk,
+    'title': lambda group: group.title,
+    'slug': lambda group: group.slug,
+    'description': lambda group: group.description,
+}
+
+COMMENT_FIELDS = {
+    'id': lambda comment: comment.pk,
+    'post': lambda comment: comment.post_id,
+    'text': lambda comment: comment.text,
+    'pub_date': lambda comment: comment.pub_date,
+    'author': lambda comment: comment.author.username,
+}
+
+FOLLOW_FIELDS = {
+    'id': lambda follow: follow.pk,
+    'author': lambda follow: follow.author.username,
+}
+
+
+def select_fields(resource, raw):
+    """Имена полей из ?fields= (по умолчанию — все поля ресурса)."""
+    if not raw:
+        return list(resource)
+    names = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in names if name not in resource]
+    if unknown:
+        raise UnknownField(', '.join(unknown))
+    return names
+
+
+def serialize(resource, obj, names):
+    return {name: resource[name](obj) for name in names}
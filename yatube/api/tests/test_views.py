@@ -0,0 +1,130 @@
+import json
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@mock.patch('posts.feed_cache.transaction.on_commit', lambda func: func())
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for number in range(5):
+            cls.post = Post.objects.create(
+                author=cls.author,
+                text=f'Тестовый пост {number}',
+                group=cls.group if number % 2 else None,
+            )
+        Comment.objects.create(
+            author=cls.user, post=cls.post, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ApiTests.user)
+
+    def test_cursor_pagination(self):
+        """Список постов листается курсорами до конца."""
+        url = reverse('api:v1:post_list') + '?limit=2'
+        texts = []
+        while url:
+            data = self.client.get(url).json()
+            texts.extend(post['text'] for post in data['results'])
+            url = data['next']
+
+        self.assertEqual(
+            texts, [f'Тестовый пост {number}' for number in range(4, -1, -1)]
+        )
+
+    def test_sparse_fields(self):
+        """?fields= оставляет только запрошенные поля."""
+        url = reverse('api:v1:group_posts', kwargs={'slug': 'test-slug'})
+
+        data = self.client.get(url, {'fields': 'id,group'}).json()
+        self.assertEqual(
+            data['results'][0],
+            {'id': ApiTests.post.pk - 1, 'group': 'test-slug'},
+        )
+        self.assertEqual(
+            self.client.get(url, {'fields': 'id,password'}).status_code, 400
+        )
+
+    def test_etag(self):
+        """Повторный запрос с If-None-Match получает 304 до изменений."""
+        url = reverse('api:v1:user_posts', kwargs={'username': 'author'})
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Post.objects.create(author=ApiTests.author, text='Новый пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['text'], 'Новый пост')
+
+    def test_export_streams_all_posts(self):
+        """Выгрузка отдает все посты потоком, в JSON и NDJSON."""
+        url = reverse('api:v1:post_export')
+
+        response = self.client.get(url, {'fields': 'text'})
+        self.assertTrue(response.streaming)
+        rows = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(rows), 5)
+
+        response = self.client.get(url, {'format': 'ndjson', 'author': 'x'})
+        self.assertEqual(b''.join(response.streaming_content), b'')
+
+    def test_comments_and_detail(self):
+        """Комментарии поста и сам пост."""
+        post = ApiTests.post
+        data = self.client.get(
+            reverse('api:v1:comment_list', kwargs={'post_id': post.pk})
+        ).json()
+        self.assertEqual(data['results'][0]['author'], 'reader')
+
+        data = self.client.get(
+            reverse('api:v1:post_detail', kwargs={'post_id': post.pk})
+        ).json()
+        self.assertEqual(data['text'], post.text)
+
+    def test_not_found_is_json(self):
+        """Несуществующие объекты — 404 с JSON, а не HTML-страница."""
+        urls = (
+            reverse('api:v1:post_detail', kwargs={'post_id': 0}),
+            reverse('api:v1:comment_list', kwargs={'post_id': 0}),
+            reverse('api:v1:group_posts', kwargs={'slug': 'missing'}),
+            reverse('api:v1:user_posts', kwargs={'username': 'missing'}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json(), {'detail': 'Не найдено.'})
+
+    def test_follow_requires_auth(self):
+        """Лента подписок доступна только авторизованным."""
+        url = reverse('api:v1:follow_posts')
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+        data = self.authorized_client.get(url).json()
+        self.assertEqual(len(data['results']), 5)
+        data = self.authorized_client.get(
+            reverse('api:v1:follow_authors')
+        ).json()
+        self.assertEqual(data['results'][0]['author'], 'author')
@@ -0,0 +1,33 @@
+from django.urls import include, path
+
+from . import views
+
+app_name = 'api'
+
+v1_patterns = [
+    path('posts/', views.post_list, name='post_list'),
+    path('posts/export/', views.post_export, name='post_export'),
+    path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.comment_list,
+        name='comment_list'
+    ),
+    path('groups/', views.group_list, name='group_list'),
+    path(
+        'groups/<slug:slug>/posts/',
+        views.group_posts,
+        name='group_posts'
+    ),
+    path(
+        'users/<str:username>/posts/',
+        views.user_posts,
+        name='user_posts'
+    ),
+    path('follow/posts/', views.follow_posts, name='follow_posts'),
+    path('follow/authors/', views.follow_authors, name='follow_authors'),
+]
+
+urlpatterns = [
+    path('v1/', include((v1_patterns, 'v1'))),
+]
@@ -0,0 +1,237 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.views.decorators.http import require_GET
+
+from posts import feed_cache, timeline
+from posts.models import Comment, Follow, Group, Post
+from posts.pagination import KeysetPaginator
+
+from .serializers import (COMMENT_FIELDS, FOLLOW_FIELDS, GROUP_FIELDS,
+                          POST_FIELDS, UnknownField, select_fields, serialize)
+
+User = get_user_model()
+
+
+def _error(detail, status=400):
+    return JsonResponse({'detail': detail}, status=status)
+
+
+def _not_found():
+    # get_object_or_404 отдал бы HTML-страницу 404 сайта.
+    return _error('Не найдено.', status=404)
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+    except ValueError:
+        return settings.API_PAGE_SIZE
+    return max(1, min(limit, settings.API_MAX_PAGE_SIZE))
+
+
+def _page_url(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+
+def _etag(request, scopes):
+    """ETag из поколений кеша: ответ не строится, пока данные не менялись.
+
+    Поколения сдвигают те же сигналы, что сбрасывают кеш HTML-страниц.
+    """
+    parts = [request.get_full_path(), str(request.user.pk)]
+    parts.extend(str(number) for number in feed_cache.generations(*scopes))
+    return '"{}"'.format(hashlib.md5('|'.join(parts).encode()).hexdigest())
+
+
+def _conditional(request, scopes, build):
+    etag = _etag(request, scopes)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = build()
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def _listing(request, queryset, resource, scopes, ordering=None):
+    """Страница ресурса с курсорной пагинацией и ?fields=."""
+    try:
+        names = select_fields(resource, request.GET.get('fields'))
+    except UnknownField as error:
+        return _error(f'Неизвестные поля: {error}')
+
+    def build():
+        paginator = KeysetPaginator(
+            queryset, _limit(request),
+            ordering=ordering or ('-pub_date', '-pk'),
+        )
+        page = paginator.get_page(request.GET.get('cursor'))
+        return JsonResponse({
+            'results': [serialize(resource, obj, names) for obj in page],
+            'next': _page_url(request, page.next_cursor),
+            'previous': _page_url(request, page.previous_cursor),
+        })
+
+    return _conditional(request, scopes, build)
+
+
+def _filter_posts(request):
+    posts = Post.objects.feed()
+    if request.GET.get('group'):
+        posts = posts.filter(group__slug=request.GET['group'])
+    if request.GET.get('author'):
+        posts = posts.filter(author__username=request.GET['author'])
+    return posts
+
+
+@require_GET
+def post_list(request):
+    return _listing(
+        request, _filter_posts(request), POST_FIELDS,
+        (feed_cache.index_scope(),),
+    )
+
+
+@require_GET
+def post_export(request):
+    """Все посты потоком: JSON-массив или NDJSON (?format=ndjson).
+
+    Строки читаются через iterator() и сериализуются по одной, поэтому
+    память не зависит от размера выборки.
+    """
+    try:
+        names = select_fields(POST_FIELDS, request.GET.get('fields'))
+    except UnknownField as error:
+        return _error(f'Неизвестные поля: {error}')
+    ndjson = request.GET.get('format') == 'ndjson'
+    posts = _filter_posts(request).iterator(
+        chunk_size=settings.API_EXPORT_CHUNK_SIZE
+    )
+
+    def dump(post):
+        return json.dumps(
+            serialize(POST_FIELDS, post, names),
+            cls=DjangoJSONEncoder,
+            ensure_ascii=False,
+        )
+
+    def ndjson_rows():
+        for post in posts:
+            yield dump(post) + '\n'
+
+    def array_rows():
+        yield '['
+        for number, post in enumerate(posts):
+            yield (',' if number else '') + dump(post)
+        yield ']'
+
+    if ndjson:
+        return StreamingHttpResponse(
+            ndjson_rows(), content_type='application/x-ndjson'
+        )
+    return StreamingHttpResponse(
+        array_rows(), content_type='application/json'
+    )
+
+
+@require_GET
+def post_detail(request, post_id):
+    try:
+        names = select_fields(POST_FIELDS, request.GET.get('fields'))
+    except UnknownField as error:
+        return _error(f'Неизвестные поля: {error}')
+
+    def build():
+        post = Post.objects.feed().filter(pk=post_id).first()
+        if post is None:
+            return _not_found()
+        return JsonResponse(serialize(POST_FIELDS, post, names))
+
+    return _conditional(
+        request,
+        (feed_cache.post_scope(post_id), feed_cache.groups_scope()),
+        build,
+    )
+
+
+@require_GET
+def comment_list(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        return _not_found()
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    )
+    return _listing(
+        request, comments, COMMENT_FIELDS,
+        (feed_cache.post_scope(post_id),),
+        ordering=('pub_date', 'pk'),
+    )
+
+
+@require_GET
+def group_list(request):
+    return _listing(
+        request, Group.objects.all(), GROUP_FIELDS,
+        (feed_cache.groups_scope(),),
+        ordering=('pk',),
+    )
+
+
+@require_GET
+def group_posts(request, slug):
+    group = Group.objects.filter(slug=slug).first()
+    if group is None:
+        return _not_found()
+    return _listing(
+        request, group.posts.feed(), POST_FIELDS,
+        (feed_cache.group_scope(group.pk),),
+    )
+
+
+@require_GET
+def user_posts(request, username):
+    author = User.objects.filter(username=username).first()
+    if author is None:
+        return _not_found()
+    return _listing(
+        request, author.posts.feed(), POST_FIELDS,
+        (feed_cache.author_scope(author.pk), feed_cache.groups_scope()),
+    )
+
+
+@require_GET
+def follow_posts(request):
+    if not request.user.is_authenticated:
+        return _error('Требуется авторизация.', status=401)
+    return _listing(
+        request, timeline.follow_feed(request.user), POST_FIELDS,
+        (
+            feed_cache.follow_scope(request.user.pk),
+            feed_cache.index_scope(),
+        ),
+    )
+
+
+@require_GET
+def follow_authors(request):
+    if not request.user.is_authenticated:
+        return _error('Требуется авторизация.', status=401)
+    follows = Follow.objects.filter(user=request.user).select_related(
+        'author'
+    )
+    return _listing(
+        request, follows, FOLLOW_FIELDS,
+        (feed_cache.follow_scope(request.user.pk),),
+        ordering=('-pk',),
+    )
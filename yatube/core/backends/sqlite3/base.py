@@ -0,0 +1,13 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite, в котором transaction.atomic() сразу берет блокировку записи.
+
+    Транзакция BEGIN (DEFERRED), которая сначала читает, а потом пишет
+    (get_or_create), в режиме WAL получает «database is locked» сразу, не
+    дожидаясь busy_timeout. BEGIN IMMEDIATE ждет очереди на запись заранее.
+    """
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -0,0 +1,464 @@
+"""Бэкенды кеша для нескольких процессов.
+
+TwoTierCache держит небольшой LRU в памяти процесса перед общим кешем
+(SQLiteCache, FileBasedCache, RedisCache) из CACHES. Ключи ленты
+неизменяемы — в них входит поколение (posts.feed_cache), поэтому их можно
+читать из памяти процесса. Сами поколения и другие счетчики
+(SHARED_ONLY_PREFIXES) всегда читаются из общего кеша: иначе процесс не
+увидел бы, что другой процесс сбросил ленту.
+"""
+import pickle
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+_MISSING = object()
+
+# Экземпляры бэкендов кеша у Django свои в каждом потоке, поэтому
+# память процесса и счетчики хранятся здесь, по LOCATION.
+_tiers = {}
+_stats = {}
+_lock = threading.Lock()
+
+
+class LocalTier:
+    """LRU на max_entries значений; каждое живет не дольше timeout секунд."""
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+        return pickle.loads(value)
+
+    def set(self, key, value, timeout=None):
+        if timeout is None or timeout > self.timeout:
+            timeout = self.timeout
+        # Как LocMemCache: копия, чтобы вызывающий код не менял значение
+        # в кеше.
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._data[key] = (time.monotonic() + timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def stats():
+    """Попадания в память процесса и в общий кеш по каждому TwoTierCache."""
+    with _lock:
+        counters = {name: Counter(found) for name, found in _stats.items()}
+    rows = []
+    for name, found in sorted(counters.items()):
+        total = sum(found.values())
+        hits = found['local'] + found['shared']
+        rows.append({
+            'cache': name,
+            'local_hits': found['local'],
+            'shared_hits': found['shared'],
+            'misses': found['miss'],
+            'hit_rate': hits / total if total else None,
+            'local_entries': len(_tiers[name]),
+        })
+    return rows
+
+
+def clear_stats():
+    with _lock:
+        for found in _stats.values():
+            found.clear()
+
+
+class TwoTierCache(BaseCache):
+    """Память процесса перед общим кешем.
+
+    LOCATION — имя для статистики, OPTIONS: SHARED — алиас общего кеша в
+    CACHES, LOCAL_MAX_ENTRIES, LOCAL_TIMEOUT — сколько значений держать в
+    памяти процесса и сколько секунд, SHARED_ONLY_PREFIXES — ключи, которые
+    читаются только из общего кеша.
+    """
+
+    def __init__(self, location, params):
+        options = params.get('OPTIONS', {})
+        super().__init__(params)
+        self.name = location or 'default'
+        self.shared = caches[options['SHARED']]
+        self.shared_only = tuple(options.get('SHARED_ONLY_PREFIXES', ()))
+        with _lock:
+            if self.name not in _tiers:
+                _tiers[self.name] = LocalTier(
+                    options.get('LOCAL_MAX_ENTRIES', 1000),
+                    options.get('LOCAL_TIMEOUT', 60),
+                )
+                _stats[self.name] = Counter()
+        self.local = _tiers[self.name]
+
+    def _count(self, tier, number=1):
+        if number:
+            with _lock:
+                _stats[self.name][tier] += number
+
+    def _local_key(self, key, version):
+        if key.startswith(self.shared_only):
+            return None
+        key = self.make_key(key, version)
+        self.validate_key(key)
+        return key
+
+    def _remember(self, local_key, value, timeout=DEFAULT_TIMEOUT):
+        if local_key is None:
+            return
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is not None:
+            timeout -= time.time()
+            if timeout <= 0:
+                self.local.delete(local_key)
+                return
+        self.local.set(local_key, value, timeout)
+
+    def get(self, key, default=None, version=None):
+        local_key = self._local_key(key, version)
+        if local_key is not None:
+            value = self.local.get(local_key)
+            if value is not _MISSING:
+                self._count('local')
+                return value
+        value = self.shared.get(key, _MISSING, version)
+        if value is _MISSING:
+            self._count('miss')
+            return default
+        self._count('shared')
+        self._remember(local_key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        found, missing = {}, []
+        for key in keys:
+            local_key = self._local_key(key, version)
+            value = (
+                _MISSING if local_key is None else self.local.get(local_key)
+            )
+            if value is _MISSING:
+                missing.append((key, local_key))
+            else:
+                found[key] = value
+        self._count('local', len(found))
+        if missing:
+            shared = self.shared.get_many(
+                [key for key, _ in missing], version
+            )
+            for key, local_key in missing:
+                if key in shared:
+                    self._remember(local_key, shared[key])
+            found.update(shared)
+            self._count('shared', len(shared))
+            self._count('miss', len(missing) - len(shared))
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version)
+        self._remember(self._local_key(key, version), value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version)
+        if added:
+            self._remember(self._local_key(key, version), value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self._forget(key, version)
+        return self.shared.delete(key, version)
+
+    def incr(self, key, delta=1, version=None):
+        self._forget(key, version)
+        return self.shared.incr(key, delta, version)
+
+    def has_key(self, key, version=None):
+        return self.shared.has_key(key, version)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def _forget(self, key, version):
+        local_key = self._local_key(key, version)
+        if local_key is not None:
+            self.local.delete(local_key)
+
+
+class SQLiteCache(BaseCache):
+    """Общий для процессов кеш в файле SQLite LOCATION (журнал WAL).
+
+    Значения хранятся в pickle; add() и incr() атомарны между процессами.
+    Просроченные записи удаляются при каждой CULL_EVERY-й записи, а когда
+    записей больше MAX_ENTRIES — еще и 1/CULL_FREQUENCY самых старых.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.cull_every = int(options.get('CULL_EVERY', 100))
+        self._db = None
+        self._writes = 0
+
+    def _connection(self):
+        if self._db is None:
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute('PRAGMA journal_mode = WAL')
+            db.execute('PRAGMA synchronous = NORMAL')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+            )
+            self._db = db
+        return self._db
+
+    def _key(self, key, version):
+        key = self.make_key(key, version)
+        self.validate_key(key)
+        return key
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        found = {}
+        names = list(keys)
+        # Не больше 999 параметров в одном запросе SQLite.
+        for start in range(0, len(names), 500):
+            chunk = names[start:start + 500]
+            rows = self._connection().execute(
+                'SELECT key, value FROM cache WHERE key IN ({}) '
+                'AND (expires IS NULL OR expires > ?)'.format(
+                    ', '.join('?' * len(chunk))
+                ),
+                (*chunk, time.time()),
+            )
+            for name, value in rows:
+                found[keys[name]] = pickle.loads(value)
+        return found
+
+    def _dump(self, value, timeout):
+        return (
+            pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+            self.get_backend_timeout(timeout),
+        )
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._connection().execute(
+            'INSERT OR REPLACE INTO cache VALUES (?, ?, ?)',
+            (self._key(key, version), *self._dump(value, timeout)),
+        )
+        self._wrote()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self._connection().execute(
+            'INSERT INTO cache VALUES (?, ?, ?) ON CONFLICT (key) DO UPDATE '
+            'SET value = excluded.value, expires = excluded.expires '
+            'WHERE expires IS NOT NULL AND expires <= ?',
+            (self._key(key, version), *self._dump(value, timeout),
+             time.time()),
+        )
+        self._wrote()
+        return cursor.rowcount == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self._connection().execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), self._key(key, version),
+             time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        cursor = self._connection().execute(
+            'DELETE FROM cache WHERE key = ?', (self._key(key, version),)
+        )
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        db = self._connection()
+        key = self._key(key, version)
+        # BEGIN IMMEDIATE: между чтением и записью никто не изменит ключ.
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (key, time.time()),
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            db.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), key),
+            )
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        return value
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version) is not _MISSING
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def _wrote(self):
+        self._writes += 1
+        if self._writes % self.cull_every == 0:
+            self._cull()
+
+    def _cull(self):
+        db = self._connection()
+        db.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        count = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries:
+            db.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires IS NULL, expires LIMIT ?)',
+                (count // self._cull_frequency,),
+            )
+
+
+class RedisCache(BaseCache):
+    """Кеш в Redis или совместимом сервере (LOCATION — redis:// URL).
+
+    Нужен пакет redis. Целые числа хранятся как есть, чтобы incr() был
+    атомарным INCRBY; остальное — в pickle.
+    """
+
+    _clients = {}
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        try:
+            import redis
+        except ImportError as error:
+            raise InvalidCacheBackendError(
+                'Для RedisCache нужен пакет redis.'
+            ) from error
+        with _lock:
+            if location not in self._clients:
+                self._clients[location] = redis.Redis.from_url(location)
+        self.client = self._clients[location]
+
+    def _key(self, key, version):
+        key = self.make_key(key, version)
+        self.validate_key(key)
+        return key
+
+    @staticmethod
+    def _dump(value):
+        if type(value) is int:
+            return str(value).encode()
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _load(data):
+        try:
+            return int(data)
+        except ValueError:
+            return pickle.loads(data)
+
+    def _expiry(self, timeout):
+        """Срок в миллисекундах: None — без срока, 0 — уже истек."""
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return None
+        return max(0, int(timeout * 1000))
+
+    def get(self, key, default=None, version=None):
+        data = self.client.get(self._key(key, version))
+        return default if data is None else self._load(data)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self.client.mget([self._key(key, version) for key in keys])
+        return {
+            key: self._load(data)
+            for key, data in zip(keys, values) if data is not None
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._set(key, value, timeout, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._set(key, value, timeout, version, nx=True)
+
+    def _set(self, key, value, timeout, version, nx=False):
+        key = self._key(key, version)
+        expiry = self._expiry(timeout)
+        if expiry == 0:
+            if nx:
+                return False
+            self.client.delete(key)
+            return True
+        return bool(self.client.set(key, self._dump(value), px=expiry, nx=nx))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        expiry = self._expiry(timeout)
+        if expiry is None:
+            return bool(self.client.persist(key)) or self.has_key(key)
+        return bool(self.client.pexpire(key, expiry))
+
+    def delete(self, key, version=None):
+        return bool(self.client.delete(self._key(key, version)))
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            self.client.delete(*keys)
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        if not self.client.exists(key):
+            raise ValueError(f"Key '{key}' not found")
+        return self.client.incrby(key, delta)
+
+    def has_key(self, key, version=None):
+        return bool(self.client.exists(self._key(key, version)))
+
+    def clear(self):
+        # Только свои ключи: база Redis может быть общей.
+        keys = list(self.client.scan_iter(match=f'{self.key_prefix}:*'))
+        for start in range(0, len(keys), 1000):
+            self.client.delete(*keys[start:start + 1000])
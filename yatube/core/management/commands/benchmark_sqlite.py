@@ -0,0 +1,61 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import sqlite
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает одновременную работу читателей и писателей с SQLite '
+        'при настройках по умолчанию и с SQLITE_PRAGMAS. База создается во '
+        'временном каталоге, рабочая база не затрагивается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--readers',
+            type=int,
+            default=4,
+            help='Сколько потоков читают.',
+        )
+        parser.add_argument(
+            '--writers',
+            type=int,
+            default=2,
+            help='Сколько потоков пишут.',
+        )
+        parser.add_argument(
+            '--seconds',
+            type=float,
+            default=5.0,
+            help='Сколько секунд длится каждый прогон.',
+        )
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=10000,
+            help='Сколько строк в базе перед прогоном.',
+        )
+
+    def handle(self, *args, readers, writers, seconds, rows, **options):
+        self.stdout.write(
+            f'{"настройки":<12}{"операция":<10}{"в сек.":>10}'
+            f'{"p95, мс":>10}{"ошибок":>8}'
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'benchmark.sqlite3')
+            for label, pragmas in (
+                ('default', sqlite.DEFAULT_PRAGMAS),
+                ('configured', settings.SQLITE_PRAGMAS),
+            ):
+                result = sqlite.concurrency_benchmark(
+                    path, pragmas, readers, writers, seconds, rows
+                )
+                for operation, row in result.items():
+                    self.stdout.write(
+                        f'{label:<12}{operation:<10}{row["per_second"]:>10}'
+                        f'{str(row["p95_ms"]):>10}{row["errors"]:>8}'
+                    )
@@ -0,0 +1,46 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core import replicas
+
+
+class Command(BaseCommand):
+    help = (
+        'Локальная замена репликации: копирует базу SQLite default в базу '
+        'реплики, один раз или каждые --interval секунд.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default=settings.DATABASE_REPLICA or 'replica',
+            help='Алиас базы-реплики из DATABASES.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Повторять копирование с таким интервалом (0 — один раз).',
+        )
+
+    def handle(self, *args, database, interval, **options):
+        if database not in settings.DATABASES:
+            raise CommandError(f'В DATABASES нет базы {database}.')
+        aliases = (DEFAULT_DB_ALIAS, database)
+        if any(connections[alias].vendor != 'sqlite' for alias in aliases):
+            raise CommandError('Копировать можно только базы SQLite.')
+        source, target = (
+            connections[alias].settings_dict['NAME'] for alias in aliases
+        )
+        while True:
+            started = time.perf_counter()
+            replicas.copy_sqlite(source, target)
+            self.stdout.write(
+                f'Реплика обновлена за {time.perf_counter() - started:.2f} с'
+            )
+            if not interval:
+                break
+            time.sleep(interval)
@@ -0,0 +1,61 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import profiling, replicas
+
+
+class ProfilingMiddleware:
+    """Замеряет запрос и отдает разбивку в заголовке Server-Timing.
+
+    Подключается, только если PROFILING_ENABLED; замеры копятся в
+    profiling.stats по имени URL.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        profiling.install()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with profiling.profile() as profile, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile.sql))
+            response = self.get_response(request)
+
+        response['Server-Timing'] = profile.server_timing()
+        match = request.resolver_match
+        if match is not None:
+            profiling.stats.add(match.view_name, profile.sample())
+        return response
+
+
+class ReplicaPinMiddleware:
+    """После записи в базу посетитель какое-то время читает из default.
+
+    Ставит cookie REPLICA_PIN_COOKIE со временем окончания, которое
+    проверяет replicas.replica_reads. Подключается, только если задана
+    DATABASE_REPLICA.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICA:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        replicas.start_request()
+        response = self.get_response(request)
+        if replicas.wrote():
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                str(time.time() + settings.REPLICA_PIN_SECONDS),
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
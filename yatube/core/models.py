@@ -1,12 +1,35 @@
+from contextlib import contextmanager
+
 from django.db import models
 
 
 class CreatedModel(models.Model):
-    """Абстрактная модель. Добавляет дату создания."""
+    """Абстрактная модель. Добавляет даты создания и изменения."""
     pub_date = models.DateTimeField(
         'Дата публикации',
         auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
 
     class Meta:
         abstract = True
+
+
+@contextmanager
+def explicit_pub_date(*models):
+    """Позволяет задать pub_date вручную, несмотря на auto_now_add.
+
+    Меняет поле модели во всем процессе: только для команд пакетной
+    загрузки, не для запросов.
+    """
+    fields = [model._meta.get_field('pub_date') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
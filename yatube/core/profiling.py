@@ -0,0 +1,206 @@
+"""Профилирование запросов: SQL, шаблоны, кеш и миниатюры.
+
+Middleware (core.middleware.ProfilingMiddleware) открывает Profile на
+время запроса; обертки, которые install() ставит на шаблоны, кеш и sorl,
+пишут в него, только если профиль открыт в текущем потоке.
+"""
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+
+_local = threading.local()
+_installed = False
+_MISSING = object()
+
+
+class Profile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished = None
+        self.timings = defaultdict(float)
+        self.counters = Counter()
+        self._depth = Counter()
+
+    @property
+    def total(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    def sql(self, execute, sql, params, many, context):
+        """Обертка для connection.execute_wrapper()."""
+        self.counters['sql'] += 1
+        with self.span('sql'):
+            return execute(sql, params, many, context)
+
+    @contextmanager
+    def span(self, name):
+        """Добавляет время блока к timings[name].
+
+        Вложенные блоки с тем же именем (include внутри шаблона, get()
+        внутри get_many()) не считаются второй раз.
+        """
+        self._depth[name] += 1
+        started = time.perf_counter()
+        try:
+            yield self._depth[name] == 1
+        finally:
+            self._depth[name] -= 1
+            if not self._depth[name]:
+                self.timings[name] += time.perf_counter() - started
+
+    def server_timing(self):
+        """Значение заголовка Server-Timing."""
+        metrics = [
+            f'sql;dur={self.timings["sql"] * 1000:.1f};'
+            f'desc="{self.counters["sql"]} queries"',
+            f'tpl;dur={self.timings["template"] * 1000:.1f}',
+            f'cache;dur={self.timings["cache"] * 1000:.1f};'
+            f'desc="{self.counters["cache_hits"]} hits, '
+            f'{self.counters["cache_misses"]} misses"',
+            f'thumb;dur={self.timings["thumbnail"] * 1000:.1f}',
+            f'total;dur={self.total * 1000:.1f}',
+        ]
+        return ', '.join(metrics)
+
+    def sample(self):
+        return {
+            'total': self.total * 1000,
+            'sql': self.timings['sql'] * 1000,
+            'sql_count': self.counters['sql'],
+            'template': self.timings['template'] * 1000,
+            'cache_hits': self.counters['cache_hits'],
+            'cache_misses': self.counters['cache_misses'],
+            'thumbnail': self.timings['thumbnail'] * 1000,
+        }
+
+
+def current():
+    return getattr(_local, 'profile', None)
+
+
+@contextmanager
+def profile():
+    _local.profile = Profile()
+    try:
+        yield _local.profile
+    finally:
+        _local.profile.finished = time.perf_counter()
+        _local.profile = None
+
+
+def _timed(name, func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = current()
+        if profile is None:
+            return func(*args, **kwargs)
+        with profile.span(name):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def _cache_get(func):
+    @wraps(func)
+    def get(self, key, default=None, version=None):
+        profile = current()
+        if profile is None:
+            return func(self, key, default, version)
+        with profile.span('cache') as outer:
+            value = func(self, key, _MISSING, version)
+        if outer:
+            hit = value is not _MISSING
+            profile.counters['cache_hits' if hit else 'cache_misses'] += 1
+        return default if value is _MISSING else value
+    return get
+
+
+def _cache_get_many(func):
+    @wraps(func)
+    def get_many(self, keys, version=None):
+        profile = current()
+        if profile is None:
+            return func(self, keys, version)
+        keys = list(keys)
+        with profile.span('cache') as outer:
+            values = func(self, keys, version)
+        if outer:
+            profile.counters['cache_hits'] += len(values)
+            profile.counters['cache_misses'] += len(keys) - len(values)
+        return values
+    return get_many
+
+
+def install():
+    """Ставит обертки на рендеринг шаблонов, кеш и sorl-thumbnail."""
+    global _installed
+    if _installed:
+        return
+    from django.core.cache import caches
+    from django.template.base import Template
+    from sorl.thumbnail.base import ThumbnailBackend
+
+    Template.render = _timed('template', Template.render)
+    ThumbnailBackend.get_thumbnail = _timed(
+        'thumbnail', ThumbnailBackend.get_thumbnail
+    )
+    for backend in {type(caches[alias]) for alias in settings.CACHES}:
+        backend.get = _cache_get(backend.get)
+        backend.get_many = _cache_get_many(backend.get_many)
+    _installed = True
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Stats:
+    """Последние PROFILING_SAMPLES замеров по каждому имени URL."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(
+            lambda: deque(maxlen=settings.PROFILING_SAMPLES)
+        )
+
+    def add(self, view_name, sample):
+        with self._lock:
+            self._samples[view_name].append(sample)
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+    def summary(self):
+        with self._lock:
+            samples = {
+                name: list(values) for name, values in self._samples.items()
+            }
+        rows = []
+        for name, values in sorted(samples.items()):
+            totals = [sample['total'] for sample in values]
+            rows.append({
+                'view': name,
+                'requests': len(values),
+                'p50': percentile(totals, 0.5),
+                'p95': percentile(totals, 0.95),
+                'p99': percentile(totals, 0.99),
+                'sql': percentile([s['sql'] for s in values], 0.5),
+                'sql_count': percentile(
+                    [s['sql_count'] for s in values], 0.5
+                ),
+                'template': percentile([s['template'] for s in values], 0.5),
+                'thumbnail': percentile(
+                    [s['thumbnail'] for s in values], 0.5
+                ),
+                'cache_hits': sum(s['cache_hits'] for s in values),
+                'cache_misses': sum(s['cache_misses'] for s in values),
+            })
+        return rows
+
+
+stats = Stats()
@@ -0,0 +1,87 @@
+"""Ограничение частоты отправки форм: скользящее окно в кеше.
+
+У каждого пользователя (у гостя — у IP) для каждого вида отправки за
+любые burst / rate секунд проходит не больше RATE_LIMITS[scope]['burst']
+отправок. Время делится на окна такой длины, отправки окна считает
+счетчик в кеше, а отправки предыдущего окна учитываются с весом, который
+убывает к концу текущего. Сверх лимита view не вызывается, и посетитель
+получает 429 с заголовком Retry-After.
+
+Счетчик меняется только атомарными add() и incr() кеша, поэтому
+одновременные отправки одного посетителя не проходят сверх лимита.
+"""
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import render
+
+KEY = 'ratelimit:{}:{}:{}'
+
+
+def client_id(request):
+    if request.user.is_authenticated:
+        return f'user-{request.user.pk}'
+    return 'ip-{}'.format(request.META.get('REMOTE_ADDR', ''))
+
+
+def _hit(key, timeout):
+    """Увеличивает счетчик окна и возвращает новое значение."""
+    if cache.add(key, 1, timeout):
+        return 1
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Счетчик истек между add() и incr().
+        return 1 if cache.add(key, 1, timeout) else cache.incr(key)
+
+
+def _wait(previous, accepted, burst, window, elapsed):
+    """Через сколько секунд пройдет следующая отправка."""
+    free = burst - accepted - 1
+    if free >= 0:
+        # В этом окне: когда вес предыдущего окна освободит место.
+        return (1 - free / previous) * window - elapsed
+    # В следующем окне предыдущим станет текущее.
+    return window - elapsed + max(0, 1 - (burst - 1) / accepted) * window
+
+
+def take(scope, ident):
+    """Учитывает отправку; возвращает 0 или сколько секунд ждать."""
+    limit = settings.RATE_LIMITS.get(scope)
+    if not limit:
+        return 0
+    burst = limit['burst']
+    window = burst / limit['rate']
+    now = time.time()
+    number = int(now // window)
+    elapsed = now - number * window
+    # Счетчик нужен и следующему окну как предыдущий.
+    current = _hit(KEY.format(scope, ident, number), math.ceil(2 * window))
+    previous = cache.get(KEY.format(scope, ident, number - 1), 0)
+    if previous * (1 - elapsed / window) + current <= burst:
+        return 0
+    # Отклоненная отправка не занимает места в окне.
+    cache.decr(KEY.format(scope, ident, number))
+    return _wait(previous, current - 1, burst, window, elapsed)
+
+
+def rate_limited(scope):
+    """Ограничивает POST-запросы view лимитом RATE_LIMITS[scope]."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method == 'POST':
+                wait = math.ceil(take(scope, client_id(request)))
+                if wait:
+                    response = render(
+                        request, 'core/429.html', {'retry_after': wait},
+                        status=429,
+                    )
+                    response['Retry-After'] = str(wait)
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
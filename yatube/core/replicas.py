@@ -0,0 +1,112 @@
+"""Чтение из реплики базы для view, которым не нужна свежая запись.
+
+View, обернутые в replica_reads, читают из базы DATABASE_REPLICA, запись
+всегда идет в default. После записи ReplicaPinMiddleware ставит посетителю
+cookie, и REPLICA_PIN_SECONDS секунд он читает из default: так он сразу
+видит свои изменения, даже если реплика отстает.
+"""
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Приложения, которые всегда читаются из default: сессия нужна сразу
+# после входа.
+PRIMARY_ONLY_APPS = {'sessions'}
+
+_state = threading.local()
+
+
+def reading_from_replica():
+    return bool(settings.DATABASE_REPLICA) and getattr(
+        _state, 'replica', False
+    )
+
+
+@contextmanager
+def use_replica(enabled=True):
+    previous = getattr(_state, 'replica', False)
+    _state.replica = enabled
+    try:
+        yield
+    finally:
+        _state.replica = previous
+
+
+def start_request():
+    _state.wrote = False
+
+
+def wrote():
+    """Была ли запись в базу с начала запроса."""
+    return getattr(_state, 'wrote', False)
+
+
+def is_pinned(request):
+    try:
+        until = float(request.COOKIES.get(settings.REPLICA_PIN_COOKIE, 0))
+    except ValueError:
+        return False
+    return until > time.time()
+
+
+def replica_reads(view):
+    """Чтения view идут в реплику, если посетитель недавно не писал."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or is_pinned(request):
+            return view(request, *args, **kwargs)
+        with use_replica():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+def cache_timeout(timeout):
+    """Срок кеша для данных, прочитанных в текущем потоке.
+
+    Данные из реплики кешируются не дольше REPLICA_PIN_SECONDS: прочитанные
+    до того, как реплика догнала default, они иначе пролежали бы в кеше
+    под новым поколением весь срок.
+    """
+    if not reading_from_replica():
+        return timeout
+    if timeout is None:
+        return settings.REPLICA_PIN_SECONDS
+    return min(timeout, settings.REPLICA_PIN_SECONDS)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (reading_from_replica()
+                and model._meta.app_label not in PRIMARY_ONLY_APPS):
+            return settings.DATABASE_REPLICA
+        # Явно: иначе объекты, прочитанные из реплики, тянули бы туда же
+        # и связанные с ними запросы.
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # В реплике те же данные, что в default.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплика получает схему вместе с данными.
+        return db == DEFAULT_DB_ALIAS
+
+
+def copy_sqlite(source, target):
+    """Копирует базу SQLite source в файл target (online backup API).
+
+    Локальная замена репликации: источник во время копирования доступен
+    для записи, читатели target видят прежнюю копию до конца копирования.
+    """
+    with closing(sqlite3.connect(source)) as primary, \
+            closing(sqlite3.connect(target)) as replica:
+        primary.backup(replica)
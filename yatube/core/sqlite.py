@@ -0,0 +1,135 @@
+"""Настройка соединений с SQLite и замер конкурентного доступа.
+
+configure_connection() применяет SQLITE_PRAGMAS к каждому новому
+соединению Django. concurrency_benchmark() нагружает отдельный файл базы
+читателями и писателями, чтобы сравнить разные наборы PRAGMA.
+"""
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .profiling import percentile
+
+# Настройки SQLite по умолчанию: журнал отката и fsync на каждый commit.
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'DELETE',
+    'synchronous': 'FULL',
+}
+
+_SCHEMA = (
+    'CREATE TABLE post (id INTEGER PRIMARY KEY, text TEXT, pub_date REAL)',
+    'CREATE INDEX post_date ON post (pub_date)',
+    'CREATE TABLE stats (id INTEGER PRIMARY KEY, total INTEGER)',
+    'INSERT INTO stats VALUES (1, 0)',
+)
+
+
+def pragma_statements(pragmas):
+    return [f'PRAGMA {name} = {value}' for name, value in pragmas.items()]
+
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    """Применяет SQLITE_PRAGMAS к новому соединению с SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for statement in pragma_statements(settings.SQLITE_PRAGMAS):
+            cursor.execute(statement)
+
+
+def _connect(path, pragmas):
+    db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    for statement in pragma_statements(pragmas):
+        db.execute(statement)
+    return db
+
+
+def _read(db):
+    # Как лента: первая страница постов и счетчик.
+    db.execute(
+        'SELECT id, text FROM post ORDER BY pub_date DESC LIMIT 10'
+    ).fetchall()
+    db.execute('SELECT total FROM stats WHERE id = 1').fetchone()
+
+
+def _write(db):
+    # Как add_comment: запись и счетчик в одной транзакции.
+    db.execute('BEGIN')
+    db.execute(
+        'INSERT INTO post (text, pub_date) VALUES (?, ?)',
+        ('Комментарий из бенчмарка', time.time()),
+    )
+    db.execute('UPDATE stats SET total = total + 1 WHERE id = 1')
+    db.execute('COMMIT')
+
+
+def _create(path, pragmas, rows):
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    db = _connect(path, pragmas)
+    for statement in _SCHEMA:
+        db.execute(statement)
+    db.execute('BEGIN')
+    db.executemany(
+        'INSERT INTO post (text, pub_date) VALUES (?, ?)',
+        ((f'Пост {number}', number) for number in range(rows)),
+    )
+    db.execute('COMMIT')
+    db.close()
+
+
+def concurrency_benchmark(path, pragmas, readers=4, writers=2, seconds=3.0,
+                          rows=10000):
+    """Читатели и писатели одновременно работают с базой path.
+
+    База создается заново и заполняется rows строками. Возвращает число
+    операций в секунду, p95 их времени (мс) и число ошибок
+    («database is locked») для чтения и записи.
+    """
+    _create(path, pragmas, rows)
+    deadline = time.perf_counter() + seconds
+
+    def worker(operation):
+        db = _connect(path, pragmas)
+        timings, errors = [], 0
+        try:
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    operation(db)
+                except sqlite3.OperationalError:
+                    errors += 1
+                    if db.in_transaction:
+                        db.execute('ROLLBACK')
+                else:
+                    timings.append(time.perf_counter() - started)
+        finally:
+            db.close()
+        return operation, timings, errors
+
+    operations = [_read] * readers + [_write] * writers
+    with ThreadPoolExecutor(max_workers=len(operations)) as executor:
+        finished = list(executor.map(worker, operations))
+
+    result = {}
+    for name, operation in (('read', _read), ('write', _write)):
+        timings = [
+            elapsed * 1000
+            for done, measured, _ in finished if done is operation
+            for elapsed in measured
+        ]
+        result[name] = {
+            'per_second': round(len(timings) / seconds, 1),
+            'p95_ms': round(percentile(timings, 0.95), 2) if timings else None,
+            'errors': sum(
+                errors for done, _, errors in finished if done is operation
+            ),
+        }
+    return result
@@ -0,0 +1,125 @@
+import os
+import tempfile
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from .. import cache as two_tier
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cache.sqlite3')
+
+    def make_cache(self, **options):
+        return two_tier.SQLiteCache(self.path, {'OPTIONS': options})
+
+    def test_shared_between_instances(self):
+        """Экземпляры с одним файлом (как разные процессы) видят записи."""
+        first, second = self.make_cache(), self.make_cache()
+        first.set('post', {'text': 'Тестовый пост'})
+        first.set('gen', 1, None)
+
+        self.assertEqual(second.get('post'), {'text': 'Тестовый пост'})
+        self.assertEqual(second.incr('gen'), 2)
+        self.assertEqual(first.get_many(['gen', 'nope']), {'gen': 2})
+        self.assertFalse(second.add('post', 'другое'))
+        self.assertTrue(second.delete('post'))
+        self.assertTrue(second.add('post', 'другое'))
+        with self.assertRaises(ValueError):
+            first.incr('nope')
+
+    def test_expired(self):
+        """Просроченные записи не читаются, add() их перезаписывает."""
+        cache = self.make_cache()
+        cache.set('post', 'старое', 0)
+
+        self.assertIsNone(cache.get('post'))
+        self.assertTrue(cache.add('post', 'новое'))
+        self.assertEqual(cache.get('post'), 'новое')
+
+    def test_cull(self):
+        """Записей остается не больше MAX_ENTRIES."""
+        cache = two_tier.SQLiteCache(self.path, {
+            'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 2,
+                        'CULL_EVERY': 5},
+        })
+        for number in range(30):
+            cache.set(f'post-{number}', number)
+
+        rows = cache._connection().execute('SELECT COUNT(*) FROM cache')
+        self.assertLessEqual(rows.fetchone()[0], 10)
+        self.assertEqual(cache.get('post-29'), 29)
+
+
+class TwoTierCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(CACHES={
+            'default': {
+                'BACKEND': 'core.cache.TwoTierCache',
+                'LOCATION': 'test',
+                'OPTIONS': {
+                    'SHARED': 'shared',
+                    'LOCAL_MAX_ENTRIES': 2,
+                    'SHARED_ONLY_PREFIXES': ('feed-gen:',),
+                },
+            },
+            'shared': {
+                'BACKEND': 'core.cache.SQLiteCache',
+                'LOCATION': os.path.join(directory.name, 'cache.sqlite3'),
+            },
+        })
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.cache, self.shared = caches['default'], caches['shared']
+        self.cache.clear()
+        two_tier.clear_stats()
+
+    def hits(self):
+        [row] = [row for row in two_tier.stats() if row['cache'] == 'test']
+        return row
+
+    def test_tiers(self):
+        """Повторное чтение берется из памяти процесса, счетчики растут."""
+        self.shared.set('page', 'Тестовый пост')
+
+        self.assertEqual(self.cache.get('page'), 'Тестовый пост')
+        self.assertEqual(self.cache.get_many(['page', 'nope']),
+                         {'page': 'Тестовый пост'})
+        self.assertIsNone(self.cache.get('nope'))
+
+        row = self.hits()
+        self.assertEqual(
+            (row['shared_hits'], row['local_hits'], row['misses']), (1, 1, 2)
+        )
+        self.assertEqual(row['hit_rate'], 0.5)
+
+    def test_generations_read_from_shared(self):
+        """Поколение, измененное другим процессом, видно сразу."""
+        self.cache.set('feed-gen:index', 1, None)
+        self.cache.set('page', 'старое')
+        self.assertEqual(self.cache.get('feed-gen:index'), 1)
+        # Другой процесс пишет прямо в общий кеш.
+        self.shared.incr('feed-gen:index')
+        self.shared.set('page', 'новое')
+
+        self.assertEqual(self.cache.get('feed-gen:index'), 2)
+        self.assertEqual(self.cache.get('page'), 'старое')
+        self.assertEqual(self.cache.incr('feed-gen:index'), 3)
+
+    def test_lru_and_clear(self):
+        """В памяти процесса — только последние значения, clear() — везде."""
+        for key in ('first', 'second', 'third'):
+            self.cache.set(key, key)
+        self.assertEqual(self.hits()['local_entries'], 2)
+
+        self.cache.get('first')
+        self.assertEqual(self.hits()['shared_hits'], 1)
+
+        self.cache.clear()
+        self.assertIsNone(self.shared.get('third'))
+        self.assertEqual(self.hits()['local_entries'], 0)
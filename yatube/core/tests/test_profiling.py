@@ -0,0 +1,68 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+from .. import profiling
+
+User = get_user_model()
+
+
+@override_settings(PROFILING_ENABLED=True)
+class ProfilingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        profiling.stats.clear()
+        # Middleware подключается при создании клиента.
+        self.client = Client()
+
+    def test_server_timing_header(self):
+        """Ответ содержит разбивку времени по SQL, шаблонам и кешу."""
+        response = self.client.get(reverse('posts:index'))
+
+        header = response['Server-Timing']
+        for metric in ('sql;', 'tpl;', 'cache;', 'thumb;', 'total;'):
+            self.assertIn(metric, header)
+        self.assertRegex(header, r'desc="[1-9]\d* queries"')
+        self.assertRegex(header, r'desc="\d+ hits, [1-9]\d* misses"')
+
+    def test_cache_hits_counted(self):
+        """Повторный запрос главной берется из кеша."""
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+
+        first, second = profiling.stats._samples['posts:index']
+        self.assertGreater(second['cache_hits'], first['cache_hits'])
+        self.assertLess(second['sql_count'], first['sql_count'])
+
+    def test_dashboard_for_staff_only(self):
+        """Дашборд показывает перцентили и закрыт от обычных пользователей."""
+        url = reverse('core:profiling')
+        self.client.get(reverse('posts:index'))
+
+        self.client.force_login(ProfilingMiddlewareTests.user)
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(ProfilingMiddlewareTests.staff)
+        response = self.client.get(url)
+        views = [row['view'] for row in response.context['rows']]
+        self.assertIn('posts:index', views)
+        caches = [row['cache'] for row in response.context['caches']]
+        self.assertIn('default', caches)
+        self.assertIn('batches', response.context['thumbnails'])
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_disabled(self):
+        """Выключенное профилирование не добавляет заголовок."""
+        response = Client().get(reverse('posts:index'))
+
+        self.assertFalse(response.has_header('Server-Timing'))
@@ -0,0 +1,97 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Post
+
+from .. import ratelimit
+
+User = get_user_model()
+
+
+@override_settings(RATE_LIMITS={'comment': {'rate': 1, 'burst': 2}})
+class RateLimitTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(RateLimitTests.user)
+
+    def comment(self, client):
+        return client.post(
+            reverse('posts:add_comment', args=(RateLimitTests.post.pk,)),
+            data={'text': 'Тестовый комментарий'},
+        )
+
+    def test_burst_then_429(self):
+        """Сверх burst отправок подряд — 429 с Retry-After."""
+        with mock.patch('core.ratelimit.time.time', return_value=1000.0):
+            statuses = [
+                self.comment(self.authorized_client).status_code
+                for _ in range(3)
+            ]
+            response = self.comment(self.authorized_client)
+
+        self.assertEqual(statuses, [302, 302, 429])
+        # Окно — 2 с; в следующем две прежние отправки весят 2 * (1 - 1/2).
+        self.assertEqual(response['Retry-After'], '3')
+        self.assertEqual(Comment.objects.count(), 2)
+
+    def test_window_slides(self):
+        """Отправки прошлого окна весят все меньше, у других — свой счет."""
+        with mock.patch('core.ratelimit.time.time') as now:
+            now.return_value = 1000.0
+            for _ in range(2):
+                self.comment(self.authorized_client)
+            self.assertEqual(ratelimit.take('comment', 'ip-127.0.0.1'), 0)
+            now.return_value = 1002.0
+            self.assertEqual(
+                self.comment(self.authorized_client).status_code, 429
+            )
+            now.return_value = 1003.0
+            self.assertEqual(
+                self.comment(self.authorized_client).status_code, 302
+            )
+
+    def test_parallel_submissions(self):
+        """Одновременные отправки не проходят сверх лимита."""
+        barrier = threading.Barrier(8)
+
+        class ConcurrentCache:
+            """Все отправки читают кеш, прежде чем кто-то в него запишет."""
+
+            def get(self, *args, **kwargs):
+                value = cache.get(*args, **kwargs)
+                barrier.wait(timeout=5)
+                return value
+
+            def __getattr__(self, name):
+                return getattr(cache, name)
+
+        with mock.patch('core.ratelimit.time.time', return_value=1000.0), \
+                mock.patch('core.ratelimit.cache', ConcurrentCache()), \
+                ThreadPoolExecutor(max_workers=8) as executor:
+            waits = list(executor.map(
+                lambda _: ratelimit.take('comment', 'user-1'), range(8)
+            ))
+
+        self.assertEqual(waits.count(0), 2)
+
+    def test_get_not_limited(self):
+        """Лимит считает только отправки форм."""
+        with mock.patch('core.ratelimit.time.time', return_value=1000.0):
+            for _ in range(3):
+                self.comment(self.authorized_client)
+            response = self.authorized_client.get(reverse('posts:index'))
+
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,100 @@
+import os
+import sqlite3
+import tempfile
+from contextlib import closing
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import connections
+from django.test import (Client, SimpleTestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+
+from .. import replicas
+
+User = get_user_model()
+
+
+# TransactionTestCase: реплика в тестах — отдельное соединение с той же
+# базой, и данные должны быть закоммичены, чтобы она их видела.
+@override_settings(DATABASE_REPLICA='replica')
+class ReplicaTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        Post.objects.create(author=self.user, text='Тестовый пост')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def replica_queries(self, client, url):
+        with CaptureQueriesContext(connections['replica']) as captured:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(captured)
+
+    def test_feeds_read_from_replica(self):
+        """Ленты читаются из реплики, сессия — из основной базы."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertGreater(
+                    self.replica_queries(self.authorized_client, url), 0
+                )
+
+        router = replicas.ReplicaRouter()
+        with replicas.use_replica():
+            self.assertEqual(router.db_for_read(Post), 'replica')
+            self.assertEqual(router.db_for_read(Session), 'default')
+            self.assertEqual(router.db_for_write(Post), 'default')
+
+    def test_write_pins_primary(self):
+        """После записи посетитель читает из основной базы."""
+        response = self.authorized_client.post(
+            reverse('posts:post_create'), data={'text': 'Новый пост'}
+        )
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+        self.assertEqual(
+            self.replica_queries(self.authorized_client, response.url), 0
+        )
+        # Гость ничего не записывал.
+        self.assertGreater(
+            self.replica_queries(Client(), reverse('posts:index')), 0
+        )
+
+    def test_replica_cache_timeout(self):
+        """Данные из реплики живут в кеше не дольше окна закрепления."""
+        self.assertEqual(replicas.cache_timeout(900), 900)
+        with replicas.use_replica():
+            self.assertEqual(
+                replicas.cache_timeout(900), settings.REPLICA_PIN_SECONDS
+            )
+
+
+class CopySqliteTests(SimpleTestCase):
+    def test_copy(self):
+        """Копия базы SQLite содержит данные источника."""
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'primary.sqlite3')
+            target = os.path.join(directory, 'replica.sqlite3')
+            with closing(sqlite3.connect(source)) as db:
+                db.execute('CREATE TABLE post (text TEXT)')
+                db.execute("INSERT INTO post VALUES ('Тестовый пост')")
+                db.commit()
+
+            replicas.copy_sqlite(source, target)
+
+            with closing(sqlite3.connect(target)) as db:
+                rows = db.execute('SELECT text FROM post').fetchall()
+        self.assertEqual(rows, [('Тестовый пост',)])
@@ -0,0 +1,44 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase
+
+from .. import sqlite
+
+
+class SqliteTests(TestCase):
+    def test_connection_pragmas(self):
+        """Новое соединение получает PRAGMA из SQLITE_PRAGMAS."""
+        with connection.cursor() as cursor:
+            values = {}
+            for name in ('synchronous', 'busy_timeout', 'temp_store'):
+                cursor.execute(f'PRAGMA {name}')
+                values[name] = cursor.fetchone()[0]
+
+        # NORMAL = 1, MEMORY = 2.
+        self.assertEqual(
+            values,
+            {
+                'synchronous': 1,
+                'busy_timeout': settings.SQLITE_PRAGMAS['busy_timeout'],
+                'temp_store': 2,
+            },
+        )
+
+    def test_concurrency_benchmark(self):
+        """Бенчмарк переводит файл базы в WAL и считает операции."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'benchmark.sqlite3')
+            result = sqlite.concurrency_benchmark(
+                path, settings.SQLITE_PRAGMAS,
+                readers=2, writers=1, seconds=0.2, rows=100,
+            )
+            with open(path, 'rb') as file:
+                # Байты 18-19 заголовка равны 2 в режиме WAL.
+                header = file.read(20)
+
+        self.assertGreater(result['read']['per_second'], 0)
+        self.assertGreater(result['write']['per_second'], 0)
+        self.assertEqual(header[18:20], b'\x02\x02')
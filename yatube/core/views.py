@@ -1,4 +1,10 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.shortcuts import redirect, render
+
+from posts import thumbnail_store
+
+from . import cache, profiling
 
 
 def page_not_found(request, exception):
@@ -11,3 +17,20 @@ def server_error(request):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+def profiling_dashboard(request):
+    """Перцентили времени ответа по именам URL (только для персонала)."""
+    if request.method == 'POST':
+        profiling.stats.clear()
+        cache.clear_stats()
+        thumbnail_store.clear_stats()
+        return redirect('core:profiling')
+    context = {
+        'enabled': settings.PROFILING_ENABLED,
+        'rows': profiling.stats.summary(),
+        'caches': cache.stats(),
+        'thumbnails': thumbnail_store.stats(),
+    }
+    return render(request, 'core/profiling.html', context)
@@ -1,10 +1,134 @@
+import datetime
+
+from django import forms
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.widgets import ForeignKeyRawIdWidget
+from django.core.paginator import Paginator
+from django.db.models import Sum
+from django.urls import NoReverseMatch, reverse
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.text import Truncator
 
-from .models import Group, Post
+from . import search
+from .models import Group, Post, PostQuerySet, UserStats
 
 EMPTY = '-пусто-'
 
 
+class EstimatedCountPaginator(Paginator):
+    """Paginator списка постов без COUNT(*) по всей таблице.
+
+    Без фильтров число постов — сумма счетчиков UserStats, с фильтрами и
+    поиском считается не больше ADMIN_COUNT_LIMIT строк.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            total = UserStats.objects.aggregate(total=Sum('posts_count'))
+            return total['total'] or 0
+        return queryset.order_by()[:settings.ADMIN_COUNT_LIMIT].count()
+
+
+def _truncate(day, kind):
+    if kind == 'year':
+        return day.replace(month=1, day=1)
+    if kind == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _next(day, kind):
+    if kind == 'year':
+        return day.replace(year=day.year + 1)
+    if kind == 'month':
+        return (day.replace(day=28) + datetime.timedelta(days=4)).replace(
+            day=1
+        )
+    return day + datetime.timedelta(days=1)
+
+
+def _start_of(day):
+    start = datetime.datetime.combine(day, datetime.time())
+    return timezone.make_aware(start) if settings.USE_TZ else start
+
+
+class IndexedDatesQuerySet(PostQuerySet):
+    """dates() для date_hierarchy без DISTINCT по всей таблице.
+
+    Каждый следующий год (месяц, день) ищется одним запросом по индексу
+    pub_date — первой датой после начала следующего периода, так что
+    запросов на один больше, чем найдено периодов, а не столько, сколько
+    строк.
+    """
+
+    def dates(self, field_name, kind, order='ASC'):
+        if kind not in ('year', 'month', 'day'):
+            return super().dates(field_name, kind, order)
+        found = []
+        start = None
+        while True:
+            rows = self.order_by(field_name).values_list(
+                field_name, flat=True
+            )
+            if start is not None:
+                rows = rows.filter(**{f'{field_name}__gte': start})
+            value = rows.first()
+            if value is None:
+                break
+            if settings.USE_TZ:
+                value = timezone.localtime(value)
+            found.append(_truncate(value.date(), kind))
+            start = _start_of(_next(found[-1], kind))
+        return found if order == 'ASC' else found[::-1]
+
+
+class LoadedRawIdWidget(ForeignKeyRawIdWidget):
+    """Поле id связанного объекта с подписью из уже загруженной строки.
+
+    Стандартный виджет читает подпись отдельным запросом на каждую строку
+    списка.
+    """
+
+    def __init__(self, widget, related):
+        super().__init__(widget.rel, widget.admin_site, widget.attrs,
+                         widget.db)
+        self.related = related
+
+    def label_and_url_for_value(self, value):
+        if self.related is None or str(self.related.pk) != str(value):
+            return super().label_and_url_for_value(value)
+        opts = self.related._meta
+        try:
+            url = reverse(
+                f'{self.admin_site.name}:{opts.app_label}_{opts.model_name}'
+                '_change',
+                args=(self.related.pk,),
+            )
+        except NoReverseMatch:
+            url = ''
+        return Truncator(self.related).words(14), url
+
+
+class PostChangeListForm(forms.ModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in ('author', 'group'):
+            field = self.fields.get(name)
+            if field is None or not isinstance(
+                field.widget, ForeignKeyRawIdWidget
+            ):
+                continue
+            # У пустой формы набора связанного объекта нет.
+            related = None
+            if getattr(self.instance, f'{name}_id') is not None:
+                related = getattr(self.instance, name)
+            field.widget = LoadedRawIdWidget(field.widget, related)
+
+
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
     list_display = (
@@ -21,6 +145,30 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = EMPTY
 
+    # Список постов за число запросов, не зависящее от числа строк:
+    # автор и группа читаются одним JOIN, вместо <select> со всеми
+    # пользователями и группами — поле id, поиск идет по индексу FTS.
+    list_select_related = ('author', 'group')
+    raw_id_fields = ('author', 'group')
+    date_hierarchy = 'pub_date'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return IndexedDatesQuerySet(
+            self.model, query=queryset.query, using=queryset._db
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search.filter_posts(queryset, search_term), False
+
+    def get_changelist_form(self, request, **kwargs):
+        kwargs.setdefault('form', PostChangeListForm)
+        return super().get_changelist_form(request, **kwargs)
+
 
 @admin.register(Group)
 class PostGroup(admin.ModelAdmin):
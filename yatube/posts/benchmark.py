@@ -0,0 +1,212 @@
+import itertools
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import explicit_pub_date
+
+from . import search, timeline
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+# Объемы «как в продакшене»; команда benchmark_views умножает их на --scale.
+VOLUMES = {
+    'users': 10000,
+    'groups': 50,
+    'posts': 100000,
+    'follows': 1000000,
+    'comments': 500000,
+}
+
+# Разница во времени меньше этой считается шумом измерений.
+TIME_NOISE_MS = 5
+
+
+def scaled(scale):
+    return {
+        name: max(1, int(volume * scale)) for name, volume in VOLUMES.items()
+    }
+
+
+def bulk_insert(model, objects, batch_size):
+    objects = iter(objects)
+    while True:
+        batch = list(itertools.islice(objects, batch_size))
+        if not batch:
+            break
+        model.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def seed(volumes, batch_size=5000, random_seed=0):
+    """Заполняет базу пакетными вставками в обход сигналов.
+
+    Производные таблицы (UserStats, FeedEntry) пересчитываются в конце
+    целиком, а не построчно.
+    """
+    rnd = random.Random(random_seed)
+    start = timezone.now() - timedelta(minutes=volumes['posts'])
+
+    bulk_insert(User, (
+        User(username=f'bench_{number}', password='!')
+        for number in range(volumes['users'])
+    ), batch_size)
+    bulk_insert(Group, (
+        Group(
+            title=f'Группа {number}',
+            slug=f'bench-{number}',
+            description='Группа для нагрузочного теста',
+        )
+        for number in range(volumes['groups'])
+    ), batch_size)
+    user_ids = list(User.objects.values_list('pk', flat=True))
+    group_ids = list(Group.objects.values_list('pk', flat=True))
+
+    with explicit_pub_date(Post, Comment):
+        bulk_insert(Post, (
+            Post(
+                author_id=rnd.choice(user_ids),
+                group_id=rnd.choice(group_ids) if rnd.random() < 0.5 else None,
+                text=f'Тестовый пост {number} ' * 5,
+                pub_date=start + timedelta(minutes=number),
+            )
+            for number in range(volumes['posts'])
+        ), batch_size)
+        post_ids = list(Post.objects.values_list('pk', flat=True))
+        bulk_insert(Comment, (
+            Comment(
+                author_id=rnd.choice(user_ids),
+                post_id=rnd.choice(post_ids),
+                text=f'Комментарий {number}',
+                pub_date=start + timedelta(minutes=number),
+            )
+            for number in range(volumes['comments'])
+        ), batch_size)
+
+    per_user = min(volumes['follows'] // len(user_ids), len(user_ids) - 1)
+    bulk_insert(Follow, (
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id in user_ids
+        for author_id in [
+            author_id for author_id in rnd.sample(user_ids, per_user + 1)
+            if author_id != user_id
+        ][:per_user]
+    ), batch_size)
+
+    for offset in range(0, len(user_ids), batch_size):
+        UserStats.objects.recount(user_ids[offset:offset + batch_size])
+    timeline.rebuild()
+    search.rebuild(batch_size)
+
+
+def scenarios():
+    """Запросы, которые измеряет бенчмарк: имя -> (метод, URL, данные)."""
+    reader = (
+        UserStats.objects.order_by('-following_count')
+        .values_list('user_id', flat=True).first()
+    )
+    author = (
+        UserStats.objects.order_by('-posts_count')
+        .values_list('user__username', flat=True).first()
+    )
+    group = Group.objects.order_by('pk').values_list('slug', flat=True)[0]
+    post = (
+        Post.objects.order_by('-pub_date').values_list('pk', flat=True)[0]
+    )
+    last_page = max(1, Post.objects.count() // 10)
+    # Читатель заодно открывает список постов в админке.
+    User.objects.filter(pk=reader).update(is_staff=True, is_superuser=True)
+    admin_posts = reverse('admin:posts_post_changelist')
+    return reader, {
+        'index': ('get', reverse('posts:index'), None),
+        'index (last page)': (
+            'get', reverse('posts:index') + f'?page={last_page}', None
+        ),
+        'group_posts': (
+            'get', reverse('posts:group_list', args=(group,)), None
+        ),
+        'profile': ('get', reverse('posts:profile', args=(author,)), None),
+        'post_detail': (
+            'get', reverse('posts:post_detail', args=(post,)), None
+        ),
+        'follow_index': ('get', reverse('posts:follow_index'), None),
+        'admin_posts': ('get', admin_posts, None),
+        'admin_posts (search)': (
+            'get', admin_posts + '?q=Тестовый&pub_date__year='
+            f'{timezone.localtime(timezone.now()).year}', None
+        ),
+        'add_comment': (
+            'post',
+            reverse('posts:add_comment', args=(post,)),
+            {'text': 'Комментарий из бенчмарка'},
+        ),
+    }
+
+
+def measure(client, method, url, data=None, repeat=5, cold=True):
+    """Запросы, медианное время (мс) и пик выделенной памяти (КиБ).
+
+    cold=True очищает кеш перед каждым повтором, чтобы измерять работу
+    с базой, а не попадания в кеш.
+    """
+    request = getattr(client, method)
+    timings, queries = [], 0
+    for _ in range(repeat):
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            request(url, data)
+            timings.append(time.perf_counter() - started)
+        queries = max(queries, len(captured))
+
+    # Память меряем отдельным прогоном: tracemalloc искажает время.
+    if cold:
+        cache.clear()
+    tracemalloc.start()
+    try:
+        request(url, data)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'queries': queries,
+        'time_ms': round(statistics.median(timings) * 1000, 2),
+        'alloc_kib': round(peak / 1024, 1),
+    }
+
+
+def regressions(results, baseline, threshold):
+    """Ухудшения относительно baseline.
+
+    Число запросов не должно расти вовсе, время и память — не больше,
+    чем в (1 + threshold) раз (для времени — с поправкой на шум).
+    """
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if current['queries'] > previous['queries']:
+            yield (
+                f'{name}: запросов {current["queries"]} '
+                f'(было {previous["queries"]})'
+            )
+        for metric, noise in (('time_ms', TIME_NOISE_MS), ('alloc_kib', 0)):
+            limit = max(
+                previous[metric] * (1 + threshold), previous[metric] + noise
+            )
+            if current[metric] > limit:
+                yield (
+                    f'{name}: {metric} {current[metric]} '
+                    f'(было {previous[metric]})'
+                )
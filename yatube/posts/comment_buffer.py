@@ -0,0 +1,140 @@
+"""Буферизованная запись комментариев (COMMENT_BUFFER_ENABLED).
+
+add_comment кладет комментарий в очередь процесса, а фоновый поток раз в
+COMMENT_BUFFER_FLUSH_SECONDS секунд (или как только набралось
+COMMENT_BUFFER_BATCH_SIZE) записывает ее пакетами через bulk_create: одна
+транзакция на пакет вместо транзакции на комментарий. Пока комментарий в
+очереди, его автор видит его на странице поста (pending()).
+
+bulk_create не шлет сигналов, поэтому flush() сам делает то, что
+posts.signals делает для нового комментария. Очередь живет в памяти:
+комментарии, не записанные до аварийной остановки процесса, теряются.
+"""
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import feed_cache
+from .models import Comment, Post, UserStats
+
+logger = logging.getLogger(__name__)
+
+_queue = []
+_lock = threading.Lock()
+# Один flush() за раз: комментарии уходят из очереди только после записи.
+_flush_lock = threading.Lock()
+# Неудачных попыток записать пакет в начале очереди (под _flush_lock).
+_attempts = 0
+_wakeup = threading.Event()
+_thread = None
+
+
+def enabled():
+    return settings.COMMENT_BUFFER_ENABLED
+
+
+def add(comment):
+    """Ставит несохраненный комментарий в очередь на запись."""
+    comment.pub_date = timezone.now()
+    with _lock:
+        _queue.append(comment)
+        full = len(_queue) >= settings.COMMENT_BUFFER_BATCH_SIZE
+    _start()
+    if full:
+        _wakeup.set()
+
+
+def pending(post_id, author_id):
+    """Комментарии автора к посту, которые еще в очереди."""
+    with _lock:
+        return [
+            comment for comment in _queue
+            if comment.post_id == post_id and comment.author_id == author_id
+        ]
+
+
+def flush():
+    """Записывает всю очередь; возвращает число записанных комментариев."""
+    written = 0
+    with _flush_lock:
+        while True:
+            with _lock:
+                batch = _queue[:settings.COMMENT_BUFFER_BATCH_SIZE]
+            if not batch:
+                return written
+            try:
+                written += _save(batch)
+            except Exception:
+                if not _failed(batch):
+                    # Пакет остается в начале очереди до следующей записи.
+                    return written
+            _reset_attempts()
+            with _lock:
+                # Новые комментарии добавляются только в конец очереди.
+                del _queue[:len(batch)]
+
+
+def _failed(batch):
+    """Учитывает неудачную запись пакета; True — пакет пора отбросить."""
+    global _attempts
+    _attempts += 1
+    if _attempts < settings.COMMENT_BUFFER_MAX_ATTEMPTS:
+        logger.exception(
+            'Не удалось записать %s комментариев, попытка %s',
+            len(batch), _attempts,
+        )
+        return False
+    logger.exception(
+        'Не удалось записать %s комментариев за %s попыток, они потеряны',
+        len(batch), _attempts,
+    )
+    return True
+
+
+def _reset_attempts():
+    global _attempts
+    _attempts = 0
+
+
+def _save(batch):
+    post_ids = {comment.post_id for comment in batch}
+    with transaction.atomic():
+        # Пост могли удалить, пока комментарий ждал в очереди.
+        existing = set(
+            Post.objects.filter(pk__in=post_ids).values_list('pk', flat=True)
+        )
+        batch = [comment for comment in batch if comment.post_id in existing]
+        Comment.objects.bulk_create(batch)
+        Post.objects.filter(pk__in=existing).update(
+            updated_at=timezone.now()
+        )
+        authors = Counter(comment.author_id for comment in batch)
+        for author_id, count in authors.items():
+            UserStats.objects.change(author_id, comments_count=count)
+    feed_cache.invalidate(*(feed_cache.post_scope(pk) for pk in existing))
+    return len(batch)
+
+
+def _run():
+    while True:
+        _wakeup.wait(settings.COMMENT_BUFFER_FLUSH_SECONDS)
+        _wakeup.clear()
+        flush()
+        connection.close_if_unusable_or_obsolete()
+
+
+def _start():
+    global _thread
+    with _lock:
+        if _thread is not None:
+            return
+        _thread = threading.Thread(
+            target=_run, name='comment-buffer', daemon=True
+        )
+        _thread.start()
+    atexit.register(flush)
@@ -0,0 +1,198 @@
+import hashlib
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core import replicas
+
+from .pagination import KeysetPage, KeysetPaginator, posts_paginate
+from yatube.settings import PAGE_ITEMS_NUM, PAGE_COUNT_LIMIT
+
+GENERATION_KEY = 'feed-gen:{}'
+
+
+def index_scope():
+    return 'index'
+
+
+def groups_scope():
+    """Любые изменения групп: их названия выводятся в чужих лентах."""
+    return 'groups'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def follow_scope(user_id):
+    return f'follow:{user_id}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def post_scopes(post, *group_ids):
+    """Все ленты, в которых выводится пост (и его прежние группы)."""
+    scopes = {index_scope(), author_scope(post.author_id), post_scope(post.pk)}
+    for group_id in (post.group_id, *group_ids):
+        if group_id is not None:
+            scopes.add(group_scope(group_id))
+    return scopes
+
+
+def _initial_generation():
+    # Счетчик мог быть вытеснен из кеша: начинаем с текущего времени,
+    # чтобы не вернуться к номеру, под которым еще лежат старые записи.
+    return int(time.time() * 1000)
+
+
+def generations(*scopes):
+    """Текущие номера поколений для областей scopes (одним запросом)."""
+    keys = [GENERATION_KEY.format(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            value = _initial_generation()
+            if not cache.add(key, value, None):
+                value = cache.get(key, value)
+            found[key] = value
+    return tuple(found[key] for key in keys)
+
+
+def invalidate(*scopes):
+    """Сдвигает поколения: все записи этих областей становятся невидимы.
+
+    Внутри транзакции — после ее коммита: иначе читатель, который еще
+    видит старые данные, закеширует их под новым поколением.
+    """
+    transaction.on_commit(partial(_bump, scopes))
+
+
+def _bump(scopes):
+    for scope in scopes:
+        key = GENERATION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_generation(), None)
+
+
+def versioned_key(name, scopes):
+    """Ключ, который меняется при сдвиге поколения любой из областей."""
+    version = '.'.join(str(number) for number in generations(*scopes))
+    return f'feed:{name}:{version}'
+
+
+def cached(name, scopes, compute, timeout=None):
+    """Значение compute() из кеша, пока не изменилась ни одна из областей."""
+    key = versioned_key(name, scopes)
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, replicas.cache_timeout(
+            settings.FEED_CACHE_TIMEOUT if timeout is None else timeout
+        ))
+    return value
+
+
+def _page_key(request, keyset):
+    """Часть ключа кеша, описывающая запрошенную страницу."""
+    if keyset:
+        cursor = request.GET.get('cursor') or ''
+        return 'cursor:' + hashlib.md5(cursor.encode()).hexdigest()
+
+    number = request.GET.get('page') or '1'
+    if not number.isdigit():
+        return None
+    return 'page:' + str(int(number))
+
+
+def _dump_page(page_obj):
+    data = {'items': list(page_obj)}
+    if getattr(page_obj, 'is_keyset', False):
+        data['next'] = page_obj.next_cursor
+        data['previous'] = page_obj.previous_cursor
+    else:
+        data['number'] = page_obj.number
+        data['count'] = page_obj.paginator.count
+    return data
+
+
+def _load_page(data, posts_list):
+    # Посты из кеша выбраны без запроса: миниатюры читаем отдельно.
+    prefetch = getattr(posts_list, 'prefetch_thumbnails', None)
+    if prefetch is not None:
+        prefetch(data['items'])
+    if 'number' not in data:
+        paginator = KeysetPaginator(
+            posts_list, PAGE_ITEMS_NUM, count_limit=PAGE_COUNT_LIMIT
+        )
+        return KeysetPage(
+            data['items'], paginator, data['next'], data['previous']
+        )
+
+    paginator = Paginator(posts_list, PAGE_ITEMS_NUM)
+    paginator.count = data['count']
+    return Page(data['items'], data['number'], paginator)
+
+
+def cached_feed(request, scopes, posts_list, template=None, keyset=False,
+                count=None):
+    """Страница ленты и HTML фрагмента с постами, по возможности из кеша.
+
+    В кеше лежат отдельно выбранные посты страницы и отрендеренный
+    фрагмент template (если он задан). Фрагмент рендерится без request:
+    все, что зависит от пользователя (шапка, переключатель лент),
+    выводится вне его, поэтому одна запись подходит всем посетителям.
+
+    Записи действительны, пока не сдвинуто поколение ни одной из областей
+    scopes; первая область дает ленте имя. count передается в
+    posts_paginate, чтобы не считать посты запросом.
+    """
+    page_key = _page_key(request, keyset)
+    prefix = versioned_key(scopes[0], scopes)
+    data_key = f'{prefix}:{page_key}:data'
+    html_key = f'{prefix}:{page_key}:html'
+    keys = [data_key, html_key] if template else [data_key]
+    found = cache.get_many(keys) if page_key else {}
+
+    data = found.get(data_key)
+    if data is None:
+        page_obj = posts_paginate(request, posts_list, keyset, count)
+        if not keyset and page_key != f'page:{page_obj.number}':
+            # Несуществующий номер страницы: не засоряем им кеш.
+            page_key = None
+        if page_key:
+            cache.set(
+                data_key,
+                _dump_page(page_obj),
+                replicas.cache_timeout(settings.FEED_CACHE_TIMEOUT),
+            )
+    else:
+        page_obj = _load_page(data, posts_list)
+
+    if not template:
+        return page_obj, None
+
+    html = found.get(html_key)
+    if html is None:
+        html = render_to_string(template, {'page_obj': page_obj})
+        if page_key:
+            cache.set(
+                html_key,
+                html,
+                replicas.cache_timeout(settings.FEED_HTML_CACHE_TIMEOUT),
+            )
+
+    return page_obj, mark_safe(html)
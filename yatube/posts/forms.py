@@ -1,5 +1,8 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
 
+from . import thumbnails, uploads
 from .models import Post, Comment
 
 '''
@@ -19,6 +22,25 @@ class PostForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         self.fields['text'].required = True
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # Уже сохраненная картинка поста при редактировании не трогается.
+        if isinstance(image, UploadedFile):
+            image = uploads.normalize(image)
+        return image
+
+    def save(self, commit=True):
+        post = super().save(commit)
+        if commit and 'image' in self.changed_data and post.image:
+            # Генерация после коммита: воркер должен видеть сохраненный пост.
+            transaction.on_commit(lambda: thumbnails.schedule(post))
+        image = self.cleaned_data.get('image')
+        if commit and isinstance(image, UploadedFile):
+            # Временный файл из uploads.normalize() уже перенесен в
+            # MEDIA_ROOT; иначе его попробует удалить сборщик мусора.
+            image.close()
+        return post
+
     class Meta:
         model = Post
         fields = ['text', 'group', 'image']
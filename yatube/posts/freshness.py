@@ -0,0 +1,141 @@
+"""Условные GET-запросы (ETag / Last-Modified / 304) для страниц posts.
+
+Для каждой страницы есть валидатор — одна индексированная выборка,
+которая меняется вместе с содержимым страницы, и поколения ее областей
+кеша лент: их сдвигает и готовность миниатюр (posts.thumbnails), которая
+не меняет updated_at. Если валидатор совпал с присланным клиентом,
+страница не строится: ни основного запроса, ни шаблона.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Exists, OuterRef, Subquery
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date
+
+from . import comment_buffer, feed_cache
+from .models import Follow, Group, Post
+
+User = get_user_model()
+
+
+def _latest_update(**filters):
+    return Subquery(
+        Post.objects.filter(**filters)
+        .order_by('-updated_at')
+        .values('updated_at')[:1]
+    )
+
+
+def post_detail(request, post_id):
+    """Пост, его автор (число постов), группа и комментарии в буфере.
+
+    Комментарии обновляют updated_at поста (posts.signals).
+    """
+    row = Post.objects.filter(pk=post_id).values_list(
+        'updated_at', 'author__stats__posts_count', 'group__title'
+    ).first()
+    if row is None:
+        return None
+    queued = len(comment_buffer.pending(post_id, request.user.pk))
+    return row[0], row + (queued,) + feed_cache.generations(
+        feed_cache.post_scope(post_id)
+    )
+
+
+def profile(request, username):
+    """Последнее изменение постов автора, его счетчики и подписка."""
+    viewer = request.user.pk if request.user.is_authenticated else None
+    row = User.objects.filter(username=username).annotate(
+        posts_updated=_latest_update(author=OuterRef('pk')),
+        is_following=Exists(
+            Follow.objects.filter(user_id=viewer, author=OuterRef('pk'))
+        ),
+    ).values_list(
+        'posts_updated',
+        'is_following',
+        'stats__posts_count',
+        'stats__followers_count',
+        'stats__following_count',
+        'stats__comments_count',
+        'pk',
+    ).first()
+    if row is None:
+        return None
+    # Названия групп в постах автора: их переименование видно только
+    # по поколению кеша.
+    return row[0], row + feed_cache.generations(
+        feed_cache.groups_scope(), feed_cache.author_scope(row[-1])
+    )
+
+
+def group_posts(request, group_name):
+    """Последнее изменение постов группы, их число и описание группы."""
+    posts = Post.objects.filter(group=OuterRef('pk'))
+    row = Group.objects.filter(slug=group_name).annotate(
+        posts_updated=_latest_update(group=OuterRef('pk')),
+        # Число постов ловит удаления, которые не меняют updated_at.
+        posts_count=Subquery(
+            posts.order_by().values('group').annotate(
+                total=Count('pk')
+            ).values('total')
+        ),
+    ).values_list(
+        'posts_updated', 'posts_count', 'title', 'description', 'pk'
+    ).first()
+    if row is None:
+        return None
+    return row[0], row + feed_cache.generations(
+        feed_cache.group_scope(row[-1])
+    )
+
+
+def _etag(request, validator):
+    """ETag страницы: валидатор плюс то, что зависит от посетителя."""
+    raw = repr((
+        validator,
+        request.user.pk,
+        # От CSRF-cookie зависит токен в формах на странице.
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+    ))
+    return '"{}"'.format(hashlib.md5(raw.encode()).hexdigest())
+
+
+def conditional_page(validators):
+    """Отвечает 304, если валидатор страницы не изменился.
+
+    validators(request, *args, **kwargs) возвращает (время последнего
+    изменения или None, значения для ETag) или None, если объекта нет —
+    тогда ответ (404) строит сама view.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            state = validators(request, *args, **kwargs)
+            if state is None:
+                return view(request, *args, **kwargs)
+            last_modified, validator = state
+            etag = _etag(request, validator)
+            timestamp = (
+                int(last_modified.timestamp()) if last_modified else None
+            )
+            # Last-Modified только сообщается: подписки и счетчики меняют
+            # страницу, не меняя даты, поэтому 304 решает один ETag.
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                if timestamp is not None:
+                    response['Last-Modified'] = http_date(timestamp)
+                # Браузер должен каждый раз спрашивать сервер.
+                patch_cache_control(response, private=True, no_cache=True)
+                patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,465 @@
+"""Синтетические данные и нагрузочный прогон сайта.
+
+generate() заполняет базу пакетными вставками с реалистичными
+распределениями: подписчики и активность авторов подчиняются степенному
+закону, посты выходят сериями, у части постов есть картинки разных
+размеров. run() воспроизводит смесь запросов через тестовый клиент Django
+или по HTTP, summary() считает по замерам перцентили задержки и
+пропускную способность.
+"""
+import itertools
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+from http.cookies import SimpleCookie
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.servers.basehttp import (ThreadedWSGIServer,
+                                          WSGIRequestHandler,
+                                          get_internal_wsgi_application)
+from django.db import connection
+from django.test import Client
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from core.models import explicit_pub_date
+from core.profiling import percentile
+
+from . import search, thumbnails, timeline
+from .benchmark import bulk_insert
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+USERNAME_PREFIX = 'load_'
+GROUP_PREFIX = 'load-'
+
+# Объемы по умолчанию; команда seed_load умножает их на --scale.
+VOLUMES = {
+    'users': 2000,
+    'groups': 30,
+    'posts': 20000,
+    'follows': 100000,
+    'comments': 50000,
+    'images': 200,
+}
+
+# Размеры картинок: от снимка для соцсети до кадра с камеры.
+IMAGE_SIZES = ((320, 240), (640, 480), (1280, 720), (1920, 1080), (3000, 2000))
+# Доля постов с картинкой.
+IMAGE_SHARE = 0.2
+
+# Серии постов: в среднем BURST_SIZE постов с шагом BURST_STEP минут,
+# между сериями — в среднем BURST_GAP минут.
+BURST_SIZE = 3
+BURST_STEP = 2
+BURST_GAP = 30
+
+WORDS = (
+    'сегодня', 'город', 'утро', 'кофе', 'дорога', 'книга', 'фото', 'море',
+    'работа', 'друзья', 'вечер', 'погода', 'музыка', 'проект', 'идея',
+    'новости', 'прогулка', 'кино', 'отпуск', 'код',
+)
+
+# Смесь запросов нагрузочного прогона: имя -> вес.
+MIX = {
+    'index': 40,
+    'follow_index': 20,
+    'post_detail': 25,
+    'add_comment': 10,
+    'profile_follow': 5,
+}
+
+# Свежие посты читают и комментируют чаще: номер поста в ленте
+# распределен экспоненциально с таким средним.
+HOT_POSTS = 50
+
+
+def scaled(scale):
+    return {
+        name: max(1, int(volume * scale)) for name, volume in VOLUMES.items()
+    }
+
+
+def zipf_weights(count, alpha):
+    """Накопленные веса 1 / rank^alpha: несколько «звезд» и длинный хвост."""
+    return list(itertools.accumulate(
+        1 / rank ** alpha for rank in range(1, count + 1)
+    ))
+
+
+def _text(rnd):
+    return ' '.join(rnd.choices(WORDS, k=rnd.randint(5, 80)))
+
+
+def _follows(user_ids, authors, weights, count, rnd):
+    """Пары (подписчик, автор); авторы выбираются по весам weights."""
+    count = min(count, len(user_ids) * (len(user_ids) - 1) // 2)
+    pairs = set()
+    # У хвоста распределения веса малы: число попыток ограничено, чтобы
+    # не искать последние редкие пары бесконечно.
+    for _ in range(100):
+        need = count - len(pairs)
+        if need <= 0:
+            break
+        followers = rnd.choices(user_ids, k=need)
+        followed = rnd.choices(authors, cum_weights=weights, k=need)
+        pairs.update(
+            pair for pair in zip(followers, followed) if pair[0] != pair[1]
+        )
+    return pairs
+
+
+def _bursts(count, authors, weights, group_ids, rnd):
+    """(автор, группа, минута) для count постов, выходящих сериями."""
+    minute = 0.0
+    while count > 0:
+        author_id = rnd.choices(authors, cum_weights=weights)[0]
+        group_id = rnd.choice(group_ids) if rnd.random() < 0.5 else None
+        minute += rnd.expovariate(1 / BURST_GAP)
+        size = min(count, 1 + int(rnd.expovariate(1 / BURST_SIZE)))
+        for _ in range(size):
+            minute += rnd.expovariate(1 / BURST_STEP)
+            yield author_id, group_id, minute
+        count -= size
+
+
+def make_image(size, rnd):
+    """JPEG с шумом: сжимается как фотография, а не как заливка."""
+    color = tuple(rnd.randrange(256) for _ in range(3))
+    image = Image.blend(
+        Image.new('RGB', size, color),
+        Image.effect_noise(size, 64).convert('RGB'),
+        0.5,
+    )
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=85)
+    return buffer.getvalue()
+
+
+def _save_images(count, sizes, rnd):
+    return [
+        default_storage.save(
+            f'posts/{USERNAME_PREFIX}{number}.jpg',
+            ContentFile(make_image(rnd.choice(sizes), rnd)),
+        )
+        for number in range(count)
+    ]
+
+
+def is_seeded():
+    return User.objects.filter(username__startswith=USERNAME_PREFIX).exists()
+
+
+def generate(volumes, alpha=1.1, batch_size=5000, random_seed=0,
+             image_sizes=IMAGE_SIZES, workers=1):
+    """Заполняет базу пакетными вставками в обход сигналов.
+
+    alpha — показатель степенного закона: чем больше, тем сильнее
+    подписчики и посты сосредоточены у немногих авторов. Производные
+    таблицы (UserStats, FeedEntry, поисковый индекс) и миниатюры картинок
+    (в workers потоков) строятся в конце.
+    """
+    rnd = random.Random(random_seed)
+    now = timezone.now()
+
+    bulk_insert(User, (
+        User(username=f'{USERNAME_PREFIX}{number}', password='!')
+        for number in range(volumes['users'])
+    ), batch_size)
+    bulk_insert(Group, (
+        Group(
+            title=f'Сообщество {number}',
+            slug=f'{GROUP_PREFIX}{number}',
+            description='Сообщество для нагрузочного теста',
+        )
+        for number in range(volumes['groups'])
+    ), batch_size)
+    user_ids = list(
+        User.objects.filter(username__startswith=USERNAME_PREFIX)
+        .order_by('pk').values_list('pk', flat=True)
+    )
+    group_ids = list(
+        Group.objects.filter(slug__startswith=GROUP_PREFIX)
+        .values_list('pk', flat=True)
+    )
+    # Популярные у подписчиков авторы и пишут больше.
+    authors = user_ids[:]
+    rnd.shuffle(authors)
+    weights = zipf_weights(len(authors), alpha)
+
+    bulk_insert(Follow, (
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id, author_id in _follows(
+            user_ids, authors, weights, volumes['follows'], rnd
+        )
+    ), batch_size)
+
+    images = _save_images(volumes['images'], image_sizes, rnd)
+    schedule = list(_bursts(
+        volumes['posts'], authors, weights, group_ids, rnd
+    ))
+    end = schedule[-1][2] if schedule else 0
+    with explicit_pub_date(Post, Comment):
+        bulk_insert(Post, (
+            Post(
+                author_id=author_id,
+                group_id=group_id,
+                text=_text(rnd),
+                image=(
+                    rnd.choice(images)
+                    if images and rnd.random() < IMAGE_SHARE else ''
+                ),
+                pub_date=now - timedelta(minutes=end - minute),
+            )
+            for author_id, group_id, minute in schedule
+        ), batch_size)
+
+        posts = list(
+            Post.objects.filter(author__username__startswith=USERNAME_PREFIX)
+            .values_list('pk', 'pub_date')
+        )
+        rnd.shuffle(posts)
+        commented = rnd.choices(
+            posts,
+            cum_weights=zipf_weights(len(posts), alpha),
+            k=volumes['comments'] if posts else 0,
+        )
+        bulk_insert(Comment, (
+            Comment(
+                author_id=rnd.choice(user_ids),
+                post_id=post_id,
+                text=_text(rnd),
+                pub_date=min(
+                    now, pub_date + timedelta(minutes=rnd.expovariate(1 / 60))
+                ),
+            )
+            for post_id, pub_date in commented
+        ), batch_size)
+
+    for offset in range(0, len(user_ids), batch_size):
+        UserStats.objects.recount(user_ids[offset:offset + batch_size])
+    timeline.rebuild()
+    search.rebuild()
+    thumbnails.backfill(images, workers)
+
+
+def targets(limit=1000):
+    """Кого и что запрашивать: активные читатели, свежие посты, авторы."""
+    stats = UserStats.objects.order_by('-following_count')
+    readers = list(
+        stats.filter(following_count__gt=0)
+        .values_list('user_id', flat=True)[:limit]
+    ) or list(User.objects.values_list('pk', flat=True)[:limit])
+    authors = list(
+        stats.order_by('-followers_count')
+        .values_list('user__username', 'followers_count')[:limit]
+    )
+    return {
+        'readers': readers,
+        'posts': list(
+            Post.objects.order_by('-pub_date')
+            .values_list('pk', flat=True)[:limit]
+        ),
+        'authors': [username for username, _ in authors],
+        # На популярных авторов и подписываются чаще.
+        'author_weights': [count + 1 for _, count in authors],
+    }
+
+
+def pick(rnd, mix, targets):
+    """Следующий запрос смеси: (имя, метод, URL, данные)."""
+    name = rnd.choices(list(mix), weights=list(mix.values()))[0]
+    posts = targets['posts']
+    post_id = posts[min(int(rnd.expovariate(1 / HOT_POSTS)), len(posts) - 1)]
+    if name == 'post_detail':
+        return name, 'get', reverse('posts:post_detail', args=(post_id,)), None
+    if name == 'add_comment':
+        return (
+            name, 'post', reverse('posts:add_comment', args=(post_id,)),
+            {'text': _text(rnd)},
+        )
+    if name == 'profile_follow':
+        author = rnd.choices(
+            targets['authors'], weights=targets['author_weights']
+        )[0]
+        url = reverse('posts:profile_follow', args=(author,))
+        return name, 'get', url, None
+    return name, 'get', reverse(f'posts:{name}'), None
+
+
+@contextmanager
+def client_environment():
+    """Окружение для ClientDriver вне тестов: хост testserver разрешен."""
+    setup_test_environment()
+    try:
+        yield None
+    finally:
+        teardown_test_environment()
+
+
+class ClientDriver:
+    """Запросы через тестовый клиент Django, в этом же процессе."""
+
+    def __init__(self, user):
+        self.client = Client()
+        self.client.force_login(user)
+
+    def request(self, method, url, data=None):
+        return getattr(self.client, method)(url, data).status_code
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Редирект — часть ответа, а не новый запрос."""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpDriver:
+    """Запросы по HTTP к сайту по адресу base_url от имени пользователя."""
+
+    def __init__(self, base_url, user):
+        # Сессию создает тот же SessionStore, который читает сервер.
+        client = Client()
+        client.force_login(user)
+        self.base_url = base_url.rstrip('/')
+        self.cookies = {
+            settings.SESSION_COOKIE_NAME:
+                client.cookies[settings.SESSION_COOKIE_NAME].value,
+        }
+        self.opener = urllib.request.build_opener(
+            urllib.request.ProxyHandler({}), _NoRedirect
+        )
+        # Страница с формой выдает CSRF-cookie для POST-запросов.
+        self.request('get', reverse('posts:post_create'))
+
+    def request(self, method, url, data=None):
+        body = None
+        if method == 'post':
+            data = dict(
+                data or {},
+                csrfmiddlewaretoken=self.cookies.get(
+                    settings.CSRF_COOKIE_NAME, ''
+                ),
+            )
+            body = urllib.parse.urlencode(data).encode()
+        request = urllib.request.Request(
+            self.base_url + url,
+            data=body,
+            method=method.upper(),
+            headers={'Cookie': '; '.join(
+                f'{name}={value}' for name, value in self.cookies.items()
+            )},
+        )
+        try:
+            with self.opener.open(request, timeout=30) as response:
+                response.read()
+                status, headers = response.status, response.headers
+        except urllib.error.HTTPError as error:
+            error.read()
+            status, headers = error.code, error.headers
+        for header in headers.get_all('Set-Cookie') or ():
+            for name, morsel in SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+        return status
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def wsgi_server(host='127.0.0.1'):
+    """Сайт на локальном многопоточном WSGI-сервере; отдает его адрес."""
+    server = ThreadedWSGIServer((host, 0), _QuietHandler)
+    server.set_app(get_internal_wsgi_application())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://{host}:{server.server_port}'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def run(make_driver, targets, requests=1000, concurrency=4, mix=MIX,
+        random_seed=0):
+    """Выполняет requests запросов смеси mix в concurrency потоков.
+
+    make_driver(user) создает клиента для читателя. Возвращает замеры
+    (имя, секунды, код ответа или None) и общее время прогона.
+    """
+    readers = targets['readers']
+    numbers = itertools.count()
+    samples = []
+
+    def worker(number):
+        rnd = random.Random(random_seed + number)
+        driver = make_driver(
+            User.objects.get(pk=readers[number % len(readers)])
+        )
+        # next() у itertools.count атомарен: потоки делят запросы без
+        # блокировок.
+        while next(numbers) < requests:
+            name, method, url, data = pick(rnd, mix, targets)
+            started = time.perf_counter()
+            try:
+                status = driver.request(method, url, data)
+            except Exception:
+                status = None
+            samples.append((name, time.perf_counter() - started, status))
+
+    def threaded(number):
+        try:
+            worker(number)
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    if concurrency == 1:
+        worker(0)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(threaded, range(concurrency)))
+    return samples, time.perf_counter() - started
+
+
+def summary(samples, elapsed):
+    """Запросы, ошибки, p50/p95/p99 (мс) и запросов в секунду.
+
+    По каждому имени и всего (total). Ошибка — нет ответа или код >= 400.
+    """
+    groups = defaultdict(list)
+    for name, seconds, status in samples:
+        groups[name].append((seconds * 1000, status))
+        groups['total'].append((seconds * 1000, status))
+    result = {}
+    for name, rows in groups.items():
+        times = [ms for ms, _ in rows]
+        result[name] = {
+            'requests': len(rows),
+            'errors': sum(
+                1 for _, status in rows if status is None or status >= 400
+            ),
+            'p50': round(percentile(times, 0.5), 2),
+            'p95': round(percentile(times, 0.95), 2),
+            'p99': round(percentile(times, 0.99), 2),
+            'rps': round(len(rows) / elapsed, 1) if elapsed else 0,
+        }
+    return result
@@ -0,0 +1,77 @@
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from posts import thumbnails
+from posts.models import MediaFile, Post
+from posts.storage import content_storage
+
+
+class Command(BaseCommand):
+    help = (
+        'Переводит картинки постов, загруженные до хранения по хешу '
+        '(миграция 0018): считает ссылки в MediaFile, создает миниатюры с '
+        'ключами нового хранилища и удаляет прежние миниатюры.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько картинок обрабатывать за один проход.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.THUMBNAIL_WORKERS,
+            help='Сколько картинок уменьшать одновременно.',
+        )
+
+    def handle(self, *args, batch_size, workers, **options):
+        names = (
+            Post.objects.exclude(image='')
+            .order_by('image')
+            .values_list('image', flat=True)
+            .distinct()
+        )
+        started = time.perf_counter()
+        totals = {'checked': 0, 'repaired': 0, 'generated': 0, 'removed': 0}
+        batch = []
+        for name in names.iterator(chunk_size=batch_size):
+            batch.append(name)
+            if len(batch) == batch_size:
+                self.adopt(batch, workers, totals)
+                batch = []
+        if batch:
+            self.adopt(batch, workers, totals)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено картинок: {totals["checked"]}, исправлено '
+            f'счетчиков: {totals["repaired"]}, созданы миниатюры: '
+            f'{totals["generated"]}, удалены прежние миниатюры: '
+            f'{totals["removed"]} за {time.perf_counter() - started:.1f} с'
+        ))
+
+    def adopt(self, names, workers, totals):
+        totals['checked'] += len(names)
+        totals['repaired'] += MediaFile.objects.recount(names)
+        # Ключи миниатюр sorl строятся из класса хранилища исходного файла:
+        # с новым хранилищем прежние миниатюры не находятся.
+        totals['generated'] += thumbnails.backfill(names, workers)
+        for name in names:
+            totals['removed'] += self.remove_legacy(name)
+
+    def remove_legacy(self, name):
+        """Удаляет миниатюры name, созданные с хранилищем по умолчанию."""
+        legacy = ImageFile(name, default_storage)
+        if legacy.key == ImageFile(name, content_storage).key:
+            return 0
+        removed = default.kvstore._get(legacy.key, identity='thumbnails')
+        # Исходный файл sorl не удаляет, только записи и файлы миниатюр.
+        default.kvstore.delete(legacy)
+        return len(removed or ())
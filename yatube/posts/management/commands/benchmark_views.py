@@ -0,0 +1,119 @@
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет временную тестовую базу данными реалистичного объема, '
+        'измеряет число запросов, время и память для страниц posts и '
+        'сравнивает их с сохраненным baseline. Кеш при замерах очищается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            type=float,
+            default=1.0,
+            help=(
+                'Множитель объемов из posts.benchmark.VOLUMES '
+                '(1.0 — 100 тыс. постов, 1 млн подписок).'
+            ),
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Сколько раз повторять каждый запрос.',
+        )
+        parser.add_argument(
+            '--baseline',
+            default=settings.BENCHMARK_BASELINE,
+            help='JSON-файл с результатами для сравнения.',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=settings.BENCHMARK_THRESHOLD,
+            help='Допустимый рост времени и памяти (0.25 — на 25%%).',
+        )
+        parser.add_argument(
+            '--update-baseline',
+            action='store_true',
+            help='Записать результаты в baseline вместо сравнения.',
+        )
+
+    def handle(self, *args, scale, repeat, baseline, threshold,
+               update_baseline, **options):
+        volumes = benchmark.scaled(scale)
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True
+        )
+        try:
+            started = time.perf_counter()
+            benchmark.seed(volumes)
+            self.stdout.write(
+                f'Данные загружены за {time.perf_counter() - started:.1f} с: '
+                + ', '.join(f'{k}={v}' for k, v in volumes.items())
+            )
+            results = self.run_scenarios(repeat)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if update_baseline or not os.path.exists(baseline):
+            with open(baseline, 'w', encoding='utf-8') as file:
+                json.dump(
+                    {'volumes': volumes, 'results': results},
+                    file, ensure_ascii=False, indent=2,
+                )
+            self.stdout.write(self.style.SUCCESS(
+                f'Baseline записан в {baseline}'
+            ))
+            return
+
+        with open(baseline, encoding='utf-8') as file:
+            previous = json.load(file)
+        if previous['volumes'] != volumes:
+            raise CommandError(
+                'Baseline снят на других объемах данных; запустите с тем же '
+                '--scale или перезапишите его через --update-baseline.'
+            )
+        failures = list(
+            benchmark.regressions(results, previous['results'], threshold)
+        )
+        if failures:
+            raise CommandError(
+                'Производительность ухудшилась:\n' + '\n'.join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
+
+    def run_scenarios(self, repeat):
+        reader, scenarios = benchmark.scenarios()
+        client = Client()
+        client.force_login(benchmark.User.objects.get(pk=reader))
+        results = {}
+        for name, (method, url, data) in scenarios.items():
+            results[name] = benchmark.measure(
+                client, method, url, data, repeat=repeat
+            )
+            if method == 'get':
+                results[f'{name} (cache)'] = benchmark.measure(
+                    client, method, url, data, repeat=repeat, cold=False
+                )
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<26} {result["queries"]:>3} запросов '
+                f'{result["time_ms"]:>9.2f} мс {result["alloc_kib"]:>9.1f} КиБ'
+            )
+        return results
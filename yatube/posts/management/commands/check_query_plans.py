@@ -0,0 +1,116 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from posts import timeline
+from posts.models import Comment, Follow, Post
+from posts.pagination import KeysetPaginator
+from yatube.settings import COMMENTS_PAGE_SIZE, PAGE_ITEMS_NUM
+
+User = get_user_model()
+
+# Запросы страниц после курсора: их индекс должен читаться с границы
+# курсора (SEARCH), а не с начала (SCAN ... USING INDEX).
+SEEK_QUERIES = ('index (keyset)', 'post_comments (older)')
+
+
+def count_sql(queryset):
+    """SQL запроса COUNT, который выполняет queryset.count()."""
+    with CaptureQueriesContext(connection) as captured:
+        queryset.count()
+    return captured.captured_queries[-1]['sql'], ()
+
+
+def view_queries():
+    """Основные запросы страниц, в том виде, в каком их строят views.
+
+    Возвращает имя -> (SQL, параметры).
+    """
+    user = User.objects.order_by('pk').first() or User(pk=1)
+    post = Post.objects.order_by('pk').first() or Post(
+        pk=1, pub_date=timezone.now()
+    )
+    comment = Comment.objects.order_by('pk').first() or Comment(
+        pk=1, pub_date=timezone.now()
+    )
+    feed = Post.objects.feed()
+    keyset = KeysetPaginator(feed, PAGE_ITEMS_NUM)
+    comments = KeysetPaginator(
+        Comment.objects.filter(post_id=post.pk).select_related('author'),
+        COMMENTS_PAGE_SIZE,
+    )
+    querysets = {
+        'index': feed[:PAGE_ITEMS_NUM],
+        'index (keyset)': keyset.page_queryset(keyset.cursor_for(post)),
+        'group_posts': feed.filter(group_id=post.group_id or 1)[
+            :PAGE_ITEMS_NUM
+        ],
+        'profile': feed.filter(author_id=user.pk)[:PAGE_ITEMS_NUM],
+        'profile (following)': Follow.objects.filter(
+            user_id=user.pk, author_id=post.author_id or 1
+        ),
+        'post_detail (comments)': comments.page_queryset(),
+        'post_comments (older)': comments.page_queryset(
+            comments.cursor_for(comment)
+        ),
+        'follow_index': timeline.follow_feed(user)[:PAGE_ITEMS_NUM],
+    }
+    queries = {
+        name: queryset.query.sql_with_params()
+        for name, queryset in querysets.items()
+    }
+    queries['group_posts (count)'] = count_sql(
+        feed.filter(group_id=post.group_id or 1)
+    )
+    return queries
+
+
+def bad_steps(plan, seek=False):
+    """Шаги плана SQLite с полным просмотром таблицы или сортировкой.
+
+    Для запросов после курсора (seek) плох и просмотр индекса целиком.
+    """
+    for detail in plan:
+        scan = detail.startswith('SCAN')
+        full_scan = scan and (seek or 'USING' not in detail)
+        if full_scan or 'TEMP B-TREE' in detail:
+            yield detail
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет EXPLAIN QUERY PLAN для запросов страниц posts и '
+        'завершается с ошибкой, если какой-то из них просматривает '
+        'таблицу целиком или сортирует во временном дереве.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--show-plans',
+            action='store_true',
+            help='Вывести планы всех запросов.',
+        )
+
+    def handle(self, *args, show_plans, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Поддерживается только SQLite.')
+
+        failures = []
+        for name, (sql, params) in view_queries().items():
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                plan = [row[-1] for row in cursor.fetchall()]
+            bad = list(bad_steps(plan, seek=name in SEEK_QUERIES))
+            if show_plans or bad:
+                self.stdout.write(f'{name}:')
+                for detail in plan:
+                    self.stdout.write(f'    {detail}')
+            failures.extend(f'{name}: {detail}' for detail in bad)
+
+        if failures:
+            raise CommandError(
+                'Запросы без подходящего индекса:\n' + '\n'.join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS('Все запросы используют индексы'))
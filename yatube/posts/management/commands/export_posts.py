@@ -0,0 +1,97 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты в NDJSON или CSV потоком, пакетами по '
+        '--batch-size строк; картинки копирует в --media-dir. Прерванная '
+        'выгрузка продолжается с сохраненной позиции.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл, в который пишутся посты.')
+        parser.add_argument(
+            '--format',
+            choices=transfer.FORMATS,
+            help='Формат файла; по умолчанию — по расширению.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.TRANSFER_BATCH_SIZE,
+            help='Сколько постов читать из базы за один запрос.',
+        )
+        parser.add_argument(
+            '--media-dir',
+            help='Каталог, куда скопировать картинки постов.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.TRANSFER_WORKERS,
+            help='Сколько картинок копировать одновременно.',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Начать заново, даже если есть сохраненная позиция.',
+        )
+
+    def handle(self, *args, path, format, batch_size, media_dir, workers,
+               restart, **options):
+        fmt = format or transfer.detect_format(path)
+        checkpoint = transfer.Checkpoint(path)
+        state = {} if restart else checkpoint.load()
+        if state:
+            # Строки, записанные после последней сохраненной позиции,
+            # будут выгружены еще раз.
+            os.truncate(path, state['offset'])
+            self.stdout.write(
+                f'Продолжаем после поста {state["last_id"]}, '
+                f'выгружено строк: {state["rows"]}'
+            )
+        last_id = state.get('last_id', 0)
+        written = state.get('rows', 0)
+        target = FileSystemStorage(location=media_dir) if media_dir else None
+        images = 0
+        started = time.perf_counter()
+
+        with open(path, 'a' if state else 'w', encoding='utf-8',
+                  newline='') as file, \
+                ThreadPoolExecutor(max_workers=workers) as executor:
+            write = transfer.writer(file, fmt, header=not state)
+            rows = transfer.dump_rows(last_id, batch_size)
+            for batch in transfer.batches(rows, batch_size):
+                for row in batch:
+                    write(row)
+                if target is not None:
+                    images += transfer.copy_images(
+                        (row['image'] for row in batch if row['image']),
+                        default_storage, target, executor,
+                    )['copied']
+                file.flush()
+                last_id = batch[-1]['id']
+                written += len(batch)
+                checkpoint.save(
+                    last_id=last_id, rows=written, offset=file.tell()
+                )
+                self.report(written, started, state.get('rows', 0))
+
+        checkpoint.clear()
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгружено постов: {written}, картинок: {images} '
+            f'за {time.perf_counter() - started:.1f} с'
+        ))
+
+    def report(self, total, started, resumed_from):
+        elapsed = time.perf_counter() - started
+        rate = (total - resumed_from) / elapsed if elapsed else 0
+        self.stdout.write(f'  {total} строк, {rate:.0f} строк/с')
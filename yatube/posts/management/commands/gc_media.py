@@ -0,0 +1,121 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from posts.models import MediaFile, Post
+from posts.storage import content_storage
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки, на которые не ссылается ни один пост, вместе с '
+        'их миниатюрами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=3600,
+            help=(
+                'Сколько секунд файл должен пролежать без ссылок: только '
+                'что загруженная картинка может ждать сохранения поста.'
+            ),
+        )
+        parser.add_argument(
+            '--scan',
+            action='store_true',
+            help=(
+                'Искать и файлы, которых нет в MediaFile: загруженные до '
+                'подсчета ссылок или брошенные при откате транзакции.'
+            ),
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, что будет удалено.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько файлов проверять за один запрос.',
+        )
+
+    def handle(self, *args, min_age, scan, dry_run, batch_size, **options):
+        cutoff = timezone.now() - datetime.timedelta(seconds=min_age)
+        names = list(
+            MediaFile.objects.filter(references__lte=0, updated_at__lt=cutoff)
+            .values_list('name', flat=True)
+        )
+        if scan:
+            names.extend(self.untracked(batch_size))
+
+        removed = repaired = 0
+        for start in range(0, len(names), batch_size):
+            batch = names[start:start + batch_size]
+            # Посты, записанные в обход сигналов (импорт, bulk_create),
+            # счетчик не увеличивали: такие файлы не трогаем, а счетчик
+            # чиним.
+            referenced = set(
+                Post.objects.filter(image__in=batch)
+                .values_list('image', flat=True)
+            )
+            if referenced and not dry_run:
+                repaired += MediaFile.objects.recount(list(referenced))
+            orphans = [
+                name for name in batch
+                if name not in referenced and self.is_stale(name, cutoff)
+            ]
+            for name in orphans:
+                self.stdout.write(name)
+                if not dry_run:
+                    self.delete(name)
+            if not dry_run:
+                MediaFile.objects.filter(
+                    name__in=orphans, references__lte=0
+                ).delete()
+            removed += len(orphans)
+
+        verb = 'Будет удалено' if dry_run else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} файлов: {removed}, исправлено счетчиков: {repaired}'
+        ))
+
+    def untracked(self, batch_size):
+        """Файлы каталога картинок постов, которых нет в MediaFile."""
+        upload_to = Post._meta.get_field('image').upload_to.rstrip('/')
+        found = list(self.walk(upload_to))
+        tracked = set()
+        for start in range(0, len(found), batch_size):
+            batch = found[start:start + batch_size]
+            tracked.update(
+                MediaFile.objects.filter(name__in=batch)
+                .values_list('name', flat=True)
+            )
+        return [name for name in found if name not in tracked]
+
+    def walk(self, directory):
+        if not content_storage.exists(directory):
+            return
+        directories, files = content_storage.listdir(directory)
+        for name in files:
+            yield f'{directory}/{name}'
+        for name in directories:
+            yield from self.walk(f'{directory}/{name}')
+
+    def is_stale(self, name, cutoff):
+        try:
+            modified = content_storage.get_modified_time(name)
+        except FileNotFoundError:
+            return True
+        return modified < cutoff
+
+    def delete(self, name):
+        # Миниатюры и их записи в KV-хранилище sorl; исходный файл sorl
+        # не удаляет.
+        default.kvstore.delete(ImageFile(name, content_storage))
+        content_storage.delete(name)
@@ -0,0 +1,53 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает недостающие миниатюры картинок постов: загруженных до '
+        'генерации миниатюр или записанных в обход формы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько картинок проверять за один запрос.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.THUMBNAIL_WORKERS,
+            help='Сколько картинок обрабатывать одновременно.',
+        )
+
+    def handle(self, *args, batch_size, workers, **options):
+        names = (
+            Post.objects.exclude(image='')
+            .order_by('image')
+            .values_list('image', flat=True)
+            .distinct()
+        )
+        checked = generated = 0
+        started = time.perf_counter()
+        batch = []
+        for name in names.iterator(chunk_size=batch_size):
+            batch.append(name)
+            if len(batch) == batch_size:
+                generated += thumbnails.backfill(batch, workers)
+                checked += len(batch)
+                batch = []
+        if batch:
+            generated += thumbnails.backfill(batch, workers)
+            checked += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено картинок: {checked}, созданы миниатюры: {generated} '
+            f'за {time.perf_counter() - started:.1f} с'
+        ))
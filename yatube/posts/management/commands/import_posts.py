@@ -0,0 +1,127 @@
+import itertools
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import thumbnails, transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает посты из NDJSON или CSV пакетами по --batch-size строк '
+        'через bulk_create, картинки копирует из --media-dir. Авторы и '
+        'группы ищутся по username и slug, недостающие создаются. '
+        'Прерванная загрузка продолжается с сохраненной позиции.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл с постами.')
+        parser.add_argument(
+            '--format',
+            choices=transfer.FORMATS,
+            help='Формат файла; по умолчанию — по расширению.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.TRANSFER_BATCH_SIZE,
+            help='Сколько постов сохранять за одну транзакцию.',
+        )
+        parser.add_argument(
+            '--media-dir',
+            help='Каталог, из которого скопировать картинки постов.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.TRANSFER_WORKERS,
+            help='Сколько картинок копировать и уменьшать одновременно.',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Начать заново, даже если есть сохраненная позиция.',
+        )
+
+    def handle(self, *args, path, format, batch_size, media_dir, workers,
+               restart, **options):
+        fmt = format or transfer.detect_format(path)
+        checkpoint = transfer.Checkpoint(path)
+        state = {} if restart else checkpoint.load()
+        done = state.get('rows', 0)
+        if done:
+            self.stdout.write(f'Продолжаем со строки {done + 1}')
+        authors = set(state.get('authors', ()))
+        groups = set(state.get('groups', ()))
+        source = FileSystemStorage(location=media_dir) if media_dir else None
+        lookup = transfer.Lookup()
+        created = skipped = generated = 0
+        images = Counter()
+        started = time.perf_counter()
+
+        try:
+            with open(path, encoding='utf-8', newline='') as file, \
+                    ThreadPoolExecutor(max_workers=workers) as executor:
+                rows = itertools.islice(
+                    transfer.read_rows(file, fmt), done, None
+                )
+                for batch in transfer.batches(rows, batch_size):
+                    if source is not None:
+                        # Картинки копируются до сохранения постов, чтобы
+                        # в базе не было ссылок на еще не скопированные файлы.
+                        images += transfer.copy_images(
+                            (row['image'] for row in batch if row['image']),
+                            source, default_storage, executor,
+                        )
+                    with transaction.atomic():
+                        posts, batch_skipped = transfer.save_posts(
+                            batch, lookup
+                        )
+                    # Форма создает миниатюры при сохранении, а
+                    # bulk_create — нет.
+                    generated += thumbnails.backfill(
+                        (post.image.name for post in posts), workers
+                    )
+                    created += len(posts)
+                    skipped += batch_skipped
+                    authors.update(post.author_id for post in posts)
+                    groups.update(
+                        post.group_id for post in posts if post.group_id
+                    )
+                    done += len(batch)
+                    checkpoint.save(
+                        rows=done,
+                        authors=sorted(authors),
+                        groups=sorted(groups),
+                    )
+                    self.report(done, started, state.get('rows', 0))
+        except ValueError as error:
+            raise CommandError(
+                f'{error}. Загруженные пакеты сохранены; после исправления '
+                'файла загрузка продолжится с той же позиции.'
+            )
+
+        transfer.reset_sequences()
+        transfer.finalize(authors, groups, batch_size)
+        checkpoint.clear()
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено постов: {created}, пропущено уже существующих: '
+            f'{skipped} за {time.perf_counter() - started:.1f} с'
+        ))
+        if images:
+            self.stdout.write(
+                f'Картинок скопировано: {images["copied"]}, уже были: '
+                f'{images["skipped"]}, не найдено: {images["missing"]}'
+            )
+        if generated:
+            self.stdout.write(f'Созданы миниатюры картинок: {generated}')
+
+    def report(self, total, started, resumed_from):
+        elapsed = time.perf_counter() - started
+        rate = (total - resumed_from) / elapsed if elapsed else 0
+        self.stdout.write(f'  {total} строк, {rate:.0f} строк/с')
@@ -0,0 +1,103 @@
+from contextlib import nullcontext
+from functools import partial
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import load
+
+
+def parse_mix(value):
+    """'index=40,post_detail=25' -> {'index': 40, 'post_detail': 25}."""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in load.MIX or not weight.isdigit():
+            raise CommandError(f'Неверная часть смеси запросов: {part}')
+        mix[name] = int(weight)
+    return mix
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон: воспроизводит смесь запросов к index, '
+        'follow_index, post_detail, add_comment и profile_follow и '
+        'выводит p50/p95/p99 задержки и пропускную способность.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=1000,
+            help='Сколько всего запросов выполнить.',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=4,
+            help='Сколько читателей шлют запросы одновременно.',
+        )
+        parser.add_argument(
+            '--mode',
+            choices=('client', 'wsgi'),
+            default='client',
+            help=(
+                'client — тестовый клиент Django в этом процессе, '
+                'wsgi — HTTP к локальному WSGI-серверу.'
+            ),
+        )
+        parser.add_argument(
+            '--url',
+            help='Адрес уже запущенного сайта (вместо --mode).',
+        )
+        parser.add_argument(
+            '--mix',
+            type=parse_mix,
+            default=load.MIX,
+            help='Веса запросов, например index=40,post_detail=25.',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Начальное значение генератора случайных чисел.',
+        )
+
+    def handle(self, *args, requests, concurrency, mode, url, mix, seed,
+               **options):
+        targets = load.targets()
+        if not targets['posts']:
+            raise CommandError('В базе нет постов: запустите seed_load.')
+        if url:
+            server = nullcontext(url)
+        elif mode == 'wsgi':
+            server = load.wsgi_server()
+        else:
+            server = load.client_environment()
+
+        with server as base_url:
+            make_driver = (
+                partial(load.HttpDriver, base_url) if base_url
+                else load.ClientDriver
+            )
+            samples, elapsed = load.run(
+                make_driver, targets, requests, concurrency, mix, seed
+            )
+
+        results = load.summary(samples, elapsed)
+        self.stdout.write(
+            f'{"запрос":<16}{"всего":>8}{"ошибок":>8}'
+            f'{"p50, мс":>10}{"p95, мс":>10}{"p99, мс":>10}{"в сек.":>9}'
+        )
+        for name in [*mix, 'total']:
+            if name not in results:
+                continue
+            row = results[name]
+            self.stdout.write(
+                f'{name:<16}{row["requests"]:>8}{row["errors"]:>8}'
+                f'{row["p50"]:>10}{row["p95"]:>10}{row["p99"]:>10}'
+                f'{row["rps"]:>9}'
+            )
+        errors = results.get('total', {}).get('errors', 0)
+        if errors:
+            self.stdout.write(self.style.WARNING(f'Ошибок: {errors}'))
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново строит полнотекстовый индекс постов (SQLite FTS5) '
+        'пакетными вставками.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=search.BATCH_SIZE,
+            help='Сколько постов индексировать за один запрос.',
+        )
+
+    def handle(self, *args, batch_size, **options):
+        if not search.is_available():
+            raise CommandError('Полнотекстовый индекс есть только в SQLite.')
+        started = time.perf_counter()
+        indexed = search.rebuild(batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано постов: {indexed} '
+            f'за {time.perf_counter() - started:.1f} с'
+        ))
@@ -0,0 +1,39 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts.models import UserStats
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счетчики пользователей (UserStats) по исходным '
+        'таблицам и исправляет расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько пользователей пересчитывать за один проход.',
+        )
+
+    def handle(self, *args, batch_size, **options):
+        user_ids = User.objects.order_by('pk').values_list('pk', flat=True)
+        checked = repaired = 0
+        batch = []
+        for user_id in user_ids.iterator(chunk_size=batch_size):
+            batch.append(user_id)
+            if len(batch) == batch_size:
+                repaired += UserStats.objects.recount(batch)
+                checked += len(batch)
+                batch = []
+        if batch:
+            repaired += UserStats.objects.recount(batch)
+            checked += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено пользователей: {checked}, исправлено: {repaired}'
+        ))
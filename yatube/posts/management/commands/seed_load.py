@@ -0,0 +1,60 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import load
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими данными для нагрузочного теста: '
+        'подписчики по степенному закону, посты сериями, картинки разных '
+        'размеров с миниатюрами. Вставляет пакетами, в обход сигналов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            type=float,
+            default=1.0,
+            help=(
+                'Множитель объемов из posts.load.VOLUMES '
+                '(1.0 — 2 тыс. пользователей, 20 тыс. постов).'
+            ),
+        )
+        parser.add_argument(
+            '--alpha',
+            type=float,
+            default=1.1,
+            help='Показатель степенного закона для подписчиков и постов.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Сколько строк вставлять за один запрос.',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Начальное значение генератора случайных чисел.',
+        )
+
+    def handle(self, *args, scale, alpha, batch_size, seed, **options):
+        if load.is_seeded():
+            raise CommandError(
+                'Синтетические данные уже загружены '
+                f'(пользователи {load.USERNAME_PREFIX}*).'
+            )
+        volumes = load.scaled(scale)
+        started = time.perf_counter()
+        load.generate(
+            volumes, alpha, batch_size, seed,
+            workers=settings.THUMBNAIL_WORKERS,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Данные загружены за {time.perf_counter() - started:.1f} с: '
+            + ', '.join(f'{k}={v}' for k, v in volumes.items())
+        ))
@@ -0,0 +1,76 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:42
+
+import itertools
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_user_stats(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+
+    def total(model, field):
+        # Отдельный подзапрос на каждый счетчик: без декартова произведения
+        # постов, комментариев и подписок одного пользователя.
+        per_user = (
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        return Coalesce(Subquery(per_user), 0)
+
+    users = User.objects.annotate(
+        posts_total=total(Post, 'author'),
+        comments_total=total(Comment, 'author'),
+        followers_total=total(Follow, 'author'),
+        following_total=total(Follow, 'user'),
+    ).iterator()
+    while True:
+        batch = [
+            UserStats(
+                user_id=user.pk,
+                posts_count=user.posts_total,
+                comments_count=user.comments_total,
+                followers_count=user.followers_total,
+                following_count=user.following_total,
+            )
+            for user in itertools.islice(users, 500)
+        ]
+        if not batch:
+            break
+        UserStats.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0012_auto_20211016_2156'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('comments_count', models.PositiveIntegerField(default=0, verbose_name='Комментариев')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Подписок')),
+            ],
+            options={
+                'verbose_name': 'Статистика пользователя',
+                'verbose_name_plural': 'Статистика пользователей',
+            },
+        ),
+        migrations.RunPython(fill_user_stats, migrations.RunPython.noop),
+    ]
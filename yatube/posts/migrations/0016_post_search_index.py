@@ -0,0 +1,37 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:10
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 есть только в SQLite; на других СУБД поиск работает через LIKE.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE posts_post_fts USING fts5('
+        'text, group_title, author_name, '
+        "tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        'INSERT INTO posts_post_fts (rowid, text, group_title, author_name) '
+        "SELECT p.id, p.text, COALESCE(g.title, ''), u.username "
+        'FROM posts_post p '
+        'LEFT JOIN posts_group g ON g.id = p.group_id '
+        'JOIN auth_user u ON u.id = p.author_id'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:53
+
+from django.db import migrations, models
+
+
+def copy_sorl_records(apps, schema_editor):
+    """Переносит записи из таблицы sorl, чтобы не создавать миниатюры заново."""
+    from sorl.thumbnail.conf import settings as sorl_settings
+
+    SorlRecord = apps.get_model('thumbnail', 'KVStore')
+    ThumbnailRecord = apps.get_model('posts', 'ThumbnailRecord')
+    db = schema_editor.connection.alias
+    prefix = sorl_settings.THUMBNAIL_KEY_PREFIX + '||'
+    rows = (
+        SorlRecord.objects.using(db)
+        .filter(key__startswith=prefix)
+        .values_list('key', 'value')
+    )
+    ThumbnailRecord.objects.using(db).bulk_create(
+        (ThumbnailRecord(key=key[len(prefix):], value=value)
+         for key, value in rows.iterator()),
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_content_addressed_images'),
+        ('thumbnail', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThumbnailRecord',
+            fields=[
+                ('key', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Ключ')),
+                ('value', models.TextField(verbose_name='Значение')),
+            ],
+            options={
+                'verbose_name': 'Запись о миниатюре',
+                'verbose_name_plural': 'Записи о миниатюрах',
+            },
+        ),
+        migrations.RunPython(copy_sorl_records, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,13 @@
 from django.db import models
+from django.db.models import Count, F
+from django.utils import timezone
 
 from django.contrib.auth import get_user_model
 
 from core.models import CreatedModel
 
+from .storage import content_storage
+
 User = get_user_model()
 
 
@@ -16,11 +20,60 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._thumbnail_aliases = None
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._thumbnail_aliases = self._thumbnail_aliases
+        return clone
+
+    def _fetch_all(self):
+        fetched = self._result_cache is not None
+        super()._fetch_all()
+        if not fetched:
+            self.prefetch_thumbnails(self._result_cache)
+
+    def with_thumbnails(self, *aliases):
+        """Посты, у которых записи миниатюр прочитаны одним пакетом.
+
+        aliases — размеры из THUMBNAIL_GEOMETRIES, по умолчанию все.
+        """
+        clone = self._chain()
+        clone._thumbnail_aliases = aliases
+        return clone
+
+    def prefetch_thumbnails(self, posts):
+        """Читает миниатюры posts, если запрошены with_thumbnails()."""
+        if self._thumbnail_aliases is None:
+            return
+        # posts.thumbnails импортирует модели.
+        from . import thumbnails
+        posts = [post for post in posts if isinstance(post, Post)]
+        thumbnails.prefetch(posts, self._thumbnail_aliases)
+
+    def feed(self):
+        """Посты для лент: автор и группа подтягиваются тем же запросом."""
+        return self.select_related('author', 'group').defer(
+            'author__password',
+            'author__last_login',
+            'author__is_superuser',
+            'author__email',
+            'author__is_staff',
+            'author__is_active',
+            'author__date_joined',
+            'group__description',
+        )
+
+
 class Post(CreatedModel):
     text = models.TextField('Текст поста', help_text='Текст нового поста')
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=content_storage,
         blank=True
     )
 
@@ -40,11 +93,33 @@ class Post(CreatedModel):
         help_text='Выберите группу'
     )
 
+    objects = PostQuerySet.as_manager()
+
     def __str__(self):
         return self.text[:15]
 
     class Meta:
         ordering = ('-pub_date',)
+        # Индексы повторяют порядок выборки лент: общей (и keyset-страниц
+        # по ключу (pub_date, id)), профиля и группы. Индексы по updated_at
+        # нужны проверке свежести профиля и группы (posts.freshness).
+        indexes = (
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_date_id'
+            ),
+            models.Index(
+                fields=['author', '-pub_date'], name='post_author_date'
+            ),
+            models.Index(
+                fields=['group', '-pub_date'], name='post_group_date'
+            ),
+            models.Index(
+                fields=['author', 'updated_at'], name='post_author_updated'
+            ),
+            models.Index(
+                fields=['group', 'updated_at'], name='post_group_updated'
+            ),
+        )
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -69,6 +144,11 @@ class Comment(CreatedModel):
 
     class Meta:
         ordering = ('pub_date',)
+        indexes = (
+            models.Index(
+                fields=['post', 'pub_date'], name='comment_post_date'
+            ),
+        )
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
@@ -94,3 +174,222 @@ class Follow(models.Model):
                 name='following'
             ),
         )
+
+
+class UserStatsManager(models.Manager):
+    COUNTERS = {
+        'posts_count': (Post, 'author'),
+        'comments_count': (Comment, 'author'),
+        'followers_count': (Follow, 'author'),
+        'following_count': (Follow, 'user'),
+    }
+
+    def change(self, user_id, **deltas):
+        """Атомарно сдвигает счетчики пользователя на deltas.
+
+        Строки еще нет — она создается пересчетом, который уже учитывает
+        изменение. При уменьшении строку не создаем: пользователь может
+        как раз удаляться вместе со всеми своими записями. Счетчик, который
+        ушел бы ниже нуля, разошелся с таблицами (пакетная загрузка,
+        потерянные комментарии): строка пересчитывается.
+        """
+        rows = self.filter(user_id=user_id, **{
+            f'{name}__gte': -delta
+            for name, delta in deltas.items() if delta < 0
+        })
+        updated = rows.update(**{
+            name: F(name) + delta for name, delta in deltas.items()
+        })
+        if updated:
+            return
+        if (all(delta > 0 for delta in deltas.values())
+                or self.filter(user_id=user_id).exists()):
+            self.recount([user_id])
+
+    def compute(self, user_ids):
+        """Счетчики, посчитанные по исходным таблицам."""
+        counts = {
+            user_id: dict.fromkeys(self.COUNTERS, 0) for user_id in user_ids
+        }
+        for name, (model, field) in self.COUNTERS.items():
+            rows = (
+                model.objects.filter(**{f'{field}_id__in': user_ids})
+                .order_by()
+                .values_list(f'{field}_id')
+                .annotate(total=Count('pk'))
+            )
+            for user_id, total in rows:
+                counts[user_id][name] = total
+        return counts
+
+    def recount(self, user_ids):
+        """Пересчитывает счетчики и чинит расхождения.
+
+        Возвращает число созданных или исправленных строк.
+        """
+        counts = self.compute(user_ids)
+        existing = self.in_bulk(user_ids)
+        missing, drifted = [], []
+        for user_id, values in counts.items():
+            stats = existing.get(user_id)
+            if stats is None:
+                missing.append(self.model(user_id=user_id, **values))
+            elif any(getattr(stats, k) != v for k, v in values.items()):
+                for name, value in values.items():
+                    setattr(stats, name, value)
+                drifted.append(stats)
+        self.bulk_create(missing, ignore_conflicts=True)
+        self.bulk_update(drifted, list(self.COUNTERS))
+        return len(missing) + len(drifted)
+
+
+class UserStats(models.Model):
+    """Денормализованные счетчики пользователя.
+
+    Поддерживаются сигналами posts.signals; расхождения исправляет
+    команда recount_stats.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    comments_count = models.PositiveIntegerField('Комментариев', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    objects = UserStatsManager()
+
+    class Meta:
+        verbose_name = 'Статистика пользователя'
+        verbose_name_plural = 'Статистика пользователей'
+
+    @classmethod
+    def for_user(cls, user):
+        """Счетчики пользователя; для новых пользователей — нулевые."""
+        try:
+            return user.stats
+        except cls.DoesNotExist:
+            return cls(user=user)
+
+
+class FeedEntry(models.Model):
+    """Пост в материализованной ленте подписок пользователя.
+
+    Записи раскладываются при публикации поста (posts.timeline), поэтому
+    лента подписок читается одним проходом по индексу
+    (user, -pub_date, -post).
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пост'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='feed_entry'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='feed_entry_user_date',
+            ),
+            models.Index(
+                fields=['user', 'author'], name='feed_entry_user_author'
+            ),
+        )
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи ленты подписок'
+
+
+class MediaFileManager(models.Manager):
+    def change(self, name, delta):
+        """Атомарно сдвигает число ссылок на файл name на delta."""
+        updated = self.filter(name=name).update(
+            references=F('references') + delta, updated_at=timezone.now()
+        )
+        if not updated and delta > 0:
+            self.recount([name])
+
+    def recount(self, names):
+        """Пересчитывает ссылки на файлы names по таблице постов.
+
+        Возвращает число созданных или исправленных строк.
+        """
+        counts = dict.fromkeys(names, 0)
+        rows = (
+            Post.objects.filter(image__in=names)
+            .order_by()
+            .values_list('image')
+            .annotate(total=Count('pk'))
+        )
+        counts.update(rows)
+        existing = self.in_bulk(names)
+        missing, drifted = [], []
+        for name, total in counts.items():
+            media = existing.get(name)
+            if media is None:
+                missing.append(self.model(name=name, references=total))
+            elif media.references != total:
+                media.references = total
+                drifted.append(media)
+        self.bulk_create(missing, ignore_conflicts=True)
+        self.bulk_update(drifted, ['references'])
+        return len(missing) + len(drifted)
+
+
+class MediaFile(models.Model):
+    """Файл картинки в хранилище и число постов, которые на него ссылаются.
+
+    Поддерживается сигналами posts.signals; файлы без ссылок удаляет
+    команда gc_media.
+    """
+    name = models.CharField('Имя файла', max_length=100, primary_key=True)
+    references = models.IntegerField('Ссылок', default=0)
+    updated_at = models.DateTimeField('Обновлен', auto_now=True)
+
+    objects = MediaFileManager()
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=['references', 'updated_at'],
+                name='media_file_references'
+            ),
+        )
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+
+class ThumbnailRecord(models.Model):
+    """Запись KV-хранилища sorl для миниатюр (posts.thumbnail_store).
+
+    Ключ хранится без общего префикса THUMBNAIL_KEY_PREFIX.
+    """
+    key = models.CharField('Ключ', max_length=100, primary_key=True)
+    value = models.TextField('Значение')
+
+    class Meta:
+        verbose_name = 'Запись о миниатюре'
+        verbose_name_plural = 'Записи о миниатюрах'
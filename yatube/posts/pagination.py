@@ -0,0 +1,223 @@
+import base64
+import json
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+from yatube.settings import PAGE_ITEMS_NUM, PAGE_COUNT_LIMIT
+
+
+class InvalidCursor(Exception):
+    """Курсор не удалось разобрать."""
+
+
+def encode_cursor(values, reverse=False):
+    """Упаковывает значения ключа сортировки в непрозрачный токен."""
+    payload = {'v': values}
+    if reverse:
+        payload['r'] = 1
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен, созданный encode_cursor."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = payload['v']
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor(token)
+    if not isinstance(values, list):
+        raise InvalidCursor(token)
+    return values, bool(payload.get('r'))
+
+
+class KeysetPage:
+    """Страница keyset-пагинатора.
+
+    Повторяет ту часть интерфейса Page, которую используют шаблоны,
+    но вместо номеров страниц отдает курсоры соседних страниц.
+    """
+    is_keyset = True
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<KeysetPage of %s items>' % len(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """Пагинация по ключу сортировки вместо LIMIT/OFFSET.
+
+    Каждая страница выбирается условием «строго после последней строки
+    предыдущей страницы», поэтому стоимость запроса не зависит от номера
+    страницы и не требует COUNT(*). Ключ сортировки должен быть
+    уникальным, поэтому последним полем всегда идет pk.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-pk'),
+                 count_limit=None):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.count_limit = count_limit
+        self._opts = object_list.model._meta
+
+    def _field(self, name):
+        if name == 'pk':
+            return self._opts.pk
+        return self._opts.get_field(name)
+
+    def _fields(self):
+        for item in self.ordering:
+            descending = item.startswith('-')
+            yield item.lstrip('-'), descending
+
+    def _values(self, obj):
+        return [
+            self._field(name).value_to_string(obj)
+            for name, _ in self._fields()
+        ]
+
+    def _parse(self, values):
+        fields = list(self._fields())
+        if len(values) != len(fields):
+            raise InvalidCursor(values)
+        parsed = []
+        try:
+            for (name, _), value in zip(fields, values):
+                parsed.append(self._field(name).to_python(value))
+        except Exception:
+            raise InvalidCursor(values)
+        return parsed
+
+    def _seek(self, values, reverse):
+        """Условие «после строки с ключом values» в направлении обхода.
+
+        Кроме самого условия — нестрогая граница по первому полю ключа:
+        по условию с OR SQLite не может начать обход индекса с нужного
+        места и читает его с самого начала.
+        """
+        condition = Q()
+        equal = {}
+        bound = None
+        for (name, descending), value in zip(self._fields(), values):
+            forward = 'lt' if descending else 'gt'
+            backward = 'gt' if descending else 'lt'
+            lookup = backward if reverse else forward
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            if bound is None:
+                bound = Q(**{f'{name}__{lookup}e': value})
+            equal[name] = value
+        return bound & condition
+
+    def _order(self, reverse):
+        if not reverse:
+            return self.ordering
+        return tuple(
+            item[1:] if item.startswith('-') else '-' + item
+            for item in self.ordering
+        )
+
+    def _decode(self, cursor):
+        if cursor:
+            try:
+                raw_values, reverse = decode_cursor(cursor)
+                return self._parse(raw_values), reverse
+            except InvalidCursor:
+                pass
+        return None, False
+
+    def page_queryset(self, cursor=None):
+        """Запрос страницы после курсора (с одной лишней строкой)."""
+        values, reverse = self._decode(cursor)
+        queryset = self.object_list.order_by(*self._order(reverse))
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, reverse))
+        return queryset[:self.per_page + 1]
+
+    def cursor_for(self, obj, reverse=False):
+        """Курсор страницы, следующей за obj (или предшествующей ему)."""
+        return encode_cursor(self._values(obj), reverse)
+
+    def get_page(self, cursor=None):
+        """Страница после курсора; битый курсор дает первую страницу."""
+        values, reverse = self._decode(cursor)
+        rows = list(self.page_queryset(cursor))
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            if not has_more:
+                # Дошли до начала списка: отдаем полноценную первую страницу.
+                return self.get_page()
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or reverse:
+                next_cursor = self.cursor_for(rows[-1])
+            if values is not None:
+                previous_cursor = self.cursor_for(rows[0], reverse=True)
+        return KeysetPage(rows, self, next_cursor, previous_cursor)
+
+    def _bounded_count(self):
+        if not hasattr(self, '_count'):
+            queryset = self.object_list.order_by()
+            if self.count_limit is not None:
+                queryset = queryset[:self.count_limit + 1]
+            self._count = queryset.count()
+        return self._count
+
+    @property
+    def count(self):
+        """Число объектов, но не больше count_limit (если он задан)."""
+        if self.count_is_approximate:
+            return self.count_limit
+        return self._bounded_count()
+
+    @property
+    def count_is_approximate(self):
+        return (
+            self.count_limit is not None
+            and self._bounded_count() > self.count_limit
+        )
+
+
+def posts_paginate(request, posts_list, keyset=False, count=None):
+    """Страница постов; count — заранее известное число постов."""
+    if keyset:
+        paginator = KeysetPaginator(
+            posts_list, PAGE_ITEMS_NUM, count_limit=PAGE_COUNT_LIMIT
+        )
+        return paginator.get_page(request.GET.get('cursor'))
+
+    paginator = Paginator(posts_list, PAGE_ITEMS_NUM)
+    if count is not None:
+        paginator.count = count
+    page_number = request.GET.get('page')
+    page_obj = paginator.get_page(page_number)
+
+    return page_obj
@@ -0,0 +1,261 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+Индекс posts_post_fts хранит текст поста, название группы и имя автора;
+rowid строки индекса совпадает с pk поста. Индекс обновляется сигналами
+(posts.signals) и перестраивается командой rebuild_search_index. На других
+СУБД поиск откатывается к LIKE по тексту поста.
+"""
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Group, Post
+from .pagination import (InvalidCursor, KeysetPage, KeysetPaginator,
+                         decode_cursor, encode_cursor)
+
+TABLE = 'posts_post_fts'
+# Веса bm25 для столбцов text, group_title, author_name.
+WEIGHTS = (10.0, 2.0, 1.0)
+BATCH_SIZE = 1000
+
+_TERM = re.compile(r'\w+')
+
+_SELECT_SOURCE = (
+    'SELECT p.id, p.text, COALESCE(g.title, \'\'), u.username '
+    f'FROM {Post._meta.db_table} p '
+    f'LEFT JOIN {Group._meta.db_table} g ON g.id = p.group_id '
+    f'JOIN {get_user_model()._meta.db_table} u ON u.id = p.author_id'
+)
+
+
+def is_available(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def rebuild(batch_size=BATCH_SIZE):
+    """Заново заполняет индекс пакетами по batch_size постов.
+
+    Возвращает число проиндексированных постов.
+    """
+    if not is_available():
+        return 0
+    indexed = 0
+    last_id = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        while True:
+            cursor.execute(
+                f'INSERT INTO {TABLE} '
+                '(rowid, text, group_title, author_name) '
+                f'{_SELECT_SOURCE} WHERE p.id > %s ORDER BY p.id LIMIT %s',
+                [last_id, batch_size],
+            )
+            if cursor.rowcount <= 0:
+                break
+            indexed += cursor.rowcount
+            cursor.execute(f'SELECT MAX(rowid) FROM {TABLE}')
+            last_id = cursor.fetchone()[0]
+    return indexed
+
+
+def index_post(post_id):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, text, group_title, author_name) '
+            f'{_SELECT_SOURCE} WHERE p.id = %s',
+            [post_id],
+        )
+
+
+def index_posts(post_ids, batch_size=500):
+    """Индексирует посты post_ids заново, пакетами по batch_size."""
+    if not is_available():
+        return
+    post_ids = sorted(post_ids)
+    with connection.cursor() as cursor:
+        for start in range(0, len(post_ids), batch_size):
+            batch = post_ids[start:start + batch_size]
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(
+                f'DELETE FROM {TABLE} WHERE rowid IN ({placeholders})', batch
+            )
+            cursor.execute(
+                f'INSERT INTO {TABLE} (rowid, text, group_title, author_name) '
+                f'{_SELECT_SOURCE} WHERE p.id IN ({placeholders})',
+                batch,
+            )
+
+
+def remove_post(post_id):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+
+
+def rename_group(group_id, title):
+    """Обновляет название группы у всех ее постов в индексе."""
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {TABLE} SET group_title = %s WHERE rowid IN '
+            f'(SELECT id FROM {Post._meta.db_table} WHERE group_id = %s)',
+            [title, group_id],
+        )
+
+
+def rename_author(author_id, username):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {TABLE} SET author_name = %s WHERE rowid IN '
+            f'(SELECT id FROM {Post._meta.db_table} WHERE author_id = %s)',
+            [username, author_id],
+        )
+
+
+def filter_posts(queryset, query):
+    """Посты queryset, найденные по запросу (на других СУБД — LIKE)."""
+    if not is_available():
+        return queryset.filter(text__icontains=query.strip())
+    expression = match_expression(query)
+    if not expression:
+        return queryset.none()
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s', [expression]
+    ))
+
+
+def match_expression(query):
+    """Запрос пользователя в виде выражения MATCH.
+
+    Каждое слово ищется как префикс, все слова должны встретиться.
+    Синтаксис FTS5 из запроса не пропускается.
+    """
+    terms = _TERM.findall(query)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+class SearchPaginator:
+    """Keyset-пагинация результатов поиска по (рангу bm25, pk).
+
+    Интерфейс повторяет KeysetPaginator, чтобы страницы выводились тем же
+    шаблоном пагинации.
+    """
+
+    def __init__(self, query, per_page, count_limit=None):
+        self.expression = match_expression(query)
+        self.per_page = int(per_page)
+        self.count_limit = count_limit
+
+    def _rows(self, after, reverse):
+        weights = ', '.join(str(weight) for weight in WEIGHTS)
+        direction = 'DESC' if reverse else 'ASC'
+        params = [self.expression]
+        seek = ''
+        if after is not None:
+            sign = '<' if reverse else '>'
+            seek = (
+                f'WHERE score {sign} %s OR (score = %s AND rowid {sign} %s)'
+            )
+            params += [after[0], after[0], after[1]]
+        sql = (
+            'SELECT rowid, score FROM ('
+            f'SELECT rowid, bm25({TABLE}, {weights}) AS score '
+            f'FROM {TABLE} WHERE {TABLE} MATCH %s'
+            f') {seek} '
+            f'ORDER BY score {direction}, rowid {direction} LIMIT %s'
+        )
+        params.append(self.per_page + 1)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def _decode(self, cursor):
+        if cursor:
+            try:
+                values, reverse = decode_cursor(cursor)
+                score, pk = values
+                return (float(score), int(pk)), reverse
+            except (InvalidCursor, TypeError, ValueError):
+                pass
+        return None, False
+
+    def get_page(self, cursor=None):
+        if not self.expression:
+            return KeysetPage([], self, None, None)
+        after, reverse = self._decode(cursor)
+        rows = self._rows(after, reverse)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            if not has_more:
+                return self.get_page()
+            rows.reverse()
+
+        posts = Post.objects.feed().with_thumbnails().in_bulk(
+            [pk for pk, _ in rows]
+        )
+        object_list = [posts[pk] for pk, _ in rows if pk in posts]
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or reverse:
+                next_cursor = encode_cursor(list(reversed(rows[-1])))
+            if after is not None:
+                previous_cursor = encode_cursor(
+                    list(reversed(rows[0])), reverse=True
+                )
+        return KeysetPage(object_list, self, next_cursor, previous_cursor)
+
+    def _bounded_count(self):
+        if not hasattr(self, '_count'):
+            if not self.expression:
+                self._count = 0
+                return self._count
+            limit = ''
+            params = [self.expression]
+            if self.count_limit is not None:
+                limit = 'LIMIT %s'
+                params.append(self.count_limit + 1)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT COUNT(*) FROM (SELECT 1 FROM {TABLE} '
+                    f'WHERE {TABLE} MATCH %s {limit})',
+                    params,
+                )
+                self._count = cursor.fetchone()[0]
+        return self._count
+
+    @property
+    def count(self):
+        if self.count_is_approximate:
+            return self.count_limit
+        return self._bounded_count()
+
+    @property
+    def count_is_approximate(self):
+        return (
+            self.count_limit is not None
+            and self._bounded_count() > self.count_limit
+        )
+
+
+def paginator(query, per_page, count_limit=None):
+    """Пагинатор результатов поиска (на других СУБД — по LIKE)."""
+    if is_available():
+        return SearchPaginator(query, per_page, count_limit)
+    return KeysetPaginator(
+        Post.objects.feed().with_thumbnails().filter(
+            text__icontains=query.strip()
+        ),
+        per_page,
+        count_limit=count_limit,
+    )
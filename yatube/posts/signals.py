@@ -0,0 +1,166 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import feed_cache, search, timeline
+from .models import Comment, Follow, Group, MediaFile, Post, UserStats
+
+User = get_user_model()
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_post(sender, instance, **kwargs):
+    """Запоминает прежние группу и картинку поста.
+
+    Ленту прежней группы тоже нужно сбросить, а у прежней картинки —
+    убрать ссылку.
+    """
+    instance._previous_group_id = None
+    instance._previous_image = ''
+    if instance.pk is not None:
+        previous = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', 'image')
+            .first()
+        )
+        if previous is not None:
+            instance._previous_group_id, instance._previous_image = previous
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post(sender, instance, **kwargs):
+    feed_cache.invalidate(*feed_cache.post_scopes(
+        instance, getattr(instance, '_previous_group_id', None)
+    ))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment(sender, instance, **kwargs):
+    feed_cache.invalidate(feed_cache.post_scope(instance.post_id))
+    # По updated_at поста проверяется свежесть его страницы (304).
+    Post.objects.filter(pk=instance.post_id).update(
+        updated_at=timezone.now()
+    )
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow(sender, instance, **kwargs):
+    feed_cache.invalidate(feed_cache.follow_scope(instance.user_id))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group(sender, instance, **kwargs):
+    # Название группы выводится и в общей ленте, и в профилях авторов.
+    feed_cache.invalidate(
+        feed_cache.index_scope(),
+        feed_cache.groups_scope(),
+        feed_cache.group_scope(instance.pk),
+    )
+
+
+@receiver(post_save, sender=Post)
+def count_created_post(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.change(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    UserStats.objects.change(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_created_comment(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.change(instance.author_id, comments_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    UserStats.objects.change(instance.author_id, comments_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def count_created_follow(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.change(instance.author_id, followers_count=1)
+        UserStats.objects.change(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    UserStats.objects.change(instance.author_id, followers_count=-1)
+    UserStats.objects.change(instance.user_id, following_count=-1)
+
+
+@receiver(post_save, sender=Post)
+def count_image_references(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_image', '') or ''
+    current = instance.image.name or ''
+    if previous == current:
+        return
+    if current:
+        MediaFile.objects.change(current, 1)
+    if previous:
+        MediaFile.objects.change(previous, -1)
+
+
+@receiver(post_delete, sender=Post)
+def release_image(sender, instance, **kwargs):
+    if instance.image.name:
+        MediaFile.objects.change(instance.image.name, -1)
+
+
+# Ленту подписок обновляем после счетчиков: порог раскладки сравнивается
+# с уже пересчитанным числом подписчиков.
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_follow_feed(sender, instance, created, **kwargs):
+    if created:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_follow_feed(sender, instance, **kwargs):
+    timeline.unfollow(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    search.index_post(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Group)
+def reindex_group(sender, instance, created, **kwargs):
+    if not created:
+        search.rename_group(instance.pk, instance.title)
+
+
+@receiver(pre_delete, sender=Group)
+def unindex_group(sender, instance, **kwargs):
+    # После удаления у постов group_id станет NULL, и их уже не найти.
+    search.rename_group(instance.pk, '')
+
+
+@receiver(post_save, sender=User)
+def reindex_author(sender, instance, created, update_fields, **kwargs):
+    # Вход на сайт сохраняет только last_login: индекс не трогаем.
+    if created or (update_fields and 'username' not in update_fields):
+        return
+    search.rename_author(instance.pk, instance.username)
@@ -0,0 +1,74 @@
+"""Хранение картинок постов по хешу содержимого.
+
+Файл сохраняется под именем <каталог>/<2 символа>/<sha256>.<расширение>:
+одинаковые картинки (репосты, повторные загрузки) лежат на диске один раз,
+а их миниатюры sorl, имена которых строятся из имени исходного файла, тоже
+общие и повторно не генерируются. Хеш считается при копировании загрузки во
+временный файл, содержимое целиком в память не читается.
+
+Ссылки постов на файлы считает MediaFile (posts.signals). Файлы при
+удалении или замене картинки не удаляются сразу — их вместе с миниатюрами
+убирает команда gc_media.
+
+Картинкам, загруженным до хранения по хешу, после миграции нужна команда
+adopt_images: ключи миниатюр sorl зависят от класса хранилища, и прежние
+миниатюры с новым хранилищем не находятся.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# Каталогов второго уровня 256: в одном каталоге не скапливаются тысячи
+# файлов.
+PREFIX_LENGTH = 2
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # Имя все равно заменит хеш, а одинаковое содержимое — не конфликт.
+        return name
+
+    def _save(self, name, content):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        os.makedirs(self.location, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(
+            prefix='.upload-', dir=self.location
+        )
+        try:
+            with os.fdopen(fd, 'wb') as temp:
+                content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp.write(chunk)
+            hexdigest = digest.hexdigest()
+            name = os.path.join(
+                directory, hexdigest[:PREFIX_LENGTH], hexdigest + extension
+            ).replace('\\', '/')
+            path = self.path(name)
+            if os.path.exists(path):
+                # Свежая дата изменения не дает gc_media удалить файл, пока
+                # новый пост на него еще не сохранен.
+                os.utime(path)
+                return name
+            directory = os.path.dirname(path)
+            os.makedirs(directory, exist_ok=True)
+            if self.directory_permissions_mode is not None:
+                os.chmod(directory, self.directory_permissions_mode)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+            # Одновременная загрузка того же файла перезапишет его тем же
+            # содержимым: замена атомарная.
+            os.replace(temp_path, path)
+            return name
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+content_storage = ContentAddressedStorage()
@@ -0,0 +1,52 @@
+from django import template
+from django.conf import settings
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(image, alias):
+    """Готовая миниатюра картинки, а пока ее нет — исходная картинка.
+
+    Миниатюры создает posts.thumbnails при сохранении поста, здесь они
+    только читаются.
+    """
+    if not image:
+        return None
+    return thumbnails.ready_thumbnail(image, alias) or image
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def post_picture(image, alias):
+    """<picture> с вариантами картинки в srcset и width/height.
+
+    Первыми идут форматы из THUMBNAIL_VARIANT_FORMATS, последний доступный
+    (JPEG) — в самом <img>. Пока вариантов нет, выводится то же, что
+    post_thumbnail.
+    """
+    if not image:
+        return {}
+    src = thumbnails.ready_thumbnail(image, alias)
+    ready = thumbnails.ready_variants(image, alias)
+    srcsets = [
+        (format_, ', '.join(
+            f'{thumbnail.url} {width}w' for width, thumbnail in ready[format_]
+        ))
+        for format_ in thumbnails.formats() if format_ in ready
+    ]
+    fallback = srcsets.pop()[1] if srcsets else ''
+    return {
+        'src': src or image,
+        # Размеры миниатюры лежат в KV-хранилище, у исходной картинки их
+        # пришлось бы читать из файла.
+        'width': src.width if src else None,
+        'height': src.height if src else None,
+        'srcset': fallback,
+        'sources': [
+            {'type': thumbnails.MIME_TYPES[format_], 'srcset': srcset}
+            for format_, srcset in srcsets
+        ],
+        'sizes': settings.THUMBNAIL_SIZES.get(alias, '100vw'),
+    }
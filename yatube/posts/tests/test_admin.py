@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+from django.contrib.admin.sites import site
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import explicit_pub_date
+
+from ..models import Group, Post
+
+User = get_user_model()
+START = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+class PostAdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(PostAdminTests.admin)
+        self.url = reverse('admin:posts_post_changelist')
+
+    def create_posts(self, count, start=0, step=timedelta(minutes=1)):
+        with explicit_pub_date(Post):
+            for number in range(start, start + count):
+                Post.objects.create(
+                    author=User.objects.create_user(username=f'user{number}'),
+                    group=Group.objects.create(
+                        title=f'Группа {number}', slug=f'group-{number}'
+                    ),
+                    text=f'Тестовый пост {number}',
+                    pub_date=START + step * number,
+                )
+
+    def queries(self, url):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(captured)
+
+    def test_bounded_queries(self):
+        """Число запросов списка постов не растет с числом строк."""
+        urls = (
+            self.url,
+            f'{self.url}?pub_date__year=2020',
+            f'{self.url}?q=Тестовый&pub_date__year=2020&pub_date__month=1',
+        )
+        self.create_posts(3)
+        few = [self.queries(url) for url in urls]
+        self.create_posts(30, start=3)
+
+        self.assertEqual([self.queries(url) for url in urls], few)
+
+    def test_changelist(self):
+        """Подписи связанных объектов, оценка числа строк и поиск."""
+        self.create_posts(3)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['cl'].result_count, 3)
+        self.assertContains(response, 'Группа 1')
+        self.assertContains(response, 'name="form-0-author"')
+        self.assertNotContains(response, '<select name="form-0-author"')
+
+        response = self.client.get(self.url, {'q': 'пост 2'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+        self.assertContains(response, 'Тестовый пост 2')
+
+    def test_dates_match_distinct(self):
+        """dates() по индексу совпадает со стандартным DISTINCT."""
+        self.create_posts(5, step=timedelta(days=200))
+        queryset = site._registry[Post].get_queryset(None)
+
+        for kind in ('year', 'month', 'day'):
+            with self.subTest(kind=kind):
+                self.assertEqual(
+                    list(queryset.dates('pub_date', kind, 'DESC')),
+                    list(Post.objects.dates('pub_date', kind, 'DESC')),
+                )
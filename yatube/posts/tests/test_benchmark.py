@@ -0,0 +1,64 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+
+from .. import benchmark, search
+from ..models import FeedEntry, Follow, Post, UserStats
+
+VOLUMES = {
+    'users': 20,
+    'groups': 2,
+    'posts': 100,
+    'follows': 100,
+    'comments': 50,
+}
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        benchmark.seed(VOLUMES, batch_size=30)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_seed_fills_derived_tables(self):
+        """Пакетная загрузка пересчитывает счетчики, ленты и индекс."""
+        self.assertEqual(Post.objects.count(), VOLUMES['posts'])
+        self.assertEqual(Follow.objects.count(), VOLUMES['follows'])
+        self.assertEqual(UserStats.objects.recount(
+            list(UserStats.objects.values_list('user_id', flat=True))
+        ), 0)
+        expected = sum(
+            Post.objects.filter(author_id=author_id).count()
+            for author_id in Follow.objects.values_list('author_id', flat=True)
+        )
+        self.assertEqual(FeedEntry.objects.count(), expected)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {search.TABLE}')
+            self.assertEqual(cursor.fetchone()[0], VOLUMES['posts'])
+
+    def test_measure_all_scenarios(self):
+        """Все сценарии бенчмарка выполняются и измеряются."""
+        reader, scenarios = benchmark.scenarios()
+        client = Client()
+        client.force_login(benchmark.User.objects.get(pk=reader))
+        for name, (method, url, data) in scenarios.items():
+            with self.subTest(name=name):
+                result = benchmark.measure(
+                    client, method, url, data, repeat=1
+                )
+                self.assertGreater(result['queries'], 0)
+                self.assertGreater(result['alloc_kib'], 0)
+
+    def test_regressions(self):
+        """Рост числа запросов или времени сверх порога — регрессия."""
+        baseline = {'index': {'queries': 4, 'time_ms': 10, 'alloc_kib': 100}}
+        same = {'index': {'queries': 4, 'time_ms': 14, 'alloc_kib': 110}}
+        worse = {'index': {'queries': 5, 'time_ms': 40, 'alloc_kib': 100}}
+
+        self.assertEqual(list(benchmark.regressions(same, baseline, 0.2)), [])
+        self.assertEqual(
+            len(list(benchmark.regressions(worse, baseline, 0.2))), 2
+        )
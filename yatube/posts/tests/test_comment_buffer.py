@@ -0,0 +1,111 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import comment_buffer
+from ..models import Comment, Post, UserStats
+
+User = get_user_model()
+
+
+# Фоновый поток не видит данных незавершенной транзакции теста: очередь
+# записывает сам тест через flush().
+@override_settings(COMMENT_BUFFER_ENABLED=True, COMMENT_BUFFER_BATCH_SIZE=3)
+@mock.patch('posts.feed_cache.transaction.on_commit', lambda func: func())
+@mock.patch('posts.comment_buffer._start', lambda: None)
+class CommentBufferTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(comment_buffer.flush)
+        self.authorized_client = Client()
+        self.authorized_client.force_login(CommentBufferTests.user)
+        self.reader_client = Client()
+        self.reader_client.force_login(CommentBufferTests.reader)
+        self.url = reverse(
+            'posts:post_detail', args=(CommentBufferTests.post.pk,)
+        )
+
+    def comment(self, text):
+        self.authorized_client.post(
+            reverse('posts:add_comment', args=(CommentBufferTests.post.pk,)),
+            data={'text': text},
+        )
+
+    def test_author_sees_queued_comment(self):
+        """Автор сразу видит свой комментарий, остальные — после записи."""
+        response = self.authorized_client.get(self.url)
+        self.comment('Комментарий в очереди')
+
+        self.assertFalse(Comment.objects.exists())
+        response = self.authorized_client.get(
+            self.url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertContains(response, 'Комментарий в очереди')
+        self.assertNotContains(
+            self.reader_client.get(self.url), 'Комментарий в очереди'
+        )
+
+        self.assertEqual(comment_buffer.flush(), 1)
+        self.assertContains(
+            self.reader_client.get(self.url), 'Комментарий в очереди'
+        )
+        self.assertEqual(
+            UserStats.for_user(CommentBufferTests.user).comments_count, 1
+        )
+
+    def test_full_batch_wakes_writer(self):
+        """Полный пакет будит фоновый поток, не дожидаясь интервала."""
+        self.addCleanup(comment_buffer._wakeup.clear)
+        for number in range(2):
+            self.comment(f'Комментарий {number}')
+        self.assertFalse(comment_buffer._wakeup.is_set())
+        self.comment('Комментарий 2')
+        self.assertTrue(comment_buffer._wakeup.is_set())
+
+        self.assertEqual(comment_buffer.flush(), 3)
+        self.assertEqual(Comment.objects.count(), 3)
+        self.assertEqual(comment_buffer.pending(
+            CommentBufferTests.post.pk, CommentBufferTests.user.pk
+        ), [])
+
+    def failing_save(self):
+        return mock.patch.object(
+            comment_buffer, '_save',
+            side_effect=OperationalError('database is locked'),
+        )
+
+    def pending(self):
+        return comment_buffer.pending(
+            CommentBufferTests.post.pk, CommentBufferTests.user.pk
+        )
+
+    def test_failed_batch_retried(self):
+        """Пакет, который не удалось записать, остается в очереди."""
+        self.comment('Комментарий')
+        with self.failing_save(), self.assertLogs('posts.comment_buffer'):
+            self.assertEqual(comment_buffer.flush(), 0)
+
+        self.assertEqual(len(self.pending()), 1)
+        self.assertEqual(comment_buffer.flush(), 1)
+        self.assertTrue(Comment.objects.exists())
+
+    @override_settings(COMMENT_BUFFER_MAX_ATTEMPTS=2)
+    def test_batch_dropped_after_attempts(self):
+        self.comment('Комментарий')
+        with self.failing_save(), self.assertLogs('posts.comment_buffer'):
+            comment_buffer.flush()
+            self.assertEqual(len(self.pending()), 1)
+            comment_buffer.flush()
+
+        self.assertEqual(self.pending(), [])
@@ -1,12 +1,16 @@
 import shutil
 import tempfile
+from io import BytesIO
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from .. import thumbnails
 from ..forms import PostForm
 from ..models import Comment, Post
 
@@ -117,6 +121,69 @@ class PostFormTests(TestCase):
             ).exists()
         )
 
+    @override_settings(THUMBNAIL_PREGENERATE_ASYNC=False)
+    @mock.patch('posts.forms.transaction.on_commit', lambda func: func())
+    def test_thumbnails_pregenerated(self):
+        """Миниатюры новой картинки создаются при сохранении формы."""
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        uploaded = SimpleUploadedFile(
+            name='thumb.gif',
+            content=small_gif,
+            content_type='image/gif'
+        )
+
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с картинкой', 'image': uploaded},
+        )
+
+        post = Post.objects.get(text='Пост с картинкой')
+        thumbnail = thumbnails.ready_thumbnail(post.image, 'card')
+        self.assertIsNotNone(thumbnail)
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', args=(post.pk,))
+        )
+        self.assertContains(response, thumbnail.url)
+
+    @override_settings(THUMBNAIL_PREGENERATE_ASYNC=False)
+    @mock.patch('posts.forms.transaction.on_commit', lambda func: func())
+    def test_picture_variants(self):
+        """На странице поста — srcset из вариантов и размеры миниатюры."""
+        content = BytesIO()
+        Image.new('RGB', (1200, 600), (200, 30, 30)).save(content, 'JPEG')
+        uploaded = SimpleUploadedFile(
+            name='wide.jpg',
+            content=content.getvalue(),
+            content_type='image/jpeg'
+        )
+
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с вариантами', 'image': uploaded},
+        )
+
+        post = Post.objects.get(text='Пост с вариантами')
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', args=(post.pk,))
+        )
+        ready = thumbnails.ready_variants(post.image, 'card')
+        self.assertEqual(list(ready), thumbnails.formats())
+        for width, thumbnail in ready['JPEG']:
+            self.assertContains(response, f'{thumbnail.url} {width}w')
+            self.assertEqual(thumbnail.width, width)
+        self.assertContains(response, 'width="960" height="339"')
+        for format_ in thumbnails.formats()[:-1]:
+            self.assertContains(
+                response, f'type="{thumbnails.MIME_TYPES[format_]}"'
+            )
+
     def test_create_post_authorized_only(self):
         """Перенаправление неавторизированного пользователя."""
         user = PostFormTests.user
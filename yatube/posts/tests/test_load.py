@@ -0,0 +1,65 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from .. import load, thumbnails
+from ..models import Comment, Follow, Post, UserStats
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+VOLUMES = {
+    'users': 40,
+    'groups': 3,
+    'posts': 200,
+    'follows': 300,
+    'comments': 100,
+    'images': 3,
+}
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class LoadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        load.generate(
+            VOLUMES, batch_size=50, image_sizes=((40, 30), (80, 60))
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_generate(self):
+        """Объемы соблюдены, подписчики сосредоточены у немногих авторов."""
+        self.assertTrue(load.is_seeded())
+        self.assertEqual(Post.objects.count(), VOLUMES['posts'])
+        self.assertEqual(Comment.objects.count(), VOLUMES['comments'])
+        self.assertEqual(Follow.objects.count(), VOLUMES['follows'])
+        post = Post.objects.exclude(image='').first()
+        self.assertIsNotNone(thumbnails.ready_thumbnail(post.image, 'card'))
+
+        followers = sorted(
+            UserStats.objects.values_list('followers_count', flat=True),
+            reverse=True,
+        )
+        top = followers[:len(followers) // 10]
+        self.assertGreater(sum(top), VOLUMES['follows'] // 4)
+
+    def test_run_reports_percentiles(self):
+        """Прогон через тестовый клиент проходит без ошибок."""
+        samples, elapsed = load.run(
+            load.ClientDriver, load.targets(), requests=30, concurrency=1
+        )
+        results = load.summary(samples, elapsed)
+
+        self.assertEqual(results['total']['requests'], 30)
+        self.assertEqual(results['total']['errors'], 0)
+        self.assertLessEqual(results['total']['p50'], results['total']['p99'])
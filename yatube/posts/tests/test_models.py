@@ -1,7 +1,11 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..management.commands.check_query_plans import bad_steps
+from ..models import Comment, Follow, Group, Post, UserStats
 
 User = get_user_model()
 
@@ -35,3 +39,79 @@ class PostModelTest(TestCase):
             post.__str__(), 'Тестовая группа',
             'Неккоректное отображение объекта модели Post'
         )
+
+
+class UserStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def test_counters_follow_writes(self):
+        """Счетчики меняются вместе с постами, комментариями и подписками."""
+        user = UserStatsTest.user
+        reader = UserStatsTest.reader
+
+        post = Post.objects.create(author=user, text='Тестовый пост')
+        Comment.objects.create(author=reader, post=post, text='Коммент')
+        Follow.objects.create(user=reader, author=user)
+
+        stats = UserStats.objects.get(user=user)
+        self.assertEqual(stats.posts_count, 1)
+        self.assertEqual(stats.followers_count, 1)
+        reader_stats = UserStats.objects.get(user=reader)
+        self.assertEqual(reader_stats.comments_count, 1)
+        self.assertEqual(reader_stats.following_count, 1)
+
+        post.delete()
+        Follow.objects.all().delete()
+
+        reader_stats.refresh_from_db()
+        self.assertEqual(reader_stats.comments_count, 0)
+        self.assertEqual(reader_stats.following_count, 0)
+        stats.refresh_from_db()
+        self.assertEqual(stats.posts_count, 0)
+        self.assertEqual(stats.followers_count, 0)
+
+    def test_recount_repairs_drift(self):
+        """recount_stats исправляет разошедшиеся счетчики."""
+        user = UserStatsTest.user
+        Post.objects.create(author=user, text='Тестовый пост')
+        UserStats.objects.filter(user=user).update(posts_count=42)
+
+        call_command('recount_stats', stdout=StringIO())
+
+        self.assertEqual(UserStats.objects.get(user=user).posts_count, 1)
+        self.assertTrue(UserStats.objects.filter(user=UserStatsTest.reader))
+
+    def test_drifted_counter_recounted_on_delete(self):
+        """Удаление при заниженном счетчике не падает, а чинит его."""
+        user = UserStatsTest.user
+        first = Post.objects.create(author=user, text='Первый пост')
+        Post.objects.create(author=user, text='Второй пост')
+        UserStats.objects.filter(user=user).update(posts_count=0)
+
+        first.delete()
+
+        self.assertEqual(UserStats.objects.get(user=user).posts_count, 1)
+
+
+class QueryPlanTest(TestCase):
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент не просматривают таблицы целиком."""
+        user = User.objects.create_user(username='auth')
+        group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Post.objects.create(author=user, text='Тестовый пост', group=group)
+
+        call_command('check_query_plans', stdout=StringIO())
+
+    def test_seek_index_walk_reported(self):
+        """Для запроса после курсора просмотр индекса целиком — ошибка."""
+        plan = ['SCAN posts_post USING INDEX post_date_id']
+        self.assertEqual(list(bad_steps(plan)), [])
+        self.assertEqual(list(bad_steps(plan, seek=True)), plan)
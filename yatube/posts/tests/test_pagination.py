@@ -0,0 +1,89 @@
+from django.contrib.auth import get_user_model
+from django.template.loader import render_to_string
+from django.test import TestCase
+
+from ..models import Post
+from ..pagination import KeysetPaginator, decode_cursor, encode_cursor
+
+User = get_user_model()
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+
+        for post_number in range(13):
+            Post.objects.create(
+                author=cls.user,
+                text=f'Тестовый пост {post_number}',
+            )
+
+        # Посты созданы почти одновременно: проверяем, что порядок
+        # однозначен и при совпадающих датах.
+        Post.objects.update(pub_date=Post.objects.first().pub_date)
+        cls.expected = list(Post.objects.order_by('-pub_date', '-pk'))
+
+    def test_cursor_roundtrip(self):
+        """Курсор кодируется и декодируется без потерь."""
+        token = encode_cursor(['2021-10-16T20:28:00+00:00', '5'], True)
+        self.assertEqual(
+            decode_cursor(token),
+            (['2021-10-16T20:28:00+00:00', '5'], True)
+        )
+
+    def test_walk_forward_and_back(self):
+        """Страницы идут подряд без пропусков и повторов в обе стороны."""
+        paginator = KeysetPaginator(Post.objects.all(), 5)
+
+        first = paginator.get_page()
+        second = paginator.get_page(first.next_cursor)
+        third = paginator.get_page(second.next_cursor)
+
+        self.assertFalse(first.has_previous())
+        self.assertFalse(third.has_next())
+        self.assertEqual(
+            list(first) + list(second) + list(third), self.expected
+        )
+
+        back = paginator.get_page(third.previous_cursor)
+        self.assertEqual(list(back), list(second))
+        self.assertEqual(
+            list(paginator.get_page(back.previous_cursor)), list(first)
+        )
+
+    def test_page_cost_does_not_depend_on_position(self):
+        """Любая страница — ровно один запрос."""
+        paginator = KeysetPaginator(Post.objects.all(), 5)
+        cursor = paginator.get_page().next_cursor
+
+        with self.assertNumQueries(1):
+            list(paginator.get_page(cursor))
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        """Битый курсор отдает первую страницу."""
+        paginator = KeysetPaginator(Post.objects.all(), 5)
+
+        page = paginator.get_page('not-a-cursor')
+
+        self.assertEqual(list(page), self.expected[:5])
+
+    def test_approximate_count(self):
+        """Подсчет останавливается на count_limit."""
+        paginator = KeysetPaginator(Post.objects.all(), 5, count_limit=10)
+
+        self.assertEqual(paginator.count, 10)
+        self.assertTrue(paginator.count_is_approximate)
+
+    def test_paginator_template_renders_cursors(self):
+        """Шаблон паджинатора выводит ссылки на курсоры."""
+        paginator = KeysetPaginator(Post.objects.all(), 5)
+        page = paginator.get_page(paginator.get_page().next_cursor)
+
+        html = render_to_string(
+            'posts/includes/paginator.html', {'page_obj': page}
+        )
+
+        self.assertIn(f'?cursor={page.next_cursor}', html)
+        self.assertIn(f'?cursor={page.previous_cursor}', html)
@@ -0,0 +1,101 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Group, Post
+from ..pagination import KeysetPage
+from yatube.settings import PAGE_ITEMS_NUM
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(
+            title='Путешествия',
+            slug='travel',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Поездка на Байкал зимой',
+            group=cls.group,
+        )
+        Post.objects.create(author=cls.author, text='Байкал Байкал Байкал')
+        Post.objects.create(author=cls.author, text='Заметки о городе')
+
+    def found(self, query):
+        response = self.client.get(
+            reverse('posts:post_search'), {'q': query}
+        )
+        return [post.text for post in response.context['page_obj']]
+
+    def test_ranked_prefix_search(self):
+        """Поиск по префиксу, релевантные посты выше."""
+        self.assertEqual(
+            self.found('байк'),
+            ['Байкал Байкал Байкал', 'Поездка на Байкал зимой'],
+        )
+        self.assertEqual(self.found('байкал зим'), ['Поездка на Байкал зимой'])
+
+    def test_group_and_author_searchable(self):
+        """Находятся посты по названию группы и имени автора."""
+        self.assertEqual(self.found('путешеств'), ['Поездка на Байкал зимой'])
+        self.assertEqual(len(self.found('writer')), 3)
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при правке поста и переименовании группы."""
+        post = SearchTests.post
+        post.text = 'Поездка на Алтай'
+        post.save()
+        group = SearchTests.group
+        group.title = 'Походы'
+        group.save()
+
+        self.assertEqual(self.found('алтай'), ['Поездка на Алтай'])
+        self.assertEqual(self.found('поход'), ['Поездка на Алтай'])
+        self.assertEqual(self.found('путешеств'), [])
+
+        post.delete()
+        self.assertEqual(self.found('алтай'), [])
+
+    def test_query_syntax_is_escaped(self):
+        """Операторы FTS5 в запросе не ломают поиск."""
+        self.assertEqual(self.found('"байкал" OR NOT ('), [])
+        self.assertIsNone(
+            self.client.get(reverse('posts:post_search')).context['page_obj']
+        )
+
+    def test_keyset_pages(self):
+        """Результаты листаются курсорами без повторов и пропусков."""
+        for number in range(PAGE_ITEMS_NUM + 2):
+            Post.objects.create(
+                author=SearchTests.author, text=f'Байкал, день {number}'
+            )
+        paginator = search.paginator('байкал', PAGE_ITEMS_NUM)
+
+        first = paginator.get_page()
+        second = paginator.get_page(first.next_cursor)
+        back = paginator.get_page(second.previous_cursor)
+
+        self.assertIsInstance(first, KeysetPage)
+        texts = [post.text for post in list(first) + list(second)]
+        self.assertEqual(len(texts), PAGE_ITEMS_NUM + 4)
+        self.assertEqual(len(set(texts)), len(texts))
+        self.assertFalse(second.has_next())
+        self.assertEqual(list(back), list(first))
+
+    def test_rebuild_command(self):
+        """Команда заново строит индекс."""
+        out = StringIO()
+        call_command('rebuild_search_index', batch_size=2, stdout=out)
+
+        self.assertIn('Проиндексировано постов: 3', out.getvalue())
+        self.assertEqual(len(self.found('байкал')), 2)
@@ -0,0 +1,137 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from .. import thumbnails
+from ..models import MediaFile, Post
+from ..storage import content_storage
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def image_upload(color='red', name='photo.png'):
+    content = BytesIO()
+    Image.new('RGB', (20, 20), color).save(content, 'PNG')
+    return SimpleUploadedFile(name, content.getvalue(), 'image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+
+    def create(self, upload):
+        return Post.objects.create(text='Пост', author=self.user, image=upload)
+
+    def gc(self, *args):
+        call_command('gc_media', *args, min_age=0, stdout=StringIO())
+
+    def test_same_content_stored_once(self):
+        """Одинаковые картинки лежат в одном файле с именем по хешу."""
+        first = self.create(image_upload(name='one.png'))
+        second = self.create(image_upload(name='two.png'))
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(
+            first.image.name, r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.png$'
+        )
+        directory = os.path.dirname(content_storage.path(first.image.name))
+        self.assertEqual(len(os.listdir(directory)), 1)
+        self.assertEqual(
+            MediaFile.objects.get(pk=first.image.name).references, 2
+        )
+
+    def test_references_follow_edits(self):
+        post = self.create(image_upload())
+        old_name = post.image.name
+        post.image = image_upload('blue')
+        post.save()
+
+        self.assertEqual(MediaFile.objects.get(pk=old_name).references, 0)
+        self.assertEqual(
+            MediaFile.objects.get(pk=post.image.name).references, 1
+        )
+        post.delete()
+        self.assertEqual(
+            MediaFile.objects.get(pk=post.image.name).references, 0
+        )
+
+    def test_thumbnails_reused(self):
+        """Миниатюры одинаковой картинки генерируются один раз."""
+        first = self.create(image_upload())
+        thumbnails.generate(first.image)
+        second = self.create(image_upload(name='copy.png'))
+
+        self.assertIsNotNone(thumbnails.ready_thumbnail(second.image, 'card'))
+
+    def test_gc_removes_orphans(self):
+        kept = self.create(image_upload())
+        removed = self.create(image_upload('blue'))
+        name = removed.image.name
+        removed.delete()
+
+        self.gc('--dry-run')
+        self.assertTrue(content_storage.exists(name))
+
+        self.gc()
+        self.assertFalse(content_storage.exists(name))
+        self.assertTrue(content_storage.exists(kept.image.name))
+        self.assertFalse(MediaFile.objects.filter(pk=name).exists())
+
+    def test_gc_scan(self):
+        """--scan находит файлы без счетчика; файлы постов не удаляются."""
+        stray = content_storage.save('posts/stray.png', image_upload())
+        name = content_storage.save('posts/bulk.png', image_upload('blue'))
+        Post.objects.bulk_create([
+            Post(text='Импорт', author=self.user, image=name)
+        ])
+
+        self.gc()
+        self.assertTrue(content_storage.exists(stray))
+
+        self.gc('--scan')
+        self.assertFalse(content_storage.exists(stray))
+        self.assertTrue(content_storage.exists(name))
+        self.assertEqual(MediaFile.objects.get(pk=name).references, 1)
+
+    def test_adopt_images(self):
+        """Картинки до хранения по хешу получают счетчик и новые миниатюры."""
+        name = default_storage.save('posts/legacy.png', image_upload())
+        Post.objects.bulk_create([
+            Post(text='Старый пост', author=self.user, image=name)
+        ])
+        geometry_string, options = thumbnails.geometry('card')
+        legacy = default.backend.get_thumbnail(
+            ImageFile(name, default_storage), geometry_string, **options
+        )
+        self.assertTrue(default_storage.exists(legacy.name))
+        post = Post.objects.get(image=name)
+        self.assertIsNone(thumbnails.ready_thumbnail(post.image, 'card'))
+
+        call_command('adopt_images', workers=1, stdout=StringIO())
+
+        caches['thumbnails'].clear()
+        self.assertEqual(MediaFile.objects.get(pk=name).references, 1)
+        self.assertIsNotNone(thumbnails.ready_thumbnail(post.image, 'card'))
+        self.assertFalse(default_storage.exists(legacy.name))
+        self.assertIsNone(default.kvstore.get(legacy))
+        self.assertTrue(content_storage.exists(name))
@@ -0,0 +1,111 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile, serialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+
+from .. import thumbnail_store, thumbnails
+from ..models import Post, ThumbnailRecord
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def image_upload(color):
+    content = BytesIO()
+    Image.new('RGB', (40, 20), color).save(content, 'PNG')
+    return SimpleUploadedFile('photo.png', content.getvalue(), 'image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailStoreTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+
+    def setUp(self):
+        caches['default'].clear()
+        caches['thumbnails'].clear()
+        thumbnail_store.clear_stats()
+
+    def test_records(self):
+        """Записи лежат в своей таблице, get_many читает их пакетом."""
+        stored = ImageFile('cache/stored.jpg')
+        stored.set_size((10, 20))
+        default.kvstore._set(stored.key, stored)
+        missing = ImageFile('cache/missing.jpg')
+
+        self.assertTrue(
+            ThumbnailRecord.objects.filter(key=f'image||{stored.key}').exists()
+        )
+        caches['thumbnails'].clear()
+        with self.assertNumQueries(1):
+            found = default.kvstore.get_many([stored, missing])
+        self.assertEqual(list(found[stored.key].size), [10, 20])
+        self.assertIsNone(found[missing.key])
+
+        default.kvstore.delete(stored)
+        self.assertIsNone(default.kvstore.get(stored))
+
+    def test_miss_keeps_concurrent_record(self):
+        """Промах не затирает запись, положенную в кеш после запроса."""
+        stored = ImageFile('cache/concurrent.jpg')
+        stored.set_size((10, 20))
+
+        def records():
+            # Фоновый пул записывает миниатюру, пока читатель ждет ответа
+            # таблицы.
+            caches['thumbnails'].set(
+                add_prefix(stored.key), serialize_image_file(stored)
+            )
+            return ThumbnailRecord.objects.none()
+
+        with mock.patch.object(default.kvstore, 'records', records):
+            self.assertIsNone(default.kvstore.get(stored))
+        self.assertIsNotNone(default.kvstore.get(stored))
+
+    def create_posts(self):
+        for color in ('red', 'green', 'blue'):
+            post = Post.objects.create(
+                text='Пост', author=self.user, image=image_upload(color)
+            )
+            thumbnails.generate(post.image)
+        caches['thumbnails'].clear()
+        thumbnail_store.clear_stats()
+
+    def assert_one_batch(self, response):
+        counters = thumbnail_store.stats()
+        self.assertEqual(counters['batches'], 1)
+        self.assertEqual(counters['lookups'], 0)
+        self.assertGreater(counters['prefetched'], 0)
+        self.assertEqual(counters['misses'], 0)
+        post = Post.objects.first()
+        self.assertContains(
+            response, thumbnails.ready_thumbnail(post.image, 'card').url
+        )
+
+    def test_feed_reads_thumbnails_in_one_batch(self):
+        """Лента читает записи миниатюр всех постов страницы одним пакетом."""
+        self.create_posts()
+        self.assert_one_batch(Client().get(reverse('posts:index')))
+
+    def test_search_reads_thumbnails_in_one_batch(self):
+        self.create_posts()
+        self.assert_one_batch(
+            Client().get(reverse('posts:post_search'), {'q': 'Пост'})
+        )
@@ -0,0 +1,92 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+from sorl.thumbnail import default
+
+from .. import thumbnails
+from ..models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def image_upload(color, name='photo.png'):
+    content = BytesIO()
+    Image.new('RGB', (40, 20), color).save(content, 'PNG')
+    return SimpleUploadedFile(name, content.getvalue(), 'image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+
+    def setUp(self):
+        caches['thumbnails'].clear()
+
+    def create(self, color):
+        return Post.objects.create(
+            text='Пост', author=self.user, image=image_upload(color)
+        )
+
+    def test_thumbnail_file_matches_sorl(self):
+        """Имя и ключ миниатюры те же, что у созданной sorl."""
+        post = self.create('red')
+        for alias in settings.THUMBNAIL_GEOMETRIES:
+            for geometry_string, options in thumbnails._geometries(alias):
+                with self.subTest(alias=alias, geometry=geometry_string):
+                    expected = default.backend.get_thumbnail(
+                        post.image, geometry_string, **options
+                    )
+                    thumbnail = thumbnails.backend.thumbnail_file(
+                        post.image, geometry_string, **options
+                    )
+                    self.assertEqual(thumbnail.name, expected.name)
+                    self.assertEqual(thumbnail.key, expected.key)
+
+    def test_full_width_variant_reuses_thumbnail(self):
+        """Вариант во всю ширину размера — та же миниатюра, не копия."""
+        post = self.create('red')
+        thumbnails.generate(post.image)
+
+        thumbnail = thumbnails.ready_thumbnail(post.image, 'card')
+        widest = dict(thumbnails.ready_variants(post.image, 'card')['JPEG'])
+        self.assertEqual(widest[thumbnail.width].name, thumbnail.name)
+        keys = [
+            thumbnails.backend.thumbnail_file(
+                post.image, geometry_string, **options
+            ).key
+            for geometry_string, options in thumbnails._geometries('card')
+        ]
+        self.assertEqual(len(keys), len(set(keys)))
+
+    def test_generate_thumbnails_command(self):
+        """Команда создает миниатюры постов, сохраненных в обход формы."""
+        posts = [self.create('red'), self.create('blue')]
+        self.assertIsNone(thumbnails.ready_thumbnail(posts[0].image, 'card'))
+
+        out = StringIO()
+        call_command('generate_thumbnails', workers=1, stdout=out)
+
+        self.assertIn('созданы миниатюры: 2', out.getvalue())
+        for post in posts:
+            self.assertIsNotNone(
+                thumbnails.ready_thumbnail(post.image, 'card')
+            )
+        out = StringIO()
+        call_command('generate_thumbnails', workers=1, stdout=out)
+        self.assertIn('созданы миниатюры: 0', out.getvalue())
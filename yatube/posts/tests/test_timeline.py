@@ -0,0 +1,97 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from .. import timeline
+from ..models import FeedEntry, Follow, Post
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.old_post = Post.objects.create(
+            author=cls.author, text='Старый пост'
+        )
+        Post.objects.create(author=cls.other, text='Чужой пост')
+
+    def feed(self):
+        return list(timeline.follow_feed(TimelineTests.reader))
+
+    def test_follow_backfills_and_unfollow_trims(self):
+        """Подписка дополняет ленту постами автора, отписка убирает их."""
+        reader = TimelineTests.reader
+        author = TimelineTests.author
+
+        follow = Follow.objects.create(user=reader, author=author)
+        self.assertEqual(self.feed(), [TimelineTests.old_post])
+
+        follow.delete()
+        self.assertEqual(self.feed(), [])
+        self.assertFalse(FeedEntry.objects.filter(user=reader).exists())
+
+    def test_new_post_fans_out(self):
+        """Новый пост попадает в ленты подписчиков первым."""
+        Follow.objects.create(
+            user=TimelineTests.reader, author=TimelineTests.author
+        )
+
+        post = Post.objects.create(
+            author=TimelineTests.author, text='Новый пост'
+        )
+
+        self.assertEqual(self.feed(), [post, TimelineTests.old_post])
+
+    @override_settings(FOLLOW_FEED_FANOUT_LIMIT=0)
+    def test_celebrity_posts_read_directly(self):
+        """Посты популярных авторов не раскладываются, но видны в ленте."""
+        Follow.objects.create(
+            user=TimelineTests.reader, author=TimelineTests.author
+        )
+
+        post = Post.objects.create(
+            author=TimelineTests.author, text='Новый пост'
+        )
+
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        self.assertEqual(self.feed(), [post, TimelineTests.old_post])
+
+    @override_settings(FOLLOW_FEED_FANOUT_LIMIT=1)
+    def test_author_drops_below_limit(self):
+        """Автор опустился до порога: пропущенные посты раскладываются."""
+        author = TimelineTests.author
+        Follow.objects.create(user=TimelineTests.reader, author=author)
+        follow = Follow.objects.create(user=TimelineTests.other, author=author)
+        post = Post.objects.create(author=author, text='Новый пост')
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+
+        follow.delete()
+
+        self.assertEqual(self.feed(), [post, TimelineTests.old_post])
+        self.assertTrue(FeedEntry.objects.filter(post=post).exists())
+
+    def test_same_date_ordered_by_pk(self):
+        """Посты с одной датой идут по убыванию pk, как в курсоре."""
+        author = TimelineTests.author
+        Follow.objects.create(user=TimelineTests.reader, author=author)
+        posts = [
+            Post.objects.create(author=author, text=f'Пост {number}')
+            for number in range(3)
+        ]
+        pub_date = TimelineTests.old_post.pub_date
+        Post.objects.filter(author=author).update(pub_date=pub_date)
+        FeedEntry.objects.update(pub_date=pub_date)
+        expected = sorted(
+            posts + [TimelineTests.old_post],
+            key=lambda post: post.pk, reverse=True,
+        )
+
+        self.assertEqual(self.feed(), expected)
+        with override_settings(FOLLOW_FEED_FANOUT_LIMIT=0):
+            self.assertEqual(self.feed(), expected)
+        with override_settings(FOLLOW_FEED_MATERIALIZED=False):
+            self.assertEqual(self.feed(), expected)
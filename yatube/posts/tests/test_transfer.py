@@ -0,0 +1,215 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from .. import search, thumbnails, transfer
+from ..models import FeedEntry, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+# Миниатюры импортированных картинок создаются в том же потоке: другие
+# потоки не видят данных незавершенной транзакции теста.
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, TRANSFER_WORKERS=1)
+class TransferTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for number in range(5):
+            Post.objects.create(
+                author=cls.author,
+                text=f'Тестовый пост {number}',
+                group=cls.group if number % 2 else None,
+            )
+        Post.objects.create(
+            author=cls.author,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF, content_type='image/gif'
+            ),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def run_command(self, name, *args, **options):
+        call_command(name, *args, stdout=StringIO(), **options)
+
+    def export_and_clear(self, filename, **options):
+        """Выгружает посты и удаляет их вместе с автором и группой."""
+        path = os.path.join(self.directory, filename)
+        expected = list(Post.objects.order_by('pk').values_list(
+            'pk', 'pub_date', 'author__username', 'group__slug', 'text',
+            'image',
+        ))
+        self.run_command('export_posts', path, batch_size=2, **options)
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        return path, expected
+
+    def imported(self):
+        return list(Post.objects.order_by('pk').values_list(
+            'pk', 'pub_date', 'author__username', 'group__slug', 'text',
+            'image',
+        ))
+
+    def test_round_trip(self):
+        """Выгруженные посты загружаются обратно без потерь."""
+        for filename in ('posts.ndjson', 'posts.csv'):
+            with self.subTest(filename=filename):
+                path, expected = self.export_and_clear(filename)
+
+                self.run_command('import_posts', path, batch_size=2)
+
+                self.assertEqual(self.imported(), expected)
+                author = User.objects.get(username='writer')
+                self.assertFalse(author.has_usable_password())
+                self.assertEqual(author.stats.posts_count, len(expected))
+                self.assertEqual(
+                    Group.objects.get(slug='test-slug').title,
+                    'Тестовая группа',
+                )
+                self.assertEqual(
+                    len(search.paginator('пост', 10).get_page(None)),
+                    len(expected),
+                )
+                self.assertFalse(
+                    os.path.exists(transfer.Checkpoint(path).path)
+                )
+
+    def test_images_are_copied(self):
+        """Картинки копируются в каталог выгрузки и обратно."""
+        media_dir = os.path.join(self.directory, 'media')
+        name = Post.objects.exclude(image='').get().image.name
+        path, expected = self.export_and_clear(
+            'posts.ndjson', media_dir=media_dir
+        )
+        self.assertTrue(os.path.exists(os.path.join(media_dir, name)))
+        os.remove(os.path.join(TEMP_MEDIA_ROOT, name))
+
+        self.run_command('import_posts', path, media_dir=media_dir)
+
+        self.assertTrue(os.path.exists(os.path.join(TEMP_MEDIA_ROOT, name)))
+        post = Post.objects.exclude(image='').get()
+        self.assertIsNotNone(thumbnails.ready_thumbnail(post.image, 'card'))
+
+    def test_import_updates_only_imported_rows(self):
+        """Ленты и индекс дополняются импортом, остальное не пересоздается."""
+        reader = User.objects.create_user(username='reader')
+        other = User.objects.create_user(username='other')
+        Post.objects.create(author=other, text='Чужая запись')
+        Follow.objects.create(user=reader, author=other)
+        Follow.objects.create(user=reader, author=self.author)
+        kept = set(FeedEntry.objects.values_list('pk', flat=True))
+        path = os.path.join(self.directory, 'posts.ndjson')
+        with open(path, 'w', encoding='utf-8') as file:
+            write = transfer.writer(file, 'ndjson')
+            for number in range(3):
+                write({
+                    'pub_date': '2021-10-18T12:00:00+00:00',
+                    'author': 'writer',
+                    'text': f'Загруженная запись {number}',
+                })
+
+        self.run_command('import_posts', path, batch_size=2)
+
+        imported = set(
+            Post.objects.filter(text__startswith='Загруженная')
+            .values_list('pk', flat=True)
+        )
+        self.assertEqual(len(imported), 3)
+        self.assertTrue(
+            kept <= set(FeedEntry.objects.values_list('pk', flat=True))
+        )
+        self.assertEqual(
+            set(
+                FeedEntry.objects.filter(user=reader, post__in=imported)
+                .values_list('post_id', flat=True)
+            ),
+            imported,
+        )
+        self.assertEqual(
+            len(search.paginator('загруженная', 10).get_page(None)), 3
+        )
+
+    def test_import_resumes_from_checkpoint(self):
+        """Повторный запуск продолжает с сохраненной позиции."""
+        path, expected = self.export_and_clear('posts.ndjson')
+        with open(path, encoding='utf-8') as file:
+            lines = file.readlines()
+        # Первая попытка оборвалась на испорченной строке.
+        lines.insert(3, '{"text": "нет автора"}\n')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.writelines(lines)
+
+        with self.assertRaisesMessage(CommandError, 'Строка 4'):
+            self.run_command('import_posts', path, batch_size=3)
+        self.assertEqual(Post.objects.count(), 3)
+        self.assertEqual(
+            transfer.Checkpoint(path).load()['rows'], 3
+        )
+
+        del lines[3]
+        with open(path, 'w', encoding='utf-8') as file:
+            file.writelines(lines)
+        self.run_command('import_posts', path, batch_size=3)
+
+        self.assertEqual(self.imported(), expected)
+        self.assertEqual(
+            UserStats.objects.get(user__username='writer').posts_count,
+            len(expected),
+        )
+
+    def test_export_resumes_from_checkpoint(self):
+        """Выгрузка дописывает файл после последнего сохраненного поста."""
+        path = os.path.join(self.directory, 'posts.ndjson')
+        first = Post.objects.order_by('pk').first()
+        with open(path, 'w', encoding='utf-8') as file:
+            transfer.writer(file, 'ndjson')(
+                next(transfer.dump_rows())
+            )
+            offset = file.tell()
+            # Строка, записанная после сохранения позиции.
+            file.write('{"id": 0}\n')
+        transfer.Checkpoint(path).save(
+            last_id=first.pk, rows=1, offset=offset
+        )
+
+        self.run_command('export_posts', path)
+
+        with open(path, encoding='utf-8') as file:
+            ids = [json.loads(line)['id'] for line in file]
+        self.assertEqual(
+            ids, list(Post.objects.order_by('pk').values_list('pk', flat=True))
+        )
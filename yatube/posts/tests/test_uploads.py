@@ -0,0 +1,96 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import uploads
+from ..models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+ORIENTATION = 0x0112
+DESCRIPTION = 0x010e
+
+
+def image_upload(size=(300, 100), mode='RGB', fmt='JPEG', name='photo.jpg',
+                 orientation=None):
+    content = BytesIO()
+    image = Image.new(mode, size, 'red')
+    exif = Image.Exif()
+    exif[DESCRIPTION] = 'Дом, улица Ленина'
+    if orientation:
+        exif[ORIENTATION] = orientation
+    options = {'exif': exif.tobytes()} if fmt == 'JPEG' else {}
+    image.save(content, fmt, **options)
+    return SimpleUploadedFile(name, content.getvalue(), f'image/{fmt}')
+
+
+@override_settings(UPLOAD_IMAGE_MAX_SIDE=200)
+class NormalizeTests(SimpleTestCase):
+    def open(self, result):
+        self.addCleanup(result.close)
+        return Image.open(result)
+
+    def test_resized_without_metadata(self):
+        """Картинка уменьшается, EXIF удаляется, поворот применяется."""
+        result = uploads.normalize(image_upload(orientation=6))
+        self.assertEqual(result.size, len(result.read()))
+        result.seek(0)
+        image = self.open(result)
+
+        self.assertEqual(image.format, 'JPEG')
+        self.assertEqual(image.size, (67, 200))
+        self.assertEqual(dict(image.getexif()), {})
+        self.assertEqual(result.name, 'photo.jpg')
+
+    def test_transparency_kept(self):
+        """Картинка с прозрачностью остается PNG."""
+        result = uploads.normalize(image_upload(
+            mode='RGBA', fmt='PNG', name='logo.png'
+        ))
+        image = self.open(result)
+
+        self.assertEqual((image.format, image.mode), ('PNG', 'RGBA'))
+        self.assertEqual(image.size, (200, 67))
+
+    @override_settings(UPLOAD_IMAGE_MAX_PIXELS=1000)
+    def test_too_many_pixels(self):
+        """Картинка с огромным числом пикселей отклоняется."""
+        with self.assertRaises(ValidationError) as raised:
+            uploads.normalize(image_upload())
+        self.assertEqual(raised.exception.code, 'too_many_pixels')
+
+    @override_settings(UPLOAD_IMAGE_MAX_BYTES=100)
+    def test_too_large_file(self):
+        with self.assertRaises(ValidationError) as raised:
+            uploads.normalize(image_upload())
+        self.assertEqual(raised.exception.code, 'file_too_large')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, UPLOAD_IMAGE_MAX_SIDE=200)
+class PostFormUploadTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_stored_image_normalized(self):
+        """В MEDIA_ROOT попадает уже обработанная картинка."""
+        client = Client()
+        client.force_login(User.objects.create_user(username='auth'))
+
+        client.post(reverse('posts:post_create'), data={
+            'text': 'Пост с фото',
+            'image': image_upload((1000, 500), fmt='PNG', name='big.png'),
+        })
+
+        post = Post.objects.get(text='Пост с фото')
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        self.assertEqual((post.image.width, post.image.height), (200, 100))
@@ -1,14 +1,19 @@
 import shutil
 import tempfile
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from ..models import Follow, Group, Post
+from .. import feed_cache
+from ..models import Comment, Follow, Group, Post
+from yatube.settings import COMMENTS_PAGE_SIZE
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -65,6 +70,7 @@ class TaskPagesTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        cache.clear()
         self.user = TaskPagesTests.user
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -321,6 +327,7 @@ class PaginatorViewsTest(TestCase):
             )
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
 
     def test_index_paginator(self):
@@ -349,3 +356,367 @@ class PaginatorViewsTest(TestCase):
 
         response = self.client.get(reverse('posts:index') + '?page=2')
         self.assertEqual(len(response.context['page_obj']), 3)
+
+
+class FeedQueryBudgetTests(TestCase):
+    """Число запросов ленты не зависит от числа постов на странице."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+
+        for number in range(12):
+            author = User.objects.create_user(username=f'author_{number}')
+            group = Group.objects.create(
+                title=f'Тестовая группа {number}',
+                slug=f'test-slug-{number}',
+                description='Тестовое описание',
+            )
+            Post.objects.create(
+                author=author,
+                text=f'Тестовый пост {number}',
+                group=group,
+            )
+            Post.objects.create(
+                author=cls.user,
+                text=f'Тестовый пост {number}',
+                group=group,
+            )
+            Follow.objects.create(user=cls.user, author=author)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(FeedQueryBudgetTests.user)
+
+    def test_feed_query_budget(self):
+        """Ленты укладываются в фиксированный бюджет запросов."""
+        # Бюджет считается для холодного кеша главной страницы.
+        # (гость, авторизованный): авторизованному клиенту нужны еще
+        # сессия и пользователь, а в профиле — проверка подписки.
+        # Группа и профиль сначала считают валидатор для ETag.
+        budgets = {
+            reverse('posts:index'): (2, 4),
+            reverse(
+                'posts:group_list', kwargs={'group_name': 'test-slug-0'}
+            ): (4, 6),
+            reverse('posts:profile', kwargs={'username': 'test_user'}): (
+                3, 6
+            ),
+        }
+
+        for url, (guest_budget, user_budget) in budgets.items():
+            with self.subTest(url=url):
+                cache.clear()
+                with self.assertNumQueries(guest_budget):
+                    self.client.get(url)
+                cache.clear()
+                with self.assertNumQueries(user_budget):
+                    self.authorized_client.get(url)
+
+        # Лента подписок еще проверяет, нет ли среди авторов тех, чьи
+        # посты не раскладываются по лентам.
+        with self.assertNumQueries(5):
+            self.authorized_client.get(reverse('posts:follow_index'))
+
+
+class CommentsPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        # Две полные страницы и одна неполная.
+        for number in range(2 * COMMENTS_PAGE_SIZE + 1):
+            Comment.objects.create(
+                author=cls.user, post=cls.post, text=f'Комментарий {number}'
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_newest_comments_inline(self):
+        """На странице поста только последние комментарии, по порядку."""
+        post = CommentsPaginationTests.post
+        response = self.client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': post.pk}
+        ))
+
+        texts = [comment.text for comment in response.context['comments']]
+        newest = range(COMMENTS_PAGE_SIZE + 1, 2 * COMMENTS_PAGE_SIZE + 1)
+        self.assertEqual(
+            texts, [f'Комментарий {number}' for number in newest]
+        )
+        self.assertIsNotNone(response.context['older_cursor'])
+
+    def test_older_comments_by_cursor(self):
+        """Более ранние комментарии подгружаются по курсору до конца."""
+        post = CommentsPaginationTests.post
+        cursor = self.client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': post.pk}
+        )).context['older_cursor']
+        url = reverse('posts:post_comments', kwargs={'post_id': post.pk})
+
+        response = self.client.get(url, {'cursor': cursor})
+        texts = [comment.text for comment in response.context['comments']]
+        self.assertEqual(texts, [
+            f'Комментарий {number}'
+            for number in range(1, COMMENTS_PAGE_SIZE + 1)
+        ])
+        self.assertContains(response, 'Комментарий 1')
+
+        data = self.client.get(
+            url, {'cursor': response.context['older_cursor'], 'format': 'json'}
+        ).json()
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']],
+            ['Комментарий 0'],
+        )
+        self.assertIsNone(data['older_cursor'])
+
+    def test_comments_query_budget(self):
+        """Число запросов страницы поста не зависит от числа комментариев."""
+        url = reverse(
+            'posts:post_detail',
+            kwargs={'post_id': CommentsPaginationTests.post.pk},
+        )
+        # Валидатор ETag, пост и страница комментариев.
+        with self.assertNumQueries(3):
+            self.client.get(url)
+
+
+@mock.patch('posts.feed_cache.transaction.on_commit', lambda func: func())
+class IndexCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+
+        for post_number in range(13):
+            Post.objects.create(
+                author=cls.user,
+                text=f'Тестовый пост {post_number}',
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_cached_separately(self):
+        """Каждая страница главной кешируется под своим ключом."""
+        first = self.client.get(reverse('posts:index'))
+        second = self.client.get(reverse('posts:index') + '?page=2')
+
+        self.assertEqual(len(first.context['page_obj']), 10)
+        self.assertEqual(len(second.context['page_obj']), 3)
+        self.assertNotEqual(first.content, second.content)
+
+    def test_cache_hit_skips_database(self):
+        """Повторный запрос гостя не обращается к базе."""
+        self.client.get(reverse('posts:index') + '?page=2')
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('posts:index') + '?page=2')
+
+        self.assertEqual(len(response.context['page_obj']), 3)
+        self.assertEqual(response.context['page_obj'].paginator.num_pages, 2)
+
+    def test_invalidated_on_delete(self):
+        """Удаленный пост сразу пропадает из закешированной ленты."""
+        post = Post.objects.first()
+        self.client.get(reverse('posts:index'))
+        post.delete()
+
+        self.assertNotContains(
+            self.client.get(reverse('posts:index')), f'{post.text}<'
+        )
+
+
+class InvalidationOnCommitTests(TestCase):
+    def test_waits_for_commit(self):
+        """Внутри транзакции поколение сдвигается только после коммита."""
+        scope = feed_cache.index_scope()
+        before = feed_cache.generations(scope)
+        with transaction.atomic():
+            feed_cache.invalidate(scope)
+            self.assertEqual(feed_cache.generations(scope), before)
+
+
+@mock.patch('posts.feed_cache.transaction.on_commit', lambda func: func())
+class CacheInvalidationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.author = User.objects.create_user(username='test_author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(CacheInvalidationTests.user)
+        self.author_client = Client()
+        self.author_client.force_login(CacheInvalidationTests.author)
+
+    def test_post_edit_resets_feeds(self):
+        """Правка поста видна во всех лентах сразу."""
+        post = CacheInvalidationTests.post
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'group_name': 'test-slug'}),
+            reverse('posts:profile', kwargs={'username': 'test_author'}),
+        )
+        for url in urls:
+            self.client.get(url)
+
+        self.author_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={'text': 'Исправленный пост', 'group': post.group.pk},
+        )
+
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(
+                    response.context['page_obj'][0].text, 'Исправленный пост'
+                )
+
+    def test_post_moved_out_of_group(self):
+        """Пост, убранный из группы, пропадает из ее ленты."""
+        post = CacheInvalidationTests.post
+        url = reverse('posts:group_list', kwargs={'group_name': 'test-slug'})
+        self.client.get(url)
+
+        post.group = None
+        post.save()
+
+        self.assertEqual(len(self.client.get(url).context['page_obj']), 0)
+
+    def test_follow_resets_follow_feed(self):
+        """Подписка и отписка сразу меняют ленту подписок."""
+        url = reverse('posts:follow_index')
+        follow_url = reverse(
+            'posts:profile_follow', kwargs={'username': 'test_author'}
+        )
+        unfollow_url = reverse(
+            'posts:profile_unfollow', kwargs={'username': 'test_author'}
+        )
+
+        self.assertEqual(
+            len(self.authorized_client.get(url).context['page_obj']), 0
+        )
+        self.authorized_client.get(follow_url)
+        self.assertEqual(
+            len(self.authorized_client.get(url).context['page_obj']), 1
+        )
+        self.authorized_client.get(unfollow_url)
+        self.assertEqual(
+            len(self.authorized_client.get(url).context['page_obj']), 0
+        )
+
+    def test_comment_resets_post_detail(self):
+        """Новый комментарий сразу виден на странице поста."""
+        post = CacheInvalidationTests.post
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        self.client.get(url)
+
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            data={'text': 'Тестовый комментарий'},
+        )
+
+        self.assertContains(self.client.get(url), 'Тестовый комментарий')
+
+
+@mock.patch('posts.feed_cache.transaction.on_commit', lambda func: func())
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_not_modified(self):
+        """Повторный запрос с тем же ETag получает пустой 304."""
+        urls = (
+            reverse(
+                'posts:post_detail',
+                kwargs={'post_id': ConditionalGetTests.post.pk},
+            ),
+            reverse('posts:profile', kwargs={'username': 'test_user'}),
+            reverse('posts:group_list', kwargs={'group_name': 'test-slug'}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response.has_header('Last-Modified'))
+
+                # Страница не строится: только запрос валидатора.
+                with self.assertNumQueries(1):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+
+    def test_changes_update_etag(self):
+        """Новый комментарий или пост меняют ETag страниц."""
+        post = ConditionalGetTests.post
+        detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': post.pk}
+        )
+        group_url = reverse(
+            'posts:group_list', kwargs={'group_name': 'test-slug'}
+        )
+        detail_etag = self.client.get(detail_url)['ETag']
+        group_etag = self.client.get(group_url)['ETag']
+
+        Comment.objects.create(
+            author=ConditionalGetTests.user, post=post, text='Комментарий'
+        )
+        response = self.client.get(detail_url, HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Комментарий')
+
+        Post.objects.create(
+            author=ConditionalGetTests.user, text='Новый пост',
+            group=ConditionalGetTests.group,
+        )
+        response = self.client.get(group_url, HTTP_IF_NONE_MATCH=group_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новый пост')
+
+    def test_ready_thumbnails_update_etag(self):
+        """Готовые миниатюры меняют ETag, хотя updated_at не меняется."""
+        post = ConditionalGetTests.post
+        urls = (
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+            reverse('posts:profile', kwargs={'username': 'test_user'}),
+            reverse('posts:group_list', kwargs={'group_name': 'test-slug'}),
+        )
+        etags = [self.client.get(url)['ETag'] for url in urls]
+
+        # Так ленты сбрасывает posts.thumbnails после генерации.
+        feed_cache.invalidate(*feed_cache.post_scopes(post))
+
+        for url, etag in zip(urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
@@ -0,0 +1,134 @@
+"""KV-хранилище sorl с пакетным чтением (THUMBNAIL_KVSTORE).
+
+Записи о миниатюрах лежат в отдельной таблице ThumbnailRecord в базе
+THUMBNAIL_KVSTORE_DATABASE, а перед ней — в своем кеше THUMBNAIL_CACHE.
+Стандартное хранилище sorl читает каждую миниатюру отдельным запросом к
+кешу (а при промахе — к базе); get_many() читает записи всех миниатюр
+страницы одним get_many() кеша и одним запросом к таблице.
+
+Отсутствие записи тоже кешируется, но ненадолго (THUMBNAIL_MISS_TIMEOUT)
+и через add(): запись, которую фоновый пул успел положить в кеш между
+запросом к таблице и записью в кеш, не затирается. Новая миниатюра в
+других процессах становится видна, когда истечет копия в памяти процесса
+(LOCAL_TIMEOUT кеша). Счетчики обращений — stats().
+"""
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import deserialize_image_file
+from sorl.thumbnail.kvstores.base import KVStoreBase, add_prefix
+
+from .models import ThumbnailRecord
+
+# Так в кеше помечается ключ, которого нет в таблице.
+EMPTY = ''
+COUNTERS = ('batches', 'prefetched', 'lookups', 'hits', 'misses')
+
+_stats = Counter()
+_lock = threading.Lock()
+
+
+def count(**deltas):
+    with _lock:
+        _stats.update(deltas)
+
+
+def stats():
+    """Счетчики: пакетов get_many, найденных в них и отдельных чтений.
+
+    hits и misses — найденные и ненайденные миниатюры по всем чтениям,
+    prefetched — сколько из них шаблоны взяли из прочитанного пакетом.
+    """
+    with _lock:
+        result = {name: _stats[name] for name in COUNTERS}
+    looked_up = result['hits'] + result['misses']
+    result['hit_rate'] = result['hits'] / looked_up if looked_up else None
+    return result
+
+
+def clear_stats():
+    with _lock:
+        _stats.clear()
+
+
+def _short(key):
+    return key[len(sorl_settings.THUMBNAIL_KEY_PREFIX) + 2:]
+
+
+class KVStore(KVStoreBase):
+    @property
+    def cache(self):
+        return caches[sorl_settings.THUMBNAIL_CACHE]
+
+    def records(self):
+        return ThumbnailRecord.objects.using(
+            settings.THUMBNAIL_KVSTORE_DATABASE
+        )
+
+    def get_many(self, image_files):
+        """{ключ: ImageFile или None} для image_files одним пакетом."""
+        keys = {add_prefix(image_file.key): image_file.key
+                for image_file in image_files}
+        values = self._get_many_raw(list(keys))
+        count(batches=1)
+        return {
+            keys[key]: deserialize_image_file(value) if value else None
+            for key, value in values.items()
+        }
+
+    def _get_many_raw(self, keys):
+        found = self.cache.get_many(keys)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            rows = {}
+            # Не больше 999 параметров в одном запросе SQLite.
+            for start in range(0, len(missing), 500):
+                rows.update(
+                    self.records()
+                    .filter(key__in=[
+                        _short(key) for key in missing[start:start + 500]
+                    ])
+                    .values_list('key', 'value')
+                )
+            loaded = {
+                key: rows[_short(key)] for key in missing
+                if _short(key) in rows
+            }
+            if loaded:
+                self.cache.set_many(
+                    loaded, sorl_settings.THUMBNAIL_CACHE_TIMEOUT
+                )
+            for key in missing:
+                if key not in loaded:
+                    self.cache.add(
+                        key, EMPTY, settings.THUMBNAIL_MISS_TIMEOUT
+                    )
+            found.update(dict.fromkeys(missing, EMPTY))
+            found.update(loaded)
+        return {key: found[key] or None for key in keys}
+
+    def _get_raw(self, key):
+        return self._get_many_raw([key])[key]
+
+    def _set_raw(self, key, value):
+        self.records().update_or_create(
+            key=_short(key), defaults={'value': value}
+        )
+        self.cache.set(key, value, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+
+    def _delete_raw(self, *keys):
+        self.records().filter(key__in=[_short(key) for key in keys]).delete()
+        self.cache.delete_many(keys)
+
+    def _find_keys_raw(self, prefix):
+        rows = self.records().filter(key__startswith=_short(prefix))
+        return [
+            add_prefix(key, identity)
+            for identity, key in (
+                name.split('||', 1)
+                for name in rows.values_list('key', flat=True)
+            )
+        ]
@@ -0,0 +1,309 @@
+"""Заблаговременная генерация миниатюр картинок постов.
+
+PostForm после сохранения новой картинки ставит генерацию всех размеров из
+THUMBNAIL_GEOMETRIES и их вариантов для srcset (variants()) в пул потоков.
+Шаблоны (теги post_thumbnail и post_picture) только читают готовые
+миниатюры из KV-хранилища sorl и сами ничего не генерируют: пока миниатюры
+нет, выводится исходная картинка. Размеры миниатюр хранятся в том же
+KV-хранилище, файлы для width/height не открываются.
+
+Картинкам, записанным в обход PostForm (import_posts, seed_load), миниатюры
+создает backfill(); для уже сохраненных постов — команда
+generate_thumbnails.
+"""
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import feed_cache, thumbnail_store
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# sorl знает расширения только JPEG, PNG, GIF и WEBP.
+EXTENSIONS.setdefault('AVIF', 'avif')
+MIME_TYPES = {
+    'AVIF': 'image/avif',
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+}
+_GEOMETRY = re.compile(r'^(\d+)(?:x(\d+))?$')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class PregeneratedBackend(ThumbnailBackend):
+    """Бэкенд sorl, который умеет только искать готовые миниатюры."""
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """Еще не прочитанная из KV-хранилища миниатюра: нужен ее ключ."""
+        source = ImageFile(file_)
+        # Те же опции по умолчанию, что в ThumbnailBackend.get_thumbnail():
+        # от них зависит имя файла миниатюры.
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def get_ready_thumbnail(self, file_, geometry_string, **options):
+        """Миниатюра из KV-хранилища или None; файл не генерируется.
+
+        Если записи миниатюр картинки уже прочитаны пакетом (prefetch()),
+        KV-хранилище не опрашивается.
+        """
+        thumbnail = self.thumbnail_file(file_, geometry_string, **options)
+        prefetched = getattr(file_, '_ready_thumbnails', None)
+        if prefetched is not None and thumbnail.key in prefetched:
+            found = prefetched[thumbnail.key]
+            thumbnail_store.count(prefetched=1)
+        else:
+            found = default.kvstore.get(thumbnail)
+            thumbnail_store.count(lookups=1)
+        if found is None:
+            thumbnail_store.count(misses=1)
+        else:
+            thumbnail_store.count(hits=1)
+        return found
+
+
+backend = PregeneratedBackend()
+
+
+def geometry(alias):
+    geometry_string, options = settings.THUMBNAIL_GEOMETRIES[alias]
+    return geometry_string, dict(options)
+
+
+def ready_thumbnail(image, alias):
+    """Готовая миниатюра картинки поста для размера alias или None."""
+    if not image:
+        return None
+    geometry_string, options = geometry(alias)
+    return backend.get_ready_thumbnail(image, geometry_string, **options)
+
+
+def formats():
+    """Форматы из THUMBNAIL_VARIANT_FORMATS, которые умеет записать Pillow."""
+    Image.init()
+    return [
+        format_ for format_ in settings.THUMBNAIL_VARIANT_FORMATS
+        if format_ in Image.SAVE and format_ in EXTENSIONS
+    ]
+
+
+def variants(alias):
+    """Варианты размера alias: (формат, ширина, геометрия, опции).
+
+    Ширины — THUMBNAIL_VARIANT_WIDTHS не больше ширины размера, высота
+    уменьшается в той же пропорции.
+    """
+    geometry_string, options = geometry(alias)
+    match = _GEOMETRY.match(geometry_string)
+    if match is None:
+        return []
+    width = int(match.group(1))
+    height = match.group(2) and int(match.group(2))
+    widths = sorted({
+        min(variant, width) for variant in settings.THUMBNAIL_VARIANT_WIDTHS
+    })
+    result = []
+    for format_ in formats():
+        for variant in widths:
+            variant_geometry = str(variant)
+            if height:
+                variant_geometry += f'x{round(height * variant / width)}'
+            result.append(
+                (format_, variant, variant_geometry,
+                 _format_options(options, format_))
+            )
+    return result
+
+
+def _format_options(options, format_):
+    """Опции варианта в формате format_.
+
+    Формат, в котором sorl и так сохранит миниатюру, явно не указывается:
+    от опций зависит ключ, и вариант во всю ширину размера иначе
+    создавался бы отдельным, побайтно таким же файлом.
+    """
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        # Формат по умолчанию зависит от исходной картинки.
+        return dict(options, format=format_)
+    if format_ == options.get('format', sorl_settings.THUMBNAIL_FORMAT):
+        return options
+    return dict(options, format=format_)
+
+
+def ready_variants(image, alias):
+    """Готовые варианты картинки: формат -> [(ширина, миниатюра)]."""
+    ready = {}
+    if not image:
+        return ready
+    for format_, width, geometry_string, options in variants(alias):
+        thumbnail = backend.get_ready_thumbnail(
+            image, geometry_string, **options
+        )
+        if thumbnail is not None:
+            ready.setdefault(format_, []).append((width, thumbnail))
+    return ready
+
+
+def _geometries(alias):
+    """Геометрии и опции миниатюр размера alias без повторов."""
+    result = [geometry(alias)]
+    for _, _, geometry_string, options in variants(alias):
+        if (geometry_string, options) not in result:
+            result.append((geometry_string, options))
+    return result
+
+
+def _prefetch_images(images, aliases):
+    get_many = getattr(default.kvstore, 'get_many', None)
+    if get_many is None or not images:
+        return
+    wanted = [
+        (image, [
+            backend.thumbnail_file(image, geometry_string, **options)
+            for alias in aliases
+            for geometry_string, options in _geometries(alias)
+        ])
+        for image in images
+    ]
+    found = get_many(
+        [thumbnail for _, thumbnails in wanted for thumbnail in thumbnails]
+    )
+    for image, thumbnails in wanted:
+        image._ready_thumbnails = {
+            thumbnail.key: found.get(thumbnail.key)
+            for thumbnail in thumbnails
+        }
+
+
+def prefetch(posts, aliases=None):
+    """Читает записи всех миниатюр картинок posts одним пакетом.
+
+    Записи запоминаются в поле картинки поста, и ready_thumbnail() с
+    ready_variants() берут их оттуда. aliases — размеры из
+    THUMBNAIL_GEOMETRIES, по умолчанию все.
+    """
+    _prefetch_images(
+        [post.image for post in posts if post.image],
+        aliases or list(settings.THUMBNAIL_GEOMETRIES),
+    )
+
+
+def generate(image):
+    """Создает миниатюры размеров из THUMBNAIL_GEOMETRIES и их варианты.
+
+    image — поле картинки поста, а не имя: от хранилища исходного файла
+    зависят имена миниатюр.
+    """
+    for alias in settings.THUMBNAIL_GEOMETRIES:
+        for geometry_string, options in _geometries(alias):
+            default.backend.get_thumbnail(image, geometry_string, **options)
+
+
+def _executor_instance():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def pending(images):
+    """Картинки из images, у которых готовы не все миниатюры."""
+    _prefetch_images(images, list(settings.THUMBNAIL_GEOMETRIES))
+    result = []
+    for image in images:
+        ready = getattr(image, '_ready_thumbnails', None)
+        if ready is None or None in ready.values():
+            result.append(image)
+    return result
+
+
+def _backfill(image):
+    if not image.storage.exists(image.name):
+        # Картинку не скопировали при импорте: sorl записал бы ошибку.
+        return False
+    try:
+        generate(image)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры %s', image.name)
+        return False
+    return True
+
+
+def _backfill_thread(image):
+    try:
+        return _backfill(image)
+    finally:
+        connection.close()
+
+
+def backfill(names, workers=1):
+    """Создает недостающие миниатюры картинок постов с именами names.
+
+    Для картинок, записанных в обход PostForm: импорт, синтетические
+    данные, посты, сохраненные до генерации миниатюр. Возвращает число
+    картинок, миниатюры которых созданы.
+    """
+    field = Post._meta.get_field('image')
+    images = pending([
+        field.attr_class(None, field, name) for name in set(names) if name
+    ])
+    if workers <= 1:
+        return sum(map(_backfill, images))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return sum(executor.map(_backfill_thread, images))
+
+
+def _generate(post):
+    try:
+        generate(post.image)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры %s', post.image.name)
+    else:
+        # Страницы, закешированные с исходной картинкой, нужно перерисовать.
+        feed_cache.invalidate(*feed_cache.post_scopes(post))
+
+
+def _run(post):
+    try:
+        _generate(post)
+    finally:
+        connection.close()
+
+
+def schedule(post):
+    """Ставит генерацию миниатюр картинки поста в фоновый пул.
+
+    При THUMBNAIL_PREGENERATE_ASYNC = False генерирует сразу.
+    """
+    if not post.image:
+        return
+    if not settings.THUMBNAIL_PREGENERATE_ASYNC:
+        _generate(post)
+        return
+    _executor_instance().submit(_run, post)
@@ -0,0 +1,169 @@
+"""Материализованная лента подписок (fan-out on write).
+
+При публикации поста его копия-ссылка раскладывается в FeedEntry всех
+подписчиков автора, при подписке лента дополняется постами автора, при
+отписке — очищается от них. У авторов, чьих подписчиков больше
+FOLLOW_FEED_FANOUT_LIMIT, посты не раскладываются: лента читает их
+напрямую из Post (fan-out on read).
+"""
+import itertools
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+
+from .models import FeedEntry, Follow, Post, UserStats
+
+BATCH_SIZE = 1000
+
+
+def is_materialized():
+    return settings.FOLLOW_FEED_MATERIALIZED
+
+
+def _followers_count(author_id):
+    followers = (
+        UserStats.objects.filter(user_id=author_id)
+        .values_list('followers_count', flat=True)
+        .first()
+    )
+    return followers or 0
+
+
+def is_celebrity(author_id):
+    """Слишком много подписчиков, чтобы раскладывать посты автора."""
+    return _followers_count(author_id) > settings.FOLLOW_FEED_FANOUT_LIMIT
+
+
+def _insert(entries):
+    entries = iter(entries)
+    while True:
+        batch = list(itertools.islice(entries, BATCH_SIZE))
+        if not batch:
+            break
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def _author_posts(author_id):
+    posts = (
+        Post.objects.filter(author_id=author_id)
+        .order_by('-pub_date')
+        .values_list('pk', 'pub_date')
+    )
+    limit = settings.FOLLOW_FEED_BACKFILL_LIMIT
+    return posts[:limit] if limit is not None else posts
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if not is_materialized() or is_celebrity(post.author_id):
+        return
+    followers = (
+        Follow.objects.filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    _insert(
+        FeedEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in followers
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет посты автора в ленту нового подписчика."""
+    if not is_materialized() or is_celebrity(author_id):
+        return
+    _insert(
+        FeedEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for post_id, pub_date in _author_posts(author_id).iterator()
+    )
+
+
+def backfill_followers(author_id):
+    """Раскладывает посты автора всем его подписчикам.
+
+    Нужно, когда автор опустился ниже порога: его посты, вышедшие без
+    раскладки, иначе пропали бы из лент.
+    """
+    followers = (
+        Follow.objects.filter(author_id=author_id)
+        .values_list('user_id', flat=True)
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    for user_id in followers:
+        backfill(user_id, author_id)
+
+
+def unfollow(user_id, author_id):
+    """Убирает посты автора из ленты бывшего подписчика."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+    limit = settings.FOLLOW_FEED_FANOUT_LIMIT
+    if is_materialized() and _followers_count(author_id) == limit:
+        # Автор только что опустился до порога.
+        backfill_followers(author_id)
+
+
+def rebuild():
+    """Заново заполняет все ленты одним INSERT ... SELECT.
+
+    Для данных, загруженных пакетно в обход сигналов; счетчики UserStats
+    к этому моменту должны быть пересчитаны.
+    """
+    FeedEntry.objects.all()._raw_delete(FeedEntry.objects.db)
+    if not is_materialized():
+        return
+    sql = (
+        'INSERT INTO {entry} (user_id, post_id, author_id, pub_date) '
+        'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+        'FROM {follow} f '
+        'JOIN {post} p ON p.author_id = f.author_id '
+        'LEFT JOIN {stats} s ON s.user_id = f.author_id '
+        'WHERE COALESCE(s.followers_count, 0) <= %s'
+    ).format(
+        entry=FeedEntry._meta.db_table,
+        follow=Follow._meta.db_table,
+        post=Post._meta.db_table,
+        stats=UserStats._meta.db_table,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [settings.FOLLOW_FEED_FANOUT_LIMIT])
+
+
+def follow_feed(user):
+    """Посты для ленты подписок пользователя."""
+    # Порядок совпадает с индексом post_date_id и ключом KeysetPaginator:
+    # без pk посты с одной датой перемешиваются, и курсор их теряет.
+    posts = Post.objects.feed().order_by('-pub_date', '-pk')
+    if not is_materialized():
+        return posts.filter(author__following__user=user)
+
+    celebrities = list(
+        Follow.objects.filter(
+            user=user,
+            author__stats__followers_count__gt=(
+                settings.FOLLOW_FEED_FANOUT_LIMIT
+            ),
+        ).values_list('author_id', flat=True)
+    )
+    if not celebrities:
+        # Тот же ключ по копиям в FeedEntry: его отдает индекс
+        # feed_entry_user_date без сортировки.
+        return posts.filter(feed_entries__user=user).order_by(
+            F('feed_entries__pub_date').desc(),
+            F('feed_entries__post_id').desc(),
+        )
+
+    inbox = FeedEntry.objects.filter(user=user).values('post_id')
+    return posts.filter(
+        Q(pk__in=inbox) | Q(author_id__in=celebrities)
+    )
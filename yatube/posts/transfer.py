@@ -0,0 +1,258 @@
+"""Пакетные выгрузка и загрузка постов (export_posts и import_posts).
+
+Строки пишутся и читаются потоком, по batch_size штук: в памяти не бывает
+больше одного пакета. Формат — NDJSON или CSV с полями FIELDS; автор и
+группа передаются своими username и slug, картинка — именем файла в
+хранилище. После каждого пакета позиция записывается в Checkpoint, и
+прерванная команда продолжает с нее.
+"""
+import csv
+import itertools
+import json
+import os
+from collections import Counter
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.models import explicit_pub_date
+
+from . import feed_cache, search, timeline
+from .models import Group, Post, UserStats
+
+User = get_user_model()
+
+FIELDS = ('id', 'pub_date', 'author', 'group', 'group_title', 'text', 'image')
+FORMATS = ('ndjson', 'csv')
+
+
+def detect_format(path):
+    return 'csv' if path.lower().endswith('.csv') else 'ndjson'
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def dump_rows(after=0, chunk_size=1000):
+    """Посты с id больше after в порядке id, без создания моделей."""
+    posts = Post.objects.filter(pk__gt=after).order_by('pk').values_list(
+        'pk', 'pub_date', 'author__username', 'group__slug', 'group__title',
+        'text', 'image',
+    )
+    for values in posts.iterator(chunk_size=chunk_size):
+        row = dict(zip(FIELDS, values))
+        row['pub_date'] = row['pub_date'].isoformat()
+        yield row
+
+
+def writer(file, fmt, header=True):
+    """Функция, записывающая одну строку в file."""
+    if fmt == 'csv':
+        csv_writer = csv.DictWriter(file, FIELDS)
+        if header:
+            csv_writer.writeheader()
+        return csv_writer.writerow
+
+    def write(row):
+        file.write(json.dumps(row, ensure_ascii=False) + '\n')
+    return write
+
+
+def _clean(number, row):
+    try:
+        pub_date = parse_datetime(row['pub_date'])
+        if pub_date is None:
+            raise ValueError(row['pub_date'])
+        if timezone.is_naive(pub_date):
+            pub_date = timezone.make_aware(pub_date)
+        return {
+            'id': int(row['id']) if row.get('id') else None,
+            'pub_date': pub_date,
+            'author': row['author'],
+            'group': row.get('group') or None,
+            'group_title': row.get('group_title') or row.get('group'),
+            'text': row['text'],
+            'image': row.get('image') or '',
+        }
+    except (KeyError, TypeError, ValueError) as error:
+        raise ValueError(f'Строка {number}: неверное поле {error}')
+
+
+def read_rows(file, fmt):
+    """Строки файла в виде словарей с разобранными значениями.
+
+    Ошибка формата — ValueError с номером строки.
+    """
+    if fmt == 'csv':
+        # Первая строка CSV — заголовок.
+        for number, row in enumerate(csv.DictReader(file), start=2):
+            yield _clean(number, row)
+        return
+    for number, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            raise ValueError(f'Строка {number}: это не JSON')
+        yield _clean(number, row)
+
+
+class Lookup:
+    """Кеш username -> id и slug -> id на время загрузки.
+
+    Недостающих авторов (без пароля) и группы создает пакетно.
+    """
+
+    def __init__(self):
+        self.authors = {}
+        self.groups = {}
+
+    def _resolve(self, cache, model, field, wanted, build):
+        missing = set(wanted) - cache.keys()
+        if not missing:
+            return
+        existing = model.objects.filter(**{f'{field}__in': missing})
+        cache.update(existing.values_list(field, 'pk'))
+        new = [build(key) for key in missing - cache.keys()]
+        if new:
+            model.objects.bulk_create(new, ignore_conflicts=True)
+            cache.update(existing.values_list(field, 'pk'))
+
+    def resolve(self, rows):
+        self._resolve(
+            self.authors, User, 'username',
+            {row['author'] for row in rows},
+            lambda username: User(
+                username=username, password=make_password(None)
+            ),
+        )
+        titles = {row['group']: row['group_title'] for row in rows}
+        titles.pop(None, None)
+        self._resolve(
+            self.groups, Group, 'slug', titles,
+            lambda slug: Group(slug=slug, title=titles[slug], description=''),
+        )
+
+
+def save_posts(rows, lookup):
+    """Создает посты одним bulk_create в обход сигналов.
+
+    Созданные посты сразу добавляются в поисковый индекс. Посты с уже
+    занятым id пропускаются, поэтому пакет можно загрузить повторно.
+    Возвращает (созданные посты, пропущенные строки).
+    """
+    lookup.resolve(rows)
+    ids = [row['id'] for row in rows if row['id'] is not None]
+    taken = set(Post.objects.filter(pk__in=ids).values_list('pk', flat=True))
+    posts = [
+        Post(
+            pk=row['id'],
+            pub_date=row['pub_date'],
+            author_id=lookup.authors[row['author']],
+            group_id=lookup.groups.get(row['group']),
+            text=row['text'],
+            image=row['image'],
+        )
+        for row in rows
+        if row['id'] not in taken
+    ]
+    last_id = Post.objects.aggregate(last_id=Max('pk'))['last_id'] or 0
+    with explicit_pub_date(Post):
+        Post.objects.bulk_create(posts)
+    # bulk_create в SQLite не возвращает id: посты без явного id получили
+    # следующие за last_id (пакет сохраняется в одной транзакции).
+    created = {post.pk for post in posts if post.pk is not None}
+    if len(created) < len(posts):
+        created.update(
+            Post.objects.filter(pk__gt=last_id).values_list('pk', flat=True)
+        )
+    search.index_posts(created)
+    return posts, len(rows) - len(posts)
+
+
+def _copy(name, source, target):
+    if target.exists(name):
+        return 'skipped'
+    if not source.exists(name):
+        return 'missing'
+    with source.open(name) as content:
+        target.save(name, content)
+    return 'copied'
+
+
+def copy_images(names, source, target, executor):
+    """Копирует файлы из хранилища source в target потоками executor.
+
+    Уже скопированные файлы пропускаются. Возвращает Counter с числом
+    скопированных (copied), пропущенных (skipped) и ненайденных (missing).
+    """
+    return Counter(executor.map(
+        partial(_copy, source=source, target=target), set(names)
+    ))
+
+
+def reset_sequences():
+    """Сдвигает последовательность id после вставки явных id."""
+    statements = connection.ops.sequence_reset_sql(no_style(), [Post])
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def finalize(author_ids, group_ids, batch_size=1000):
+    """Делает то, что при сохранении по одному посту делают сигналы.
+
+    Пересчитывает счетчики авторов, дополняет ленты их подписчиков и
+    сбрасывает кеш затронутых лент. Поисковый индекс обновляет
+    save_posts().
+    """
+    author_ids = sorted(author_ids)
+    for offset in range(0, len(author_ids), batch_size):
+        UserStats.objects.recount(author_ids[offset:offset + batch_size])
+    # После пересчета: порог раскладки сравнивается с числом подписчиков.
+    for author_id in author_ids:
+        timeline.backfill_followers(author_id)
+    feed_cache.invalidate(
+        feed_cache.index_scope(),
+        feed_cache.groups_scope(),
+        *(feed_cache.author_scope(pk) for pk in author_ids),
+        *(feed_cache.group_scope(pk) for pk in group_ids),
+    )
+
+
+class Checkpoint:
+    """Состояние прерванной команды в JSON-файле рядом с данными."""
+
+    def __init__(self, path):
+        self.path = path + '.checkpoint'
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+
+    def save(self, **state):
+        # Через временный файл: обрыв записи не портит прежнее состояние.
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(state, file)
+        os.replace(temporary, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,100 @@
+"""Обработка картинок постов при загрузке.
+
+normalize() проверяет размер файла и картинки по заголовку, не распаковывая
+ее, уменьшает картинку до UPLOAD_IMAGE_MAX_SIDE по большей стороне,
+поворачивает по EXIF, удаляет метаданные и пересохраняет в JPEG (картинки
+с прозрачностью — в PNG). Результат пишется во временный файл, а не в
+память; большие загрузки Django и так держит на диске
+(FILE_UPLOAD_MAX_MEMORY_SIZE), а JPEG распаковывается сразу в уменьшенном
+масштабе (Image.draft).
+"""
+import os
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from PIL import Image, ImageOps
+
+TRANSPARENT_MODES = ('RGBA', 'LA', 'PA')
+# Что оставить из метаданных: цветовой профиль и прозрачность нужны для
+# правильного вида картинки, остальное (EXIF, геометка) удаляется.
+KEPT_INFO = ('icc_profile', 'transparency')
+
+
+def _check(upload):
+    if upload.size > settings.UPLOAD_IMAGE_MAX_BYTES:
+        raise ValidationError(
+            'Файл больше %(limit)s МБ.',
+            code='file_too_large',
+            params={'limit': settings.UPLOAD_IMAGE_MAX_BYTES // 2 ** 20},
+        )
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError('Это не картинка.', code='invalid_image')
+    width, height = image.size
+    if width * height > settings.UPLOAD_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка больше %(limit)s мегапикселей.',
+            code='too_many_pixels',
+            params={'limit': settings.UPLOAD_IMAGE_MAX_PIXELS // 10 ** 6},
+        )
+    return image
+
+
+def _is_transparent(image):
+    return image.mode in TRANSPARENT_MODES or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def normalize(upload):
+    """Уменьшенная копия загруженной картинки без метаданных.
+
+    Возвращает TemporaryUploadedFile; анимированные картинки возвращаются
+    как есть. Слишком большой файл или картинка — ValidationError.
+    """
+    image = _check(upload)
+    if getattr(image, 'is_animated', False):
+        upload.seek(0)
+        return upload
+
+    side = settings.UPLOAD_IMAGE_MAX_SIDE
+    image.draft('RGB', (side, side))
+    try:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((side, side), Image.LANCZOS)
+    except (OSError, ValueError):
+        raise ValidationError('Картинка повреждена.', code='invalid_image')
+    image.info = {
+        key: value for key, value in image.info.items() if key in KEPT_INFO
+    }
+
+    if _is_transparent(image):
+        format_, extension, options = 'PNG', 'png', {'optimize': True}
+    else:
+        if image.mode != 'RGB':
+            try:
+                image = image.convert('RGB')
+            except ValueError:
+                raise ValidationError(
+                    'Этот формат картинки не поддерживается.',
+                    code='invalid_image',
+                )
+        format_, extension = 'JPEG', 'jpg'
+        options = {
+            'quality': settings.UPLOAD_IMAGE_QUALITY,
+            'optimize': True,
+            'progressive': True,
+            'icc_profile': image.info.get('icc_profile'),
+        }
+
+    name = os.path.splitext(os.path.basename(upload.name))[0]
+    result = TemporaryUploadedFile(
+        f'{name}.{extension}', f'image/{format_.lower()}', 0, None
+    )
+    image.save(result, format_, **options)
+    result.size = result.tell()
+    result.seek(0)
+    return result
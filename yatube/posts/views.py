@@ -1,44 +1,56 @@
+import hashlib
+
+from django.db import transaction
+from django.http import JsonResponse
+from django.utils.http import urlencode
 from django.shortcuts import get_object_or_404, render, redirect
-from django.core.paginator import Paginator
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 
-from .models import Group, Follow, Post
+from core.ratelimit import rate_limited
+from core.replicas import replica_reads
+
+from .models import Comment, Group, Follow, Post, UserStats
 from .forms import PostForm, CommentForm
-from yatube.settings import PAGE_ITEMS_NUM
+from . import comment_buffer, feed_cache, freshness, search, timeline
+from .freshness import conditional_page
+from .pagination import KeysetPaginator
+from yatube.settings import (COMMENTS_PAGE_SIZE, PAGE_COUNT_LIMIT,
+                             PAGE_ITEMS_NUM)
 
 User = get_user_model()
 
 
-def posts_paginate(request, posts_list):
-    paginator = Paginator(posts_list, PAGE_ITEMS_NUM)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-
-    return page_obj
-
-
+@replica_reads
 def index(request):
     template = 'posts/index.html'
-    posts = Post.objects.all()
-    page_obj = posts_paginate(request, posts)
+    posts = Post.objects.feed().with_thumbnails()
+    page_obj, feed_html = feed_cache.cached_feed(
+        request,
+        (feed_cache.index_scope(),),
+        posts,
+        'posts/includes/index_feed.html'
+    )
 
     context = {
         'page_obj': page_obj,
+        'feed_html': feed_html,
     }
 
     return render(request, template, context)
 
 
 @login_required
+@rate_limited('post')
 def post_create(request):
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None)
 
     if form.is_valid():
         post_author = request.user
         form.instance.author = post_author
 
-        form.save()
+        with transaction.atomic():
+            form.save()
 
         return redirect('posts:profile', post_author.username)
 
@@ -59,7 +71,8 @@ def post_edit(request, post_id):
     )
 
     if form.is_valid():
-        form.save()
+        with transaction.atomic():
+            form.save()
 
         return redirect('posts:post_detail', post_id)
 
@@ -71,6 +84,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@rate_limited('comment')
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -79,26 +93,41 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        if comment_buffer.enabled():
+            comment_buffer.add(comment)
+        else:
+            with transaction.atomic():
+                comment.save()
 
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@replica_reads
+@conditional_page(freshness.profile)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    page_obj = posts_paginate(request, posts)
-    posts_amount = posts.count()
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    stats = UserStats.for_user(author)
+    posts = author.posts.feed().with_thumbnails()
+    page_obj, _ = feed_cache.cached_feed(
+        request,
+        (feed_cache.author_scope(author.pk), feed_cache.groups_scope()),
+        posts,
+        count=stats.posts_count
+    )
+    posts_amount = stats.posts_count
 
     user = request.user
-    # followers = author.following.all()
-    # users_followers = [follower.user for follower in followers]
-    # following = user in users_followers
-    following = Follow.objects.filter(user=user, author=author).exists()
+    following = (
+        user.is_authenticated
+        and Follow.objects.filter(user=user, author=author).exists()
+    )
 
     context = {
         'page_obj': page_obj,
         'posts_amount': posts_amount,
+        'stats': stats,
         'author': author,
         'following': following,
     }
@@ -106,12 +135,42 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+def _comments_page(post_id, cursor=None):
+    """Страница комментариев (от новых к старым) и курсор более ранних.
+
+    Комментарии страницы возвращаются в хронологическом порядке.
+    """
+    def compute():
+        paginator = KeysetPaginator(
+            Comment.objects.filter(post_id=post_id).select_related('author'),
+            COMMENTS_PAGE_SIZE,
+        )
+        page = paginator.get_page(cursor)
+        return list(reversed(page.object_list)), page.next_cursor
+
+    cursor_key = hashlib.md5(cursor.encode()).hexdigest() if cursor else ''
+    return feed_cache.cached(
+        f'comments:{post_id}:{cursor_key}',
+        (feed_cache.post_scope(post_id),),
+        compute,
+    )
+
+
+@replica_reads
+@conditional_page(freshness.post_detail)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group')
+        .with_thumbnails(),
+        pk=post_id,
+    )
 
-    post_author = post.author
-    posts_amount = post_author.posts.count()
-    post_comments = post.comments.all()
+    posts_amount = UserStats.for_user(post.author).posts_count
+    post_comments, older_cursor = _comments_page(post.pk)
+    # Свои комментарии из буфера автор видит до их записи в базу.
+    post_comments = post_comments + comment_buffer.pending(
+        post.pk, request.user.pk
+    )
 
     text_truncated = post.text[:30]
 
@@ -123,17 +182,52 @@ def post_detail(request, post_id):
         'posts_amount': posts_amount,
         'form': form,
         'comments': post_comments,
+        'older_cursor': older_cursor,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    """Более ранние комментарии поста: HTML-фрагмент или JSON."""
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    comments, older_cursor = _comments_page(
+        post.pk, request.GET.get('cursor')
+    )
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.pk,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'pub_date': comment.pub_date,
+                }
+                for comment in comments
+            ],
+            'older_cursor': older_cursor,
+        })
+
+    context = {
+        'post': post,
+        'comments': comments,
+        'older_cursor': older_cursor,
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
+@replica_reads
+@conditional_page(freshness.group_posts)
 def group_posts(request, group_name):
     group = get_object_or_404(Group, slug=group_name)
     group_name = group.title
-    posts = group.posts.all()
-    page_obj = posts_paginate(request, posts)
+    posts = group.posts.feed().with_thumbnails()
+    page_obj, _ = feed_cache.cached_feed(
+        request, (feed_cache.group_scope(group.pk),), posts
+    )
 
     context = {
+        'group': group,
         'group_name': group_name,
         'page_obj': page_obj
     }
@@ -141,11 +235,36 @@ def group_posts(request, group_name):
     return render(request, 'posts/group_list.html', context)
 
 
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        paginator = search.paginator(
+            query, PAGE_ITEMS_NUM, count_limit=PAGE_COUNT_LIMIT
+        )
+        page_obj = paginator.get_page(request.GET.get('cursor'))
+
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        # Ссылки пагинатора должны сохранять поисковый запрос.
+        'query_prefix': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@replica_reads
 @login_required
 def follow_index(request):
     user = request.user
-    posts = Post.objects.filter(author__following__user=user)
-    page_obj = posts_paginate(request, posts)
+    posts = timeline.follow_feed(user).with_thumbnails()
+    # Лента подписок зависит от любых новых постов, поэтому сбрасывается
+    # вместе с общей лентой и при изменении подписок пользователя.
+    page_obj, _ = feed_cache.cached_feed(
+        request,
+        (feed_cache.follow_scope(user.pk), feed_cache.index_scope()),
+        posts
+    )
 
     context = {
         'page_obj': page_obj,
@@ -159,7 +278,8 @@ def profile_follow(request, username):
     user = request.user
 
     if user != author:
-        Follow.objects.get_or_create(user=user, author=author)
+        with transaction.atomic():
+            Follow.objects.get_or_create(user=user, author=author)
 
     return redirect('posts:profile', username=username)
 
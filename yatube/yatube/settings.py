@@ -25,15 +25,18 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -68,9 +71,41 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    },
+    # Реплика для чтения. Локально — второй файл SQLite, который копирует
+    # из default команда sync_replica; в тестах — та же база, что default.
+    'replica': {
+        'ENGINE': 'core.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db_replica.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+
+# Чтение лент из реплики (core.replicas): имя базы из DATABASES или None —
+# тогда все читается из default. После записи посетитель
+# REPLICA_PIN_SECONDS секунд читает из default (cookie REPLICA_PIN_COOKIE),
+# и столько же живут в кеше данные из реплики: отставание реплики должно
+# быть меньше.
+DATABASE_REPLICA = None
+REPLICA_PIN_SECONDS = 10
+REPLICA_PIN_COOKIE = 'primary_until'
+
+# PRAGMA для каждого нового соединения с SQLite (core.sqlite). WAL не дает
+# писателям блокировать читателей, а при synchronous = NORMAL commit в WAL
+# не ждет fsync. busy_timeout — сколько ждать занятую базу (мс) вместо
+# ошибки «database is locked»; mmap_size — сколько байт файла читать через
+# отображение в память; cache_size < 0 — кеш страниц в КиБ.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64000,
+    'temp_store': 'MEMORY',
 }
 
 
@@ -122,12 +157,162 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 STATIC_URL = '/static/'
 
 PAGE_ITEMS_NUM = 10
+# Верхняя граница подсчета постов при keyset-пагинации:
+# больше этого числа показывается как «N+».
+PAGE_COUNT_LIMIT = 1000
+# Сколько постов считать в списке админки при фильтрах и поиске: дальше
+# этого числа страницы списка не листаются (сузьте фильтр).
+ADMIN_COUNT_LIMIT = 10000
+# Сколько комментариев показывать на странице поста и подгружать за раз.
+COMMENTS_PAGE_SIZE = 20
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+# Кеш в два уровня (core.cache.TwoTierCache): до LOCAL_MAX_ENTRIES
+# значений на LOCAL_TIMEOUT секунд в памяти процесса, остальное — в общем
+# кеше 'shared'. Поколения лент (feed-gen:) и ведра лимитов (ratelimit:)
+# читаются только из общего кеша, поэтому сброс ленты в одном процессе сразу
+# видят остальные. LocMemCache в
+# 'shared' годится для одного процесса (runserver, тесты); нескольким
+# процессам нужен общий кеш:
+#     'BACKEND': 'core.cache.SQLiteCache',
+#     'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+# или django.core.cache.backends.filebased.FileBasedCache с каталогом, или
+# core.cache.RedisCache с 'LOCATION': 'redis://localhost:6379/0' (нужен
+# пакет redis). Попадания по уровням — на странице /core/profiling/.
 CACHES = {
     'default': {
+        'BACKEND': 'core.cache.TwoTierCache',
+        'LOCATION': 'default',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 60,
+            'SHARED_ONLY_PREFIXES': ('feed-gen:', 'ratelimit:'),
+        },
+    },
+    'shared': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'LOCATION': 'shared',
+    },
+    # Записи о миниатюрах (posts.thumbnail_store). Отсутствие миниатюры
+    # тоже кешируется, поэтому копия в памяти процесса живет недолго.
+    'thumbnails': {
+        'BACKEND': 'core.cache.TwoTierCache',
+        'LOCATION': 'thumbnails',
+        'KEY_PREFIX': 'thumbnails',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_MAX_ENTRIES': 10000,
+            'LOCAL_TIMEOUT': 30,
+        },
+    },
+}
+
+# Время жизни (в секундах) закешированных страниц ленты:
+# выбранных постов и отрендеренного HTML. Записи сбрасываются сигналами
+# при изменении постов, комментариев, подписок и групп (posts.signals),
+# поэтому время жизни может быть большим.
+FEED_CACHE_TIMEOUT = 60 * 15
+FEED_HTML_CACHE_TIMEOUT = 60 * 15
+
+# Материализованная лента подписок (posts.timeline): посты раскладываются
+# по лентам подписчиков при публикации. Посты авторов, у которых больше
+# FOLLOW_FEED_FANOUT_LIMIT подписчиков, читаются напрямую. При подписке в
+# ленту добавляется не больше FOLLOW_FEED_BACKFILL_LIMIT постов автора
+# (None — все).
+FOLLOW_FEED_MATERIALIZED = True
+FOLLOW_FEED_FANOUT_LIMIT = 1000
+FOLLOW_FEED_BACKFILL_LIMIT = None
+
+# Результаты бенчмарка страниц posts (manage.py benchmark_views), с
+# которыми сравниваются новые замеры. Допустимый рост времени и памяти —
+# BENCHMARK_THRESHOLD (доля), число запросов расти не должно.
+BENCHMARK_BASELINE = os.path.join(BASE_DIR, 'benchmark_baseline.json')
+BENCHMARK_THRESHOLD = 0.25
+
+# Профилирование запросов (core.middleware.ProfilingMiddleware): заголовок
+# Server-Timing и перцентили по именам URL на странице /core/profiling/.
+# Хранится не больше PROFILING_SAMPLES последних замеров на каждое имя.
+PROFILING_ENABLED = False
+PROFILING_SAMPLES = 1000
+
+# Размеры миниатюр картинок постов: имя -> (геометрия, опции sorl).
+# Миниатюры создаются заранее, при сохранении картинки, в пуле из
+# THUMBNAIL_WORKERS потоков (posts.thumbnails); при
+# THUMBNAIL_PREGENERATE_ASYNC = False — сразу, в том же запросе.
+THUMBNAIL_GEOMETRIES = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+THUMBNAIL_WORKERS = 2
+# Обработка загруженных картинок постов (posts.uploads): картинка
+# уменьшается до UPLOAD_IMAGE_MAX_SIDE пикселей по большей стороне, теряет
+# метаданные (EXIF) и пересохраняется в JPEG с качеством
+# UPLOAD_IMAGE_QUALITY (с прозрачностью — в PNG). Файлы больше
+# UPLOAD_IMAGE_MAX_BYTES и картинки больше UPLOAD_IMAGE_MAX_PIXELS пикселей
+# (распаковочные бомбы) отклоняются до распаковки.
+UPLOAD_IMAGE_MAX_BYTES = 20 * 1024 * 1024
+UPLOAD_IMAGE_MAX_PIXELS = 50 * 1000 * 1000
+UPLOAD_IMAGE_MAX_SIDE = 2048
+UPLOAD_IMAGE_QUALITY = 85
+
+# Варианты миниатюр для srcset (тег post_picture): ширины (высота — в той
+# же пропорции, что у размера) и форматы в порядке предпочтения. Форматы,
+# которые Pillow не умеет записывать (WEBP без libwebp, AVIF без плагина),
+# пропускаются; последний доступный попадает в сам <img>.
+THUMBNAIL_VARIANT_WIDTHS = (320, 640, 960)
+THUMBNAIL_VARIANT_FORMATS = ('AVIF', 'WEBP', 'JPEG')
+# Атрибут sizes: какую ширину экрана занимает картинка размера.
+THUMBNAIL_SIZES = {
+    'card': '(min-width: 768px) 75vw, 100vw',
 }
+# При отладке (runserver, тесты) — в том же запросе: перезапуск
+# автозагрузчиком бросил бы задачи пула, а тесты удаляют MEDIA_ROOT раньше,
+# чем пул допишет миниатюры.
+THUMBNAIL_PREGENERATE_ASYNC = not DEBUG
+# KV-хранилище sorl с пакетным чтением записей всех миниатюр страницы
+# (posts.thumbnail_store): таблица ThumbnailRecord в базе
+# THUMBNAIL_KVSTORE_DATABASE и кеш THUMBNAIL_CACHE перед ней. Чтобы
+# убрать таблицу из основной базы, добавьте в DATABASES отдельную базу,
+# укажите ее здесь и выполните для нее migrate --database.
+THUMBNAIL_KVSTORE = 'posts.thumbnail_store.KVStore'
+THUMBNAIL_KVSTORE_DATABASE = 'default'
+THUMBNAIL_CACHE = 'thumbnails'
+# Сколько секунд кешируется отсутствие записи о миниатюре: миниатюра,
+# которую как раз создает фоновый пул, появится не позже.
+THUMBNAIL_MISS_TIMEOUT = 60
+
+# JSON API (api): размер страницы по умолчанию и максимальный (?limit=),
+# и сколько строк читать из базы за раз при потоковой выгрузке.
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+API_EXPORT_CHUNK_SIZE = 1000
+
+# Ограничение частоты отправки постов и комментариев (core.ratelimit):
+# скользящее окно на пользователя (гостя — на IP). burst — сколько отправок
+# можно сделать подряд, rate — средняя частота в секунду: за любые
+# burst / rate секунд проходит не больше burst отправок. Сверх лимита —
+# ответ 429 с заголовком Retry-After.
+RATE_LIMITS = {
+    'post': {'rate': 0.1, 'burst': 10},
+    'comment': {'rate': 0.5, 'burst': 10},
+}
+
+# Буферизованная запись комментариев (posts.comment_buffer): комментарии
+# копятся в памяти процесса и пишутся пакетами до COMMENT_BUFFER_BATCH_SIZE
+# штук не реже раза в COMMENT_BUFFER_FLUSH_SECONDS секунд. Пакет, который
+# не удалось записать (например, база заблокирована), остается в очереди и
+# пишется снова; после COMMENT_BUFFER_MAX_ATTEMPTS неудач подряд он
+# отбрасывается. Комментарии, не записанные до аварийной остановки
+# процесса, теряются.
+COMMENT_BUFFER_ENABLED = False
+COMMENT_BUFFER_BATCH_SIZE = 50
+COMMENT_BUFFER_FLUSH_SECONDS = 1.0
+COMMENT_BUFFER_MAX_ATTEMPTS = 5
+
+# Выгрузка и загрузка постов (manage.py export_posts / import_posts):
+# сколько строк обрабатывать за один пакет и в сколько потоков копировать
+# картинки.
+TRANSFER_BATCH_SIZE = 1000
+TRANSFER_WORKERS = 4
@@ -8,6 +8,8 @@ urlpatterns = [
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('core/', include('core.urls', namespace='core')),
+    path('api/', include('api.urls', namespace='api')),
     path('', include('posts.urls', namespace='posts'))
 ]
 